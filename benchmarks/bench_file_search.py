@@ -0,0 +1,79 @@
+"""
+ファイル探索 (search_files) のベンチマーク。
+合成した深いツリーに対し、従来の os.listdir 再帰実装と scandir 実装を比較する。
+
+使い方:
+    python benchmarks/bench_file_search.py --depth 5 --fanout 4 --files 30
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_ROOT)
+
+from benchmarks.generators import generate_tree
+from domain.file_searcher import iter_search_files, search_files
+
+KEYWORDS = ["金子", "本間"]
+
+def legacy_search_files(folder_path, keywords, current_depth=0, max_depth=3, base_folder=None):
+    """比較用: 変更前の os.listdir + isfile/isdir による再帰実装"""
+    if base_folder is None:
+        base_folder = folder_path
+    matched_files = []
+    if current_depth > max_depth:
+        return matched_files
+    for entry in os.listdir(folder_path):
+        full_path = os.path.join(folder_path, entry)
+        if os.path.isfile(full_path):
+            if any(keyword in entry for keyword in keywords):
+                matched_files.append(os.path.relpath(full_path, base_folder))
+        elif os.path.isdir(full_path):
+            matched_files.extend(legacy_search_files(full_path, keywords, current_depth + 1, max_depth, base_folder))
+    return matched_files
+
+def timed(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--files", type=int, default=30)
+    parser.add_argument("--hit-rate", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        total = generate_tree(root, args.depth, args.fanout, args.files, args.hit_rate, KEYWORDS)
+        print(f"files={total} depth={args.depth} fanout={args.fanout}")
+
+        legacy_time, legacy = timed(lambda: legacy_search_files(root, KEYWORDS, max_depth=args.depth), args.repeat)
+        new_time, new = timed(lambda: search_files(root, KEYWORDS, max_depth=args.depth), args.repeat)
+        xlsx_time, xlsx = timed(
+            lambda: search_files(root, KEYWORDS, max_depth=args.depth, extensions=[".xlsx"]), args.repeat
+        )
+        assert legacy == new, "scandir 実装の結果が従来実装と一致しません"
+
+        start = time.perf_counter()
+        next(iter_search_files(root, KEYWORDS, max_depth=args.depth), None)
+        first_time = time.perf_counter() - start
+
+        print(f"legacy (listdir)   : {legacy_time * 1000:8.1f} ms  matches={len(legacy)}")
+        print(f"scandir            : {new_time * 1000:8.1f} ms  matches={len(new)}  "
+              f"speedup={legacy_time / new_time:.2f}x")
+        print(f"scandir (.xlsx)    : {xlsx_time * 1000:8.1f} ms  matches={len(xlsx)}")
+        print(f"first lazy result  : {first_time * 1000:8.3f} ms")
+
+if __name__ == "__main__":
+    main()
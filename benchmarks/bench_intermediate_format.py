@@ -0,0 +1,53 @@
+"""
+TMP 中間形式 (json / rowpack / ndjson) のファイルサイズと書き込み・読み込み速度を比較するベンチマーク。
+peak は合算と同じく iter_row_batches で順に読み込んだ場合の、tracemalloc で測ったメモリ使用量のピーク。
+
+使い方:
+    python benchmarks/bench_intermediate_format.py --rows 10000 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_ROOT)
+
+from benchmarks.generators import generate_extracted_data
+from infrastructure import intermediate_format, json_writer
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        intermediate_format.TMP_FOLDER = tmp_dir
+        json_writer.TMP_FOLDER = tmp_dir
+        for rows in args.rows:
+            data = generate_extracted_data(rows)
+            baseline = None
+            for name, fmt in intermediate_format.FORMATS.items():
+                start = time.perf_counter()
+                path = fmt.write(data, f"bench_{rows}{fmt.extension}")
+                write_time = time.perf_counter() - start
+                start = time.perf_counter()
+                loaded = fmt.read(path)
+                read_time = time.perf_counter() - start
+                assert loaded == data, f"{name} の読み戻し結果が一致しません"
+                del loaded
+                tracemalloc.start()
+                for _ in fmt.iter_row_batches(path):
+                    pass
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                size = os.path.getsize(path)
+                baseline = baseline or size
+                print(f"rows={rows:>8} format={name:<8} size={size / 1024 / 1024:8.2f}MiB "
+                      f"({size / baseline:5.1%} of json) write={rows / write_time:>10,.0f} rows/s "
+                      f"read={rows / read_time:>10,.0f} rows/s peak={peak / 1024 / 1024:7.2f}MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+merge_json_files_by_unit のベンチマーク。
+変更前の行単位の実装 (merged_files をリストの線形探索で重複排除し、行ごとに row.copy() する) と比較し、
+output_{unit}.json がバイト単位で一致することも確認する。
+
+使い方:
+    python benchmarks/bench_merge.py --files 40 --rows 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_ROOT)
+
+from benchmarks.generators import generate_tmp_json_set
+from infrastructure import json_merger
+from infrastructure.utils import gc_paused
+
+KEYWORDS = ["金子", "本間"]
+
+def legacy_merge(json_files) -> dict:
+    """比較用: 変更前の行単位の合算。(unit, filename, data) の列から unit → { group_name: [row, ...] } を返す"""
+    merged_data = {}
+    for unit_found, filename, data in json_files:
+        unit_rows = merged_data.setdefault(unit_found, {})
+        for groups in data.values():
+            for rows in groups.values():
+                for row in rows:
+                    try:
+                        composite_key = (
+                            str(row["グループ"]).strip(),
+                            str(row["指図書No"]).strip(),
+                            str(row["補足"]).strip()
+                        )
+                    except Exception:
+                        continue
+                    if row["時間"] is None:
+                        time_val = 0.0
+                    else:
+                        try:
+                            time_val = float(row["時間"])
+                        except Exception:
+                            continue
+                    if composite_key in unit_rows:
+                        merged_entry = unit_rows[composite_key]
+                        merged_entry["時間"] += time_val
+                        if filename not in merged_entry["merged_files"]:
+                            merged_entry["merged_files"].append(filename)
+                    else:
+                        new_row = row.copy()
+                        new_row["時間"] = time_val
+                        new_row["merged_files"] = [filename]
+                        unit_rows[composite_key] = new_row
+    final_output = {}
+    for unit, comp_dict in merged_data.items():
+        grouped = {}
+        for comp_key, row in comp_dict.items():
+            grouped.setdefault(comp_key[0], []).append(row)
+        final_output[unit] = grouped
+    return final_output
+
+def load_tmp_files(keywords: list) -> list:
+    """TMP_FOLDER の中間ファイルを (unit, filename, data) のリストとして読み込む"""
+    return [(unit, filename, fmt.read(file_path))
+            for unit, filename, file_path, fmt in json_merger._iter_tmp_files(keywords)]
+
+def read_outputs(paths: dict) -> dict:
+    result = {}
+    for unit, path in paths.items():
+        with open(path, "rb") as f:
+            result[unit] = f.read()
+    return result
+
+class PreloadedFormat:
+    """読み込み済みのデータを iter_row_batches で返す、合算処理のみの計測用の中間形式"""
+    def __init__(self, data: dict):
+        self.data = data
+
+    def iter_row_batches(self, file_path: str):
+        for groups in self.data.values():
+            yield from groups.values()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=10000, help="1 ファイルあたりの行数")
+    parser.add_argument("--orders", type=int, default=2000, help="指図書No の種類数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_folder = os.path.join(tmp_dir, "Tmp")
+        generate_tmp_json_set(tmp_folder, args.files, args.rows, KEYWORDS, args.orders)
+        json_merger.TMP_FOLDER = tmp_folder
+        # 合算処理だけを比較するため、検索用インデックスは作らない（利用者の Cache にあるインデックスも上書きしない）
+        json_merger.QUERY_INDEX_ENABLED = False
+
+        timings = {}
+        outputs = {}
+        json_merger.OUT_FOLDER = os.path.join(tmp_dir, "Out_legacy")
+        start = time.perf_counter()
+        outputs["legacy"] = read_outputs(json_merger.write_unit_outputs(legacy_merge(load_tmp_files(KEYWORDS))))
+        timings["legacy"] = time.perf_counter() - start
+        json_merger.OUT_FOLDER = os.path.join(tmp_dir, "Out_current")
+        start = time.perf_counter()
+        outputs["current"] = read_outputs(json_merger.merge_json_files_by_unit(KEYWORDS))
+        timings["current"] = time.perf_counter() - start
+
+        # 読み込み・書き出しを除いた合算処理のみの時間
+        loaded = load_tmp_files(KEYWORDS)
+        preloaded = [(unit, filename, None, PreloadedFormat(data)) for unit, filename, data in loaded]
+        merge_only = {}
+        start = time.perf_counter()
+        legacy_merge(loaded)
+        merge_only["legacy"] = time.perf_counter() - start
+        start = time.perf_counter()
+        with gc_paused():
+            json_merger._merge_tmp_files(preloaded)
+        merge_only["current"] = time.perf_counter() - start
+
+        identical = outputs["legacy"] == outputs["current"]
+        print(f"files={args.files} rows/file={args.rows} orders={args.orders}")
+        for name, elapsed in timings.items():
+            print(f"{name:<8}: total {elapsed:.3f}s  merge only {merge_only[name]:.3f}s")
+        print(f"speedup : total {timings['legacy'] / timings['current']:.2f}x  "
+              f"merge only {merge_only['legacy'] / merge_only['current']:.2f}x  byte-identical={identical}")
+        if not identical:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+抽出結果の行表現のメモリ使用量を比較するベンチマーク。
+変更前の「行ごとに辞書を作る」実装と、シートで共有する RowSchema を参照する Record を比較する。
+抽出結果を保持したときのメモリ (retained) と、列指向アキュムレータで合算した後に保持されるメモリを
+tracemalloc で計測する。
+
+使い方:
+    python benchmarks/bench_row_memory.py --rows 200000 --extra-columns 15
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_ROOT)
+
+from benchmarks.generators import generate_sheet_rows
+from infrastructure.merge_accumulator import UnitMergeAccumulator
+from infrastructure.xlsx_extractor import _iter_grouped_rows
+
+def legacy_iter_grouped_rows(rows):
+    """比較用: 変更前の、行ごとに辞書を作る実装"""
+    rows = iter(rows)
+    header_row = next(rows, None)
+    if header_row is None:
+        return
+    headers = list(header_row)
+    width = len(headers)
+    try:
+        group_index = headers.index("グループ")
+    except ValueError:
+        group_index = 0
+    current_group = None
+    for row in rows:
+        if all(cell is None for cell in row):
+            continue
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
+        row_dict = {header: value for header, value in zip(headers, row)}
+        group_value = row[group_index]
+        if group_value is not None and str(group_value).strip() != "":
+            current_group = group_value
+        if current_group is None:
+            current_group = "UNDEFINED"
+        is_group_header = False
+        if group_value is not None and str(group_value).strip() != "":
+            other_values = [row_dict[header] for i, header in enumerate(headers) if i != group_index]
+            if all(val is None for val in other_values):
+                is_group_header = True
+        row_dict["グループ"] = current_group
+        if is_group_header:
+            continue
+        yield current_group, row_dict
+
+def collect(iter_grouped_rows, sheet_rows) -> dict:
+    data_by_group = {}
+    for group, row in iter_grouped_rows(sheet_rows):
+        data_by_group.setdefault(group, []).append(row)
+    return data_by_group
+
+def measure(iter_grouped_rows, args):
+    """(抽出時間, 抽出結果の保持メモリ, 合算後の保持メモリ) を返す"""
+    sheet_rows = generate_sheet_rows(args.rows, args.extra_columns)
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    data = collect(iter_grouped_rows, sheet_rows)
+    elapsed = time.perf_counter() - start
+    # XLSX から読んだ行タプルは、辞書版では抽出後に不要になる。Record 版は参照を保持し続ける
+    del sheet_rows
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - base
+
+    accumulator = UnitMergeAccumulator()
+    accumulator.add_file("bench.xlsx", data.values())
+    del data
+    gc.collect()
+    merged = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return elapsed, retained, merged
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--extra-columns", type=int, default=15, help="HEADERS に追加する列数")
+    args = parser.parse_args()
+
+    print(f"rows={args.rows} columns={5 + args.extra_columns}")
+    results = {}
+    for name, func in (("dict", legacy_iter_grouped_rows), ("record", _iter_grouped_rows)):
+        elapsed, retained, merged = measure(func, args)
+        results[name] = retained
+        print(f"{name:<7}: extract {args.rows / elapsed:>10,.0f} rows/s  "
+              f"retained {retained / 1024 / 1024:8.2f}MiB  after merge {merged / 1024 / 1024:8.2f}MiB")
+    print(f"retained memory: {results['record'] / results['dict']:.1%} of dict rows")
+
+if __name__ == "__main__":
+    main()
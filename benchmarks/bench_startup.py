@@ -0,0 +1,121 @@
+"""
+GUI の起動時間のベンチマーク。
+
+  import : `python -X importtime -c "import main"` で計測した main の読み込み時間 (累積) と、
+           読み込みに時間のかかったモジュールの上位。起動時に読み込まれてはいけない重いモジュール
+           (openpyxl や処理系のモジュール) が読み込まれていないかも確認する。
+  paint  : `python main.py` 相当のプロセスを起動してから、最初にウィンドウが表示される (<Map> イベント) までの時間。
+           ディスプレイがない環境では計測を省略する。
+
+使い方:
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 起動時に読み込まれてはいけないモジュール（各処理を最初に実行するときに読み込む）
+DEFERRED_MODULES = [
+    "openpyxl",
+    "use_cases.extraction_pipeline",
+    "infrastructure.xlsx_extractor",
+    "infrastructure.json_merger",
+    "infrastructure.json_to_csv",
+    "concurrent.futures.process",
+    "sqlite3",
+]
+
+# main() を実行し、最初の <Map> イベントで時刻を出力して終了する
+PAINT_SCRIPT = """
+import sys, time, tkinter
+original_mainloop = tkinter.Misc.mainloop
+
+def mainloop(self, n=0):
+    def on_map(event):
+        if not getattr(self, "_bench_mapped", False):
+            self._bench_mapped = True
+            print("FIRST_PAINT", time.time(), flush=True)
+            self.after(0, self.destroy)
+    self.bind("<Map>", on_map, add="+")
+    original_mainloop(self, n)
+
+tkinter.Misc.mainloop = mainloop
+import main
+main.main()
+"""
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def measure_import(python: str) -> tuple:
+    """(main の累積読み込み時間 [秒], 自身の読み込み時間の上位 [(秒, モジュール)], 読み込まれたモジュールの集合)"""
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", "import main"],
+        cwd=SRC_ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import main に失敗しました")
+    total = 0.0
+    entries = []
+    modules = set()
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, name = match.groups()
+        modules.add(name)
+        entries.append((int(self_us) / 1e6, name))
+        if name == "main":
+            total = int(cumulative_us) / 1e6
+    entries.sort(reverse=True)
+    return total, entries[:10], modules
+
+def measure_first_paint(python: str, timeout: float = 60.0):
+    """プロセス起動から最初のウィンドウ表示までの秒数。表示できない環境では None"""
+    start = time.time()
+    proc = subprocess.run(
+        [python, "-c", PAINT_SCRIPT], cwd=SRC_ROOT, capture_output=True, text=True, timeout=timeout,
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("FIRST_PAINT"):
+            return float(line.split()[1]) - start
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--python", default=sys.executable)
+    args = parser.parse_args()
+
+    totals = []
+    top = []
+    modules = set()
+    for _ in range(args.repeat):
+        total, top, modules = measure_import(args.python)
+        totals.append(total)
+    print(f"import main: median {statistics.median(totals) * 1000:8.1f}ms  min {min(totals) * 1000:8.1f}ms")
+    for seconds, name in top:
+        print(f"    {seconds * 1000:8.1f}ms  {name}")
+    loaded = [name for name in DEFERRED_MODULES if name in modules]
+    print(f"deferred modules loaded at startup: {', '.join(loaded) if loaded else 'none'}")
+
+    paints = []
+    for _ in range(args.repeat):
+        elapsed = measure_first_paint(args.python)
+        if elapsed is None:
+            break
+        paints.append(elapsed)
+    if paints:
+        print(f"first paint: median {statistics.median(paints) * 1000:8.1f}ms  min {min(paints) * 1000:8.1f}ms")
+    else:
+        print("first paint: skipped (ウィンドウを表示できませんでした。ディスプレイのある環境で実行してください)")
+    if loaded:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
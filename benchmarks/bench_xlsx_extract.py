@@ -0,0 +1,64 @@
+"""
+extract_xlsx_records の通常モードと読み取り専用ストリーミングモードの
+処理時間・ピークメモリ (RSS) を比較するベンチマーク。
+
+使い方:
+    python benchmarks/bench_xlsx_extract.py --rows 100000 200000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_ROOT)
+
+MODES = ("full", "streaming", "iter")
+
+def run_worker(mode: str, path: str):
+    from infrastructure.xlsx_extractor import extract_xlsx_records, iter_xlsx_rows
+
+    start = time.perf_counter()
+    if mode == "iter":
+        count = sum(1 for _ in iter_xlsx_rows(path))
+    else:
+        data = extract_xlsx_records(path, streaming=(mode == "streaming"))
+        count = sum(len(rows) for groups in data.values() for rows in groups.values())
+    elapsed = time.perf_counter() - start
+    # Linux では ru_maxrss は KiB 単位
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"mode": mode, "rows": count, "seconds": elapsed, "peak_rss_mib": peak_kib / 1024}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[50000, 200000])
+    parser.add_argument("--sheets", type=int, default=1)
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    from benchmarks.generators import generate_workbook
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in args.rows:
+            path = generate_workbook(os.path.join(tmp_dir, f"bench_{rows}.xlsx"), sheets=args.sheets, rows=rows)
+            for mode in MODES:
+                # ピークメモリを独立して測るため、モードごとに別プロセスで実行する
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--worker", mode, path],
+                    check=True, capture_output=True, text=True, cwd=SRC_ROOT,
+                )
+                result = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"rows={rows:>8} sheets={args.sheets} mode={mode:<9} "
+                      f"extracted={result['rows']:>8} time={result['seconds']:.2f}s "
+                      f"peak_rss={result['peak_rss_mib']:.1f}MiB")
+
+if __name__ == "__main__":
+    main()
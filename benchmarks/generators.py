@@ -0,0 +1,125 @@
+"""
+ベンチマーク用の合成データ生成ユーティリティ。
+"""
+import os
+import random
+
+HEADERS = ["グループ", "指図書No", "補足", "時間", "作業内容"]
+
+def generate_workbook(path: str, sheets: int = 1, rows: int = 10000, group_every: int = 50,
+                      null_time_rate: float = 0.05, seed: int = 0, distinct_orders: int = 500) -> str:
+    """
+    実績表を模した XLSX ファイルを path に生成する。
+
+    ・各シートの 1 行目はヘッダー（HEADERS）。
+    ・group_every 行ごとに「グループ」列だけに値が入ったグループ変更用行を挿入する。
+    ・null_time_rate の割合で「時間」列を空欄にする。
+    ・指図書No は distinct_orders 種類の中から選ぶ。
+    """
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    for sheet_index in range(sheets):
+        ws = workbook.create_sheet(title=f"{sheet_index + 1}月")
+        ws.append(HEADERS)
+        group_no = 0
+        for i in range(rows):
+            if i % group_every == 0:
+                group_no += 1
+                ws.append([f"G{group_no:03d}", None, None, None, None])
+                continue
+            time_val = None if rng.random() < null_time_rate else round(rng.uniform(0.25, 8.0), 2)
+            ws.append([None, f"A-{rng.randint(1, distinct_orders):04d}", rng.choice(["", "残業", "休日"]), time_val,
+                       "作業"])
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    workbook.save(path)
+    return path
+
+def generate_sheet_rows(rows: int = 10000, extra_columns: int = 0, group_every: int = 50,
+                        null_time_rate: float = 0.05, seed: int = 0) -> list:
+    """
+    generate_workbook と同じ内容のシートを、ws.iter_rows(values_only=True) が返す行タプルのリストとして生成する。
+    extra_columns を指定すると、HEADERS の後ろに文字列の列を追加して幅の広いシートを模す。
+    各セルの文字列は XLSX の読み込みと同様に行ごとに別のオブジェクトとなる。
+    """
+    rng = random.Random(seed)
+    extra_headers = [f"項目{i + 1}" for i in range(extra_columns)]
+    result = [tuple(HEADERS + extra_headers)]
+    group_no = 0
+    for i in range(rows):
+        if i % group_every == 0:
+            group_no += 1
+            result.append((f"G{group_no:03d}",) + (None,) * (len(HEADERS) - 1 + extra_columns))
+            continue
+        time_val = None if rng.random() < null_time_rate else round(rng.uniform(0.25, 8.0), 2)
+        extras = tuple(f"値{rng.randint(1, 100)}" for _ in range(extra_columns))
+        result.append((None, f"A-{rng.randint(1, 500):04d}", rng.choice(["", "残業", "休日"]), time_val,
+                       f"作業{i % 3}") + extras)
+    return result
+
+def generate_tree(root: str, depth: int = 4, fanout: int = 4, files_per_dir: int = 20,
+                  hit_rate: float = 0.1, keywords=("金子", "本間"), seed: int = 0,
+                  workbook_rows: int = 0, workbook_sheets: int = 1) -> int:
+    """
+    IN フォルダを模したディレクトリツリーを root 以下に生成し、作成したファイル数を返す。
+    hit_rate の割合でファイル名にキーワードを含める（中身は空）。
+    workbook_rows を指定すると、キーワードを含む .xlsx ファイルだけは generate_workbook で
+    workbook_sheets シート × workbook_rows 行の実際のブックとして生成する（抽出まで通して計測する用途）。
+    """
+    rng = random.Random(seed)
+    count = 0
+    stack = [(root, 0)]
+    while stack:
+        folder, level = stack.pop()
+        os.makedirs(folder, exist_ok=True)
+        for i in range(files_per_dir):
+            keyword = rng.choice(keywords) if rng.random() < hit_rate else "その他"
+            ext = rng.choice([".xlsx", ".xlsx", ".pdf", ".txt"])
+            path = os.path.join(folder, f"実績_{keyword}_{i:04d}{ext}")
+            if workbook_rows and ext == ".xlsx" and keyword in keywords:
+                generate_workbook(path, workbook_sheets, workbook_rows, seed=rng.randrange(1 << 30))
+            else:
+                open(path, "wb").close()
+            count += 1
+        if level < depth:
+            for j in range(fanout):
+                stack.append((os.path.join(folder, f"dir{j:02d}"), level + 1))
+    return count
+
+def generate_extracted_data(rows: int = 10000, distinct_orders: int = 2000, null_time_rate: float = 0.05,
+                            rng: random.Random = None) -> dict:
+    """extract_xlsx_to_json の戻り値を模した { sheet: { group: [row, ...] } } を生成する"""
+    rng = rng or random.Random(0)
+    groups = {}
+    for _ in range(rows):
+        group = f"G{rng.randint(1, 20):03d}"
+        time_val = None if rng.random() < null_time_rate else round(rng.uniform(0.25, 8.0), 2)
+        groups.setdefault(group, []).append({
+            "グループ": group,
+            "指図書No": f"A-{rng.randint(1, distinct_orders):05d}",
+            "補足": rng.choice(["", "残業", "休日"]),
+            "時間": time_val,
+            "作業内容": "作業",
+        })
+    return {"1月": groups}
+
+def generate_tmp_json_set(folder: str, files: int = 20, rows_per_file: int = 10000, units=("金子", "本間"),
+                          distinct_orders: int = 2000, null_time_rate: float = 0.05, seed: int = 0) -> list:
+    """
+    TMP_FOLDER を模した抽出結果 JSON ({ sheet: { group: [row, ...] } }) を folder に files 個生成し、
+    作成したファイルパスのリストを返す。ファイル名には units のいずれかを含める。
+    """
+    import json
+
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for file_index in range(files):
+        unit = units[file_index % len(units)]
+        data = generate_extracted_data(rows_per_file, distinct_orders, null_time_rate, rng)
+        path = os.path.join(folder, f"実績_{file_index:04d}_{unit}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        paths.append(path)
+    return paths
@@ -0,0 +1,250 @@
+"""
+ファイル探索 → XLSX 抽出 → 合算 → CSV 変換 の各工程を、データ量の段階 (tier) ごとに計測するベンチマークスイート。
+
+  search  : generate_tree で生成した IN ツリーに対する search_files（探索したファイル数 / 秒）
+  extract : generate_workbook で生成したブックに対する extract_xlsx_records（行 / 秒, MiB / 秒）
+  merge   : generate_tmp_json_set で生成した TMP JSON に対する merge_json_files_by_unit（行 / 秒, MiB / 秒）
+            検索用インデックスの作成は含めない
+  index   : merge の出力 (output_{unit}.json) に対する build_query_index（行 / 秒, MiB / 秒）
+  csv     : merge の出力 (output_{unit}.json) に対する convert_json_file_to_csv（行 / 秒, MiB / 秒）
+
+各工程は --repeat 回実行した所要時間の中央値・最小値と、別に 1 回 tracemalloc を有効にして測った
+メモリ使用量のピークを記録する。結果は JSON ファイルに保存し、--compare で以前の結果（別のコミットで
+実行したものなど）と比較できる。openpyxl がない環境では extract を省略する。
+
+使い方:
+    python benchmarks/run_suite.py --tiers small medium --output before.json
+    python benchmarks/run_suite.py --tiers small medium --output after.json --compare before.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_ROOT)
+
+from benchmarks.generators import generate_tmp_json_set, generate_tree, generate_workbook
+from config import PROJECT_ROOT
+
+KEYWORDS = ["金子", "本間"]
+
+# 段階ごとのデータ量
+#   tree     : generate_tree の引数（IN ツリーの深さ・分岐数・1 フォルダのファイル数・キーワードの出現率）
+#   workbook : generate_workbook の引数（シート数・1 シートの行数・グループ変更行の間隔・時間が空欄の割合）
+#   tmp      : generate_tmp_json_set の引数（ファイル数・1 ファイルの行数・指図書No の種類数）
+TIERS = {
+    "small": {
+        "tree": {"depth": 2, "fanout": 3, "files_per_dir": 20, "hit_rate": 0.1},
+        "workbook": {"sheets": 1, "rows": 2000, "group_every": 50, "null_time_rate": 0.05},
+        "tmp": {"files": 5, "rows_per_file": 2000, "distinct_orders": 500},
+    },
+    "medium": {
+        "tree": {"depth": 3, "fanout": 4, "files_per_dir": 30, "hit_rate": 0.1},
+        "workbook": {"sheets": 3, "rows": 10000, "group_every": 50, "null_time_rate": 0.05},
+        "tmp": {"files": 20, "rows_per_file": 10000, "distinct_orders": 2000},
+    },
+    "large": {
+        "tree": {"depth": 4, "fanout": 5, "files_per_dir": 40, "hit_rate": 0.1},
+        "workbook": {"sheets": 6, "rows": 30000, "group_every": 50, "null_time_rate": 0.05},
+        "tmp": {"files": 40, "rows_per_file": 30000, "distinct_orders": 5000},
+    },
+}
+
+def measure(func, repeat: int) -> tuple:
+    """func を repeat 回実行し、(最後の戻り値, {"median_seconds", "min_seconds", "peak_memory_bytes"}) を返す"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    # tracemalloc は処理を遅くするため、時間とは別に 1 回だけ実行してピークを測る
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {
+        "median_seconds": round(statistics.median(times), 6),
+        "min_seconds": round(min(times), 6),
+        "peak_memory_bytes": peak,
+    }
+
+def _throughput(stats: dict, rows: int = None, size: int = None, files: int = None) -> dict:
+    seconds = stats["median_seconds"] or 1e-9
+    if rows is not None:
+        stats["rows"] = rows
+        stats["rows_per_second"] = round(rows / seconds, 1)
+    if size is not None:
+        stats["bytes"] = size
+        stats["mib_per_second"] = round(size / 1024 / 1024 / seconds, 3)
+    if files is not None:
+        stats["files"] = files
+        stats["files_per_second"] = round(files / seconds, 1)
+    return stats
+
+def bench_search(work_dir: str, spec: dict, repeat: int) -> dict:
+    from domain.file_searcher import search_files
+
+    root = os.path.join(work_dir, "In")
+    total = generate_tree(root, keywords=tuple(KEYWORDS), **spec)
+    matched, stats = measure(lambda: search_files(root, KEYWORDS, max_depth=spec["depth"]), repeat)
+    stats["matched"] = len(matched)
+    return _throughput(stats, files=total)
+
+def bench_extract(work_dir: str, spec: dict, repeat: int) -> dict:
+    try:
+        import openpyxl  # noqa: F401
+        path = generate_workbook(os.path.join(work_dir, "実績_金子.xlsx"), **spec)
+    except Exception as e:
+        return {"skipped": f"ブックを生成できません: {e}"}
+    from infrastructure.xlsx_extractor import extract_xlsx_records
+
+    data, stats = measure(lambda: extract_xlsx_records(path), repeat)
+    rows = sum(len(rows) for groups in data.values() for rows in groups.values())
+    return _throughput(stats, rows=rows, size=os.path.getsize(path))
+
+def bench_merge(work_dir: str, spec: dict, repeat: int) -> tuple:
+    """merge の計測結果と、CSV 変換の入力にする出力ファイルパスの辞書を返す"""
+    from infrastructure import json_merger
+
+    tmp_folder = os.path.join(work_dir, "Tmp")
+    paths = generate_tmp_json_set(tmp_folder, units=tuple(KEYWORDS), **spec)
+    json_merger.TMP_FOLDER = tmp_folder
+    json_merger.OUT_FOLDER = os.path.join(work_dir, "Out")
+    json_merger.WRITE_CSV_ON_MERGE = False
+    # 利用者の Cache にある検索用インデックスを上書きしないよう、作成は index の工程で作業フォルダに対して計測する
+    json_merger.QUERY_INDEX_ENABLED = False
+    output_paths, stats = measure(lambda: json_merger.merge_json_files_by_unit(KEYWORDS), repeat)
+    size = sum(os.path.getsize(path) for path in paths)
+    return _throughput(stats, rows=spec["files"] * spec["rows_per_file"], size=size), output_paths
+
+def bench_index(work_dir: str, output_paths: dict, repeat: int) -> dict:
+    from infrastructure.query_index import build_query_index
+
+    if not output_paths:
+        return {"skipped": "合算結果がありません"}
+    final_output = {}
+    for unit, path in output_paths.items():
+        with open(path, encoding="utf-8") as f:
+            final_output[unit] = json.load(f)
+    db_path = os.path.join(work_dir, "query_index.sqlite3")
+    _, stats = measure(lambda: build_query_index(final_output, db_path=db_path), repeat)
+    rows = sum(len(rows) for groups in final_output.values() for rows in groups.values())
+    size = sum(os.path.getsize(path) for path in output_paths.values())
+    return _throughput(stats, rows=rows, size=size)
+
+def bench_csv(work_dir: str, output_paths: dict, repeat: int) -> dict:
+    from infrastructure.json_to_csv import convert_json_file_to_csv
+
+    pairs = [(path, os.path.join(work_dir, f"{unit}.csv")) for unit, path in output_paths.items()]
+    if not pairs:
+        return {"skipped": "合算結果がありません"}
+
+    def convert_all():
+        return all(convert_json_file_to_csv(json_path, csv_path) for json_path, csv_path in pairs)
+
+    ok, stats = measure(convert_all, repeat)
+    if not ok:
+        return {"skipped": "CSV 変換に失敗しました"}
+    rows = 0
+    for _, csv_path in pairs:
+        with open(csv_path, "rb") as f:
+            rows += max(sum(1 for _ in f) - 1, 0)
+    size = sum(os.path.getsize(json_path) for json_path, _ in pairs)
+    return _throughput(stats, rows=rows, size=size)
+
+def run_tier(name: str, repeat: int) -> dict:
+    spec = TIERS[name]
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = {"search": bench_search(work_dir, spec["tree"], repeat),
+                   "extract": bench_extract(work_dir, spec["workbook"], repeat)}
+        results["merge"], output_paths = bench_merge(work_dir, spec["tmp"], repeat)
+        results["index"] = bench_index(work_dir, output_paths, repeat)
+        results["csv"] = bench_csv(work_dir, output_paths, repeat)
+    return results
+
+def git_commit() -> str:
+    try:
+        proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SRC_ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    if proc.returncode != 0:
+        return None
+    return proc.stdout.strip() or None
+
+def format_stats(stats: dict) -> str:
+    if "skipped" in stats:
+        return f"skipped ({stats['skipped']})"
+    parts = [f"median {stats['median_seconds'] * 1000:9.1f}ms", f"peak {stats['peak_memory_bytes'] / 1024 / 1024:8.1f}MiB"]
+    if "rows_per_second" in stats:
+        parts.append(f"{stats['rows_per_second']:>12,.0f} rows/s")
+    if "files_per_second" in stats:
+        parts.append(f"{stats['files_per_second']:>12,.0f} files/s")
+    if "mib_per_second" in stats:
+        parts.append(f"{stats['mib_per_second']:8.2f} MiB/s")
+    return "  ".join(parts)
+
+def compare(current: dict, previous: dict):
+    """同じ tier・工程の中央値とピークメモリを、以前の結果に対する比（current / previous）で表示する"""
+    print(f"\ncompare with {previous.get('commit') or '?'} ({previous.get('created_at')}): ratio = current / previous")
+    for tier, stages in current["tiers"].items():
+        for stage, stats in stages.items():
+            before = previous.get("tiers", {}).get(tier, {}).get(stage)
+            if not before or "skipped" in stats or "skipped" in before:
+                continue
+            time_ratio = stats["median_seconds"] / before["median_seconds"] if before["median_seconds"] else float("nan")
+            memory_ratio = (stats["peak_memory_bytes"] / before["peak_memory_bytes"]
+                            if before["peak_memory_bytes"] else float("nan"))
+            print(f"  {tier:<7} {stage:<8} time {time_ratio:6.2f}x  peak memory {memory_ratio:6.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiers", nargs="+", choices=list(TIERS), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None,
+                        help="結果の保存先 (既定: PROJECT_ROOT/Benchmarks/suite_{commit}_{日時}.json)")
+    parser.add_argument("--compare", default=None, help="比較する以前の結果ファイル")
+    args = parser.parse_args()
+
+    created_at = datetime.now()
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": created_at.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "tiers": {},
+    }
+    for tier in args.tiers:
+        print(f"[{tier}]")
+        report["tiers"][tier] = run_tier(tier, args.repeat)
+        for stage, stats in report["tiers"][tier].items():
+            print(f"  {stage:<8} {format_stats(stats)}")
+
+    output = args.output or os.path.join(
+        PROJECT_ROOT, "Benchmarks", f"suite_{commit or 'unknown'}_{created_at.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    print(f"results: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
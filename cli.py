@@ -0,0 +1,170 @@
+"""
+GUI を使わずに 探索 → 抽出 → 合算 → (CSV 変換) を実行するコマンドラインのエントリーポイント。
+バッチサーバーや cron からの定期実行用で、tkinter は読み込まない。
+
+使い方:
+    python cli.py /path/to/In --keywords 金子 本間 --workers 4 --csv
+
+終了コード:
+    0: すべてのファイルを処理できた
+    1: 一部のファイルの処理に失敗した（合算結果は成功したファイルのみで作成）
+    2: 致命的なエラー（入力フォルダがない・すべてのファイルの処理に失敗した・合算に失敗したなど）
+    130: 中断された (Ctrl+C)
+"""
+import argparse
+import logging
+import os
+import sys
+from config import (
+    IN_FOLDER, OUT_FOLDER, TMP_FOLDER, ERR_FOLDER, LOG_FILE, KEYWORDS, DIRECT_MERGE, INCREMENTAL_MERGE,
+    INTERMEDIATE_FORMAT, RUN_REPORT_FOLDER, EXTRACTION_CACHE_FILE,
+)
+
+EXIT_OK = 0
+EXIT_PARTIAL_FAILURE = 1
+EXIT_FATAL = 2
+EXIT_INTERRUPTED = 130
+
+logger = logging.getLogger("cli")
+
+def setup_logging(level: str):
+    """コンソール (標準エラー出力) と ERR_FOLDER のログファイルに出力する"""
+    os.makedirs(ERR_FOLDER, exist_ok=True)
+    logging.basicConfig(
+        level=getattr(logging, level),
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(LOG_FILE, encoding="utf-8")
+        ]
+    )
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_folder", nargs="?", default=IN_FOLDER, help="探索する IN フォルダ (既定: config.IN_FOLDER)")
+    parser.add_argument("--keywords", nargs="+", default=KEYWORDS, help="単位となるキーワード (既定: config.KEYWORDS)")
+    parser.add_argument("--workers", type=int, default=None, help="並列ワーカー数 (既定: config.MAX_WORKERS)")
+    parser.add_argument("--max-depth", type=int, default=3, help="探索するフォルダの深さ (インデックス不使用時)")
+    parser.add_argument("--mode", choices=("direct", "tmp"), default="direct" if DIRECT_MERGE else "tmp",
+                        help="direct: 抽出結果をそのまま合算 / tmp: TMP 中間ファイルを経由して合算")
+    parser.add_argument("--intermediate-format", choices=("json", "rowpack", "ndjson"), default=INTERMEDIATE_FORMAT,
+                        help="TMP 中間ファイルの形式")
+    parser.add_argument("--csv", action="store_true", help="合算結果を CSV にも変換する")
+    parser.add_argument("--no-cache", action="store_true", help="抽出キャッシュを使わない")
+    parser.add_argument("--clear-cache", action="store_true", help="実行前に抽出キャッシュを空にする")
+    parser.add_argument("--no-index", action="store_true", help="ディレクトリインデックスを使わずに探索する")
+    parser.add_argument("--no-incremental", action="store_true", help="増分合算を使わずに選択したファイルだけで合算する")
+    parser.add_argument("--reset-state", action="store_true", help="実行前に増分合算の状態を削除する")
+    parser.add_argument("--report-folder", default=RUN_REPORT_FOLDER, help="実行レポートの出力先")
+    parser.add_argument("--profile-cpu", action="store_true", help="実行レポートに cProfile の結果を含める")
+    parser.add_argument("--profile-memory", action="store_true", help="実行レポートに tracemalloc の結果を含める")
+    parser.add_argument("-q", "--quiet", action="store_true", help="進捗と要約を表示しない")
+    parser.add_argument("--log-level", choices=("DEBUG", "INFO", "WARNING", "ERROR"), default="WARNING")
+    return parser
+
+def _progress_printer(label: str, quiet: bool):
+    if quiet:
+        return None
+
+    def report(done, total, message=None):
+        print(f"\r{label}: {done}/{total}", end="\n" if done >= total else "", file=sys.stderr, flush=True)
+    return report
+
+def run(args, metrics) -> int:
+    from use_cases.extraction_pipeline import (
+        reset_incremental_state, run_direct_merge_pipeline, run_extraction_pipeline,
+    )
+    from use_cases.file_search_usecase import get_matched_files
+    from infrastructure.clear_folder import clear_folder_contents
+
+    if not os.path.isdir(args.input_folder):
+        logger.error("入力フォルダが存在しません: %s", args.input_folder)
+        return EXIT_FATAL
+    direct = args.mode == "direct"
+    incremental = direct and not args.no_incremental and INCREMENTAL_MERGE
+
+    if args.clear_cache:
+        from infrastructure.extraction_cache import ExtractionCache
+        cache = ExtractionCache(EXTRACTION_CACHE_FILE)
+        try:
+            cache.clear()
+        finally:
+            cache.close()
+    if args.reset_state:
+        reset_incremental_state()
+
+    with metrics.stage("discovery"):
+        if args.no_index:
+            from domain.file_searcher import search_files
+            files = search_files(args.input_folder, args.keywords, max_depth=args.max_depth)
+        else:
+            files = get_matched_files(args.input_folder, args.keywords, use_index=True)
+    metrics.count("discovered", len(files))
+    if not args.quiet:
+        print(f"対象ファイル: {len(files)} 件", file=sys.stderr)
+
+    # UI と同様に、前回の出力（TMP モードでは中間ファイルも）を削除してから実行する
+    clear_folder_contents(OUT_FOLDER)
+    progress = _progress_printer("抽出", args.quiet)
+    if direct:
+        pipeline_result, output_paths = run_direct_merge_pipeline(
+            files, args.input_folder, args.keywords, max_workers=args.workers, progress_callback=progress,
+            use_cache=not args.no_cache, incremental=incremental,
+            intermediate_format=args.intermediate_format, metrics=metrics,
+        )
+    else:
+        from infrastructure.json_merger import merge_json_files_by_unit
+        clear_folder_contents(TMP_FOLDER)
+        pipeline_result = run_extraction_pipeline(
+            files, args.input_folder, max_workers=args.workers, progress_callback=progress,
+            use_cache=not args.no_cache, intermediate_format=args.intermediate_format, metrics=metrics,
+        )
+        with metrics.stage("merge"):
+            output_paths = merge_json_files_by_unit(args.keywords)
+    metrics.count("units", len(output_paths))
+    if pipeline_result.results and not pipeline_result.succeeded:
+        logger.error("すべてのファイルの処理に失敗しました")
+        return EXIT_FATAL
+
+    if args.csv and output_paths:
+        from infrastructure.json_to_csv import convert_json_files_to_csv
+        file_pairs = [(path, os.path.splitext(path)[0] + ".csv") for path in output_paths.values()]
+        with metrics.stage("csv"):
+            csv_results = convert_json_files_to_csv(file_pairs, max_workers=args.workers,
+                                                    progress_callback=_progress_printer("CSV", args.quiet))
+        csv_failures = [path for path, ok in csv_results.items() if not ok]
+        metrics.count("csv_failed", len(csv_failures))
+        for path in csv_failures:
+            metrics.failures.append({"file": path, "error": "CSV 変換に失敗しました"})
+
+    if not args.quiet:
+        for unit, path in output_paths.items():
+            print(f"{unit}: {path}", file=sys.stderr)
+    if metrics.failures:
+        return EXIT_PARTIAL_FAILURE
+    return EXIT_OK
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    setup_logging(args.log_level)
+    from infrastructure.instrumentation import RunMetrics
+
+    metrics = RunMetrics("cli", profile_cpu=args.profile_cpu, profile_memory=args.profile_memory).start()
+    try:
+        exit_code = run(args, metrics)
+    except KeyboardInterrupt:
+        logger.error("中断されました")
+        exit_code = EXIT_INTERRUPTED
+    except Exception as e:
+        logger.exception("処理中に致命的なエラーが発生しました: %s", e)
+        metrics.failures.append({"file": None, "error": str(e) or type(e).__name__})
+        exit_code = EXIT_FATAL
+    metrics.counters["exit_code"] = exit_code
+    metrics.finish()
+    metrics.write_report(args.report_folder)
+    if not args.quiet:
+        print(metrics.summary_text(), file=sys.stderr)
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
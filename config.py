@@ -14,3 +14,66 @@ LOG_FILE = os.path.join(ERR_FOLDER, "error.log")
 
 # 検索対象キーワード
 KEYWORDS = ["金子", "本間"]
+
+# XLSX を読み取り専用（ストリーミング）モードで読み込むかどうか
+XLSX_STREAMING = True
+
+# 情報取得処理の並列ワーカー数（None の場合は CPU 数）
+MAX_WORKERS = None
+
+# 抽出結果キャッシュ（TMP_FOLDER とは別に保持し、フォルダ選択時にも削除しない）
+CACHE_FOLDER = os.path.join(PROJECT_ROOT, "Cache")
+EXTRACTION_CACHE_ENABLED = True
+EXTRACTION_CACHE_FILE = os.path.join(CACHE_FOLDER, "extraction_cache.sqlite3")
+EXTRACTION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# IN フォルダのディレクトリインデックス（再選択時は更新のあったディレクトリのみ走査する）
+DIRECTORY_INDEX_ENABLED = True
+DIRECTORY_INDEX_FILE = os.path.join(CACHE_FOLDER, "directory_index.sqlite3")
+
+# 直接合算モード: 抽出結果を TMP JSON を経由せずに合算する
+DIRECT_MERGE = True
+# 直接合算モードでも TMP JSON を書き出すかどうか（デバッグ用）
+WRITE_TMP_JSON = False
+
+# 増分合算: 単位ごとの合算状態を保存し、追加・変更されたファイルの分だけ更新する
+# 状態は元ファイルの絶対パスで管理し、今回選択しなかったファイル・処理に失敗したファイルの寄与は取り除く
+# ファイルごとの寄与とキーごとの合計を SQLite に保存し、更新はそのファイルの行数分だけで済む
+INCREMENTAL_MERGE = True
+MERGE_STATE_FILE = os.path.join(CACHE_FOLDER, "merge_state.sqlite3")
+
+# 合算時に、合算結果 (メモリ上) から CSV も直接書き出すかどうか
+WRITE_CSV_ON_MERGE = False
+
+# TMP_FOLDER に保存する中間形式 ("json": インデント付き JSON / "rowpack": ヘッダー 1 回 + 行配列のバイナリ /
+#   "ndjson": 1 行 1 レコードの JSON。rowpack と ndjson はメモリマップで少しずつ読み込む)
+INTERMEDIATE_FORMAT = "json"
+
+# これより大きい JSON 中間ファイルは、一括読み込みせずにメモリマップしてストリーミングで読み込む (バイト)
+JSON_STREAMING_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+# 実行レポート (工程ごとの所要時間・件数などの JSON) の出力先
+RUN_REPORT_ENABLED = True
+RUN_REPORT_FOLDER = ERR_FOLDER
+# 処理の種類 (情報取得・合算など) ごとに残す実行レポートの数。古いものから削除する (None なら削除しない)
+RUN_REPORT_KEEP = 20
+# 実行レポートに cProfile (CPU) / tracemalloc (メモリ) の計測結果を含めるかどうか（処理が遅くなるため通常は False）
+PROFILE_CPU = False
+PROFILE_MEMORY = False
+
+# ファイルのコピー・削除を並列に行うスレッド数（ネットワーク共有では待ち時間が大きいため CPU 数より多めにする）
+BULK_TRANSFER_WORKERS = 8
+# TMP へのコピー方法 ("copy": 通常のコピー / "reflink": 可能なら reflink、できなければコピー /
+#   "hardlink": reflink → ハードリンク → コピー の順に試す。ハードリンクは元ファイルと実体を共有する)
+COPY_LINK_MODE = "reflink"
+# コピー先にサイズ・更新時刻が同じファイルがあればコピーを省略するかどうか
+COPY_SKIP_UNCHANGED = True
+
+# シート単位の並列抽出: これ以上の大きさで複数のシートを持つブックは、シートを分けて複数のワーカーで抽出する (バイト)
+# ワーカー 1 つあたりの目安の大きさでもあり、ブックはおおよそこの大きさごとに分割する
+SHEET_SPLIT_ENABLED = True
+SHEET_SPLIT_MIN_BYTES = 8 * 1024 * 1024
+
+# 合算結果の検索用インデックス (SQLite)。合算のたびに、output_{unit}.json の内容が変わった単位だけをその場で更新する
+QUERY_INDEX_ENABLED = True
+QUERY_INDEX_FILE = os.path.join(CACHE_FOLDER, "query_index.sqlite3")
@@ -1,28 +1,86 @@
 import os
+import re
 import logging
 
 logger = logging.getLogger(__name__)
 
-def search_files(folder_path: str, keywords: list, current_depth: int = 0, max_depth: int = 3, base_folder: str = None) -> list:
+def compile_keyword_matcher(keywords: list):
+    """
+    キーワードのリストを 1 つの正規表現（選択 "|" の連結）にまとめ、
+    ファイル名を 1 回走査するだけで全キーワードとの部分一致を判定できるようにする。
+    """
+    if not keywords:
+        return None
+    # 長いキーワードを先に並べ、最長一致のキーワードを返しやすくする
+    ordered = sorted(set(keywords), key=len, reverse=True)
+    return re.compile("|".join(re.escape(keyword) for keyword in ordered))
+
+def _normalize_extensions(extensions) -> tuple:
+    if not extensions:
+        return None
+    return tuple(ext.lower() if ext.startswith(".") else f".{ext.lower()}" for ext in extensions)
+
+def iter_search_files(folder_path: str, keywords: list, max_depth: int = 3, extensions=None, cancel_event=None):
+    """
+    指定フォルダおよびサブディレクトリ（最大階層まで）から、
+    キーワードに部分一致するファイルの相対パスを 1 件ずつ返すジェネレータ。
+
+    ・os.scandir と明示的なスタックで走査し、再帰呼び出しやエントリごとの追加 stat を行わない。
+    ・extensions (例: [".xlsx"]) が指定されていれば、その拡張子のファイルのみを対象とする。
+    ・結果の順序は従来の search_files と同じ（ディレクトリの列挙順の深さ優先）。
+    ・cancel_event (threading.Event) がセットされると、次のディレクトリへ進む前に打ち切る。
+    """
+    matcher = compile_keyword_matcher(keywords)
+    if matcher is None:
+        return
+    extensions = _normalize_extensions(extensions)
+    # スタックの要素は (scandir イテレータ, 深さ)
+    stack = []
+    try:
+        stack.append((os.scandir(folder_path), 0))
+    except OSError as e:
+        logger.error("探索中のエラー: %s", e)
+        return
+    while stack:
+        iterator, depth = stack[-1]
+        try:
+            entry = next(iterator, None)
+        except OSError as e:
+            logger.error("探索中のエラー: %s", e)
+            entry = None
+        if entry is None:
+            iterator.close()
+            stack.pop()
+            continue
+        try:
+            if entry.is_file():
+                name = entry.name
+                if extensions and not name.lower().endswith(extensions):
+                    continue
+                if matcher.search(name):
+                    yield os.path.relpath(entry.path, folder_path)
+            elif entry.is_dir() and depth < max_depth:
+                if cancel_event is not None and cancel_event.is_set():
+                    for iterator, _ in stack:
+                        iterator.close()
+                    return
+                stack.append((os.scandir(entry.path), depth + 1))
+        except OSError as e:
+            logger.error("探索中のエラー: %s", e)
+
+def search_files(folder_path: str, keywords: list, current_depth: int = 0, max_depth: int = 3, base_folder: str = None, extensions=None) -> list:
     """
     指定フォルダおよびサブディレクトリ（最大階層まで）から、
     キーワードに部分一致するファイルの相対パスを取得する関数
     """
     if base_folder is None:
         base_folder = folder_path
-    matched_files = []
     if current_depth > max_depth:
-        return matched_files
-    try:
-        for entry in os.listdir(folder_path):
-            full_path = os.path.join(folder_path, entry)
-            if os.path.isfile(full_path):
-                if any(keyword in entry for keyword in keywords):
-                    matched_files.append(os.path.relpath(full_path, base_folder))
-            elif os.path.isdir(full_path):
-                matched_files.extend(
-                    search_files(full_path, keywords, current_depth + 1, max_depth, base_folder)
-                )
-    except Exception as e:
-        logger.error("探索中のエラー: %s", e)
-    return matched_files
+        return []
+    matched = iter_search_files(folder_path, keywords, max_depth - current_depth, extensions)
+    if base_folder == folder_path:
+        return list(matched)
+    return [
+        os.path.relpath(os.path.join(folder_path, rel_path), base_folder)
+        for rel_path in matched
+    ]
@@ -0,0 +1,185 @@
+import errno
+import logging
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from config import BULK_TRANSFER_WORKERS, COPY_LINK_MODE, COPY_SKIP_UNCHANGED
+from infrastructure.file_copier import flatten_relative_path
+
+logger = logging.getLogger(__name__)
+
+# 更新時刻を秒単位でしか保存できないファイルシステム (FAT は 2 秒単位) にコピーした場合に許容する、更新時刻の誤差
+MTIME_TOLERANCE_SECONDS = 2.0
+_MTIME_TOLERANCE_NS = int(MTIME_TOLERANCE_SECONDS * 1_000_000_000)
+
+# Linux の ioctl FICLONE（Btrfs / XFS などでデータを共有するコピー (reflink) を作る）
+_FICLONE = 0x40049409
+
+# リンク・reflink ができない場合に通常のコピーへ切り替えるエラー
+_LINK_FALLBACK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EACCES, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EINVAL,
+                         errno.ENOTTY, errno.EMLINK}
+
+@dataclass
+class TransferResult:
+    """1 ファイル分のコピー・削除の結果。action は "copied" / "reflink" / "hardlink" / "skipped" / "deleted"。"""
+    src: str
+    dest: str = None
+    action: str = None
+    error: str = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+def _has_coarse_mtime(st: os.stat_result) -> bool:
+    """更新時刻が秒単位に丸められている（FAT など時刻の精度が粗いファイルシステム上の）ファイルかどうか"""
+    return st.st_mtime_ns % 1_000_000_000 == 0
+
+def is_up_to_date(src: str, dest: str) -> bool:
+    """
+    dest が存在し、src とサイズ・更新時刻 (ナノ秒) が一致していれば True。
+    コピー (copy2) は更新時刻をそのまま引き継ぐため、通常は完全に一致する。
+    dest の更新時刻が秒単位に丸められている場合だけ、MTIME_TOLERANCE_SECONDS までの差を許容する。
+    """
+    try:
+        src_stat = os.stat(src)
+        dest_stat = os.stat(dest)
+    except OSError:
+        return False
+    if src_stat.st_size != dest_stat.st_size:
+        return False
+    if src_stat.st_mtime_ns == dest_stat.st_mtime_ns:
+        return True
+    return (_has_coarse_mtime(dest_stat)
+            and abs(src_stat.st_mtime_ns - dest_stat.st_mtime_ns) <= _MTIME_TOLERANCE_NS)
+
+def _reflink(src: str, dest: str):
+    """データブロックを共有するコピーを作る。対応していないファイルシステムでは OSError を送出する。"""
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.ENOTSUP, "reflink はこのプラットフォームでは使用できません")
+    import fcntl
+
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        fcntl.ioctl(fdest.fileno(), _FICLONE, fsrc.fileno())
+    shutil.copystat(src, dest)
+
+def _transfer(src: str, dest: str, link_mode: str) -> str:
+    """
+    src を dest に複製し、実際に使った方法を返す。
+    link_mode が "reflink" なら reflink → コピー、"hardlink" なら reflink → ハードリンク → コピー の順に試す。
+    一時ファイルに書いてから置き換えるため、途中で失敗しても不完全な dest は残らない。
+    """
+    tmp_dest = f"{dest}.part{os.getpid()}"
+    try:
+        if link_mode in ("reflink", "hardlink"):
+            try:
+                _reflink(src, tmp_dest)
+                os.replace(tmp_dest, dest)
+                return "reflink"
+            except OSError as e:
+                if e.errno not in _LINK_FALLBACK_ERRNOS:
+                    raise
+        if link_mode == "hardlink":
+            try:
+                if os.path.lexists(tmp_dest):
+                    os.remove(tmp_dest)
+                os.link(src, tmp_dest)
+                os.replace(tmp_dest, dest)
+                return "hardlink"
+            except OSError as e:
+                if e.errno not in _LINK_FALLBACK_ERRNOS:
+                    raise
+        shutil.copy2(src, tmp_dest)
+        os.replace(tmp_dest, dest)
+        return "copied"
+    finally:
+        if os.path.lexists(tmp_dest):
+            try:
+                os.remove(tmp_dest)
+            except OSError:
+                pass
+
+def copy_file(src: str, dest: str, skip_unchanged: bool = None, link_mode: str = None) -> TransferResult:
+    """
+    src を dest に複製する。skip_unchanged が True（未指定時は config.COPY_SKIP_UNCHANGED）で、
+    dest のサイズ・更新時刻が src と一致していればコピーを省略する。
+    link_mode は "copy" / "reflink" / "hardlink"（未指定時は config.COPY_LINK_MODE）。
+    失敗した場合は例外を送出せず、TransferResult.error に記録する。
+    """
+    if skip_unchanged is None:
+        skip_unchanged = COPY_SKIP_UNCHANGED
+    if link_mode is None:
+        link_mode = COPY_LINK_MODE
+    result = TransferResult(src, dest)
+    try:
+        if skip_unchanged and is_up_to_date(src, dest):
+            result.action = "skipped"
+        else:
+            result.action = _transfer(src, dest, link_mode)
+    except Exception as e:
+        logger.error("ファイルのコピーに失敗 (%s -> %s): %s", src, dest, e)
+        result.error = str(e) or type(e).__name__
+    return result
+
+def copy_files(pairs: list, max_workers: int = None, skip_unchanged: bool = None, link_mode: str = None) -> list:
+    """
+    (src, dest) のリストをスレッドプールで並列に複製し、TransferResult のリストを pairs の順で返す。
+    ネットワーク共有のように 1 ファイルごとの待ち時間が大きい場合に効果がある。
+    コピー先のファイル名が重複している組はコピーせず、エラーとして返す。
+    """
+    results = [None] * len(pairs)
+    seen = {}
+    tasks = []
+    for index, (src, dest) in enumerate(pairs):
+        key = os.path.normcase(os.path.abspath(dest))
+        if key in seen:
+            results[index] = TransferResult(src, dest, error=f"コピー先が {pairs[seen[key]][0]} と重複しています")
+            continue
+        seen[key] = index
+        tasks.append(index)
+    with ThreadPoolExecutor(max_workers=max_workers or BULK_TRANSFER_WORKERS) as executor:
+        futures = {
+            index: executor.submit(copy_file, pairs[index][0], pairs[index][1], skip_unchanged, link_mode)
+            for index in tasks
+        }
+        for index, future in futures.items():
+            results[index] = future.result()
+    return results
+
+def _delete_entry(path: str) -> TransferResult:
+    result = TransferResult(path, action="deleted")
+    try:
+        if os.path.islink(path) or not os.path.isdir(path):
+            os.remove(path)
+        else:
+            shutil.rmtree(path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        result.error = str(e) or type(e).__name__
+    return result
+
+def delete_paths(paths: list, max_workers: int = None) -> list:
+    """ファイル・ディレクトリのリストをスレッドプールで並列に削除し、TransferResult のリストを paths の順で返す"""
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or BULK_TRANSFER_WORKERS) as executor:
+        return list(executor.map(_delete_entry, paths))
+
+def find_flatten_collisions(files: list, base_folder: str) -> dict:
+    """
+    flatten_relative_path で同じファイル名になってしまう相対パスの組を検出する。
+    例えば "a_b/c.xlsx" と "a/b_c.xlsx" はどちらも "a_b_c.xlsx" になる。
+    名前の比較は copy_files と同じく os.path.normcase で行う（大文字小文字だけが異なる名前は Windows でのみ衝突する）。
+    戻り値は 変換後のファイル名 → 衝突している相対パスのリスト（files の順）で、衝突がなければ空の辞書。
+    """
+    by_name = {}
+    names = {}
+    for file in files:
+        name = flatten_relative_path(os.path.join(base_folder, file), base_folder)
+        key = os.path.normcase(name)
+        names.setdefault(key, name)
+        by_name.setdefault(key, []).append(file)
+    return {names[key]: group for key, group in by_name.items() if len(group) > 1}
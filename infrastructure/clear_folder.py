@@ -1,5 +1,4 @@
 import os
-import shutil
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,16 +7,20 @@ def clear_folder_contents(folder_path: str):
     """
     指定されたフォルダ (folder_path) 内のすべてのファイル・ディレクトリを削除し、
     フォルダ自体はそのまま残す共通関数。
+    削除はスレッドプールで並列に行い、削除できなかった項目があっても残りの削除は続ける。
     """
     if not os.path.exists(folder_path):
         return
+    from infrastructure.bulk_transfer import delete_paths
+
     try:
-        for entry in os.scandir(folder_path):
-            path = entry.path
-            if entry.is_file() or entry.is_symlink():
-                os.remove(path)
-            elif entry.is_dir():
-                shutil.rmtree(path)
-        logger.info("フォルダ内の全ファイル・ディレクトリを削除しました: %s", folder_path)
+        with os.scandir(folder_path) as entries:
+            paths = [entry.path for entry in entries]
     except Exception as e:
         logger.error("フォルダ内の削除に失敗しました (%s): %s", folder_path, e)
+        return
+    failures = [result for result in delete_paths(paths) if not result.ok]
+    for result in failures:
+        logger.error("フォルダ内の削除に失敗しました (%s): %s", result.src, result.error)
+    if not failures:
+        logger.info("フォルダ内の全ファイル・ディレクトリを削除しました: %s", folder_path)
@@ -0,0 +1,211 @@
+import logging
+import os
+import sqlite3
+from config import DIRECTORY_INDEX_FILE
+from domain.file_searcher import compile_keyword_matcher
+from infrastructure.utils import ensure_folder_exists
+
+logger = logging.getLogger(__name__)
+
+def _subtree_range(path: str) -> tuple:
+    """path 配下 (path 自身を除く) を表すパス文字列の範囲 [lower, upper) を返す"""
+    return path + os.sep, path + chr(ord(os.sep) + 1)
+
+# インデックスの形式。変更した場合は既存のインデックスを作り直す
+SCHEMA_VERSION = 2
+
+class DirectoryIndex:
+    """
+    IN フォルダのディレクトリ・ファイル一覧を SQLite に保持する永続インデックス。
+
+    iter_files() / refresh() は各ディレクトリの更新時刻 (mtime) を記録し、再走査時は
+    mtime が変化したディレクトリだけを os.scandir で列挙し直す
+    （変化していないディレクトリは stat のみで、記録済みのファイル・サブディレクトリを使う）。
+    エントリは列挙順 (seq) も記録し、iter_search_files と同じ順序で結果を返せるようにする。
+    query() はインデックスのみから結果を返し、ファイルシステムには触れない。
+    """
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or DIRECTORY_INDEX_FILE
+        ensure_folder_exists(os.path.dirname(self.db_path))
+        self._conn = sqlite3.connect(self.db_path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # 以前の形式のインデックスは破棄する（次回の走査で作り直される）
+            self._conn.executescript("DROP TABLE IF EXISTS dirs; DROP TABLE IF EXISTS files;")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                seq INTEGER,
+                mtime_ns INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_dirs_parent ON dirs (parent);
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                dir TEXT NOT NULL,
+                name TEXT NOT NULL,
+                ext TEXT NOT NULL,
+                seq INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_files_dir ON files (dir);
+            CREATE INDEX IF NOT EXISTS idx_files_ext ON files (ext);
+            """
+        )
+        self._conn.commit()
+        self.scanned_dirs = 0
+        self.skipped_dirs = 0
+
+    def refresh(self, root: str, max_depth: int = 3):
+        """
+        root 以下 (最大階層 max_depth まで) のインデックスを更新する。
+        mtime が記録と一致するディレクトリは列挙を省略する。
+        """
+        for _ in self.iter_files(root, max_depth=max_depth):
+            pass
+
+    def iter_files(self, root: str, keywords: list = None, extensions=None, max_depth: int = 3, cancel_event=None):
+        """
+        root 以下 (最大階層 max_depth まで) のインデックスを更新しながら、ファイルの相対パスを 1 件ずつ返すジェネレータ。
+        keywords・extensions の指定は query() と同じで、順序は iter_search_files と同じ（列挙順の深さ優先）。
+        mtime が記録と一致するディレクトリは記録から、変化したディレクトリは列挙し直した結果から返すため、
+        全体の更新を待たずに最初のファイルを返せる。
+        cancel_event (threading.Event) がセットされると、次のディレクトリへ進む前に打ち切る
+        （それまでに更新したディレクトリの記録は保存する）。
+        """
+        root = os.path.abspath(root)
+        matcher = compile_keyword_matcher(keywords) if keywords is not None else None
+        if keywords is not None and matcher is None:
+            return
+        exts = tuple(ext.lower() if ext.startswith(".") else f".{ext.lower()}" for ext in extensions or ())
+        self.scanned_dirs = 0
+        self.skipped_dirs = 0
+        try:
+            entries = self._dir_entries(root)
+            # スタックの要素は (エントリのイテレータ, 深さ)。エントリは (ディレクトリか, パス, 名前)
+            stack = [(iter(entries), 0)] if entries is not None else []
+            while stack:
+                iterator, depth = stack[-1]
+                entry = next(iterator, None)
+                if entry is None:
+                    stack.pop()
+                    continue
+                is_dir, path, name = entry
+                if not is_dir:
+                    if exts and not name.lower().endswith(exts):
+                        continue
+                    if matcher is None or matcher.search(name):
+                        yield os.path.relpath(path, root)
+                elif depth < max_depth:
+                    if cancel_event is not None and cancel_event.is_set():
+                        return
+                    entries = self._dir_entries(path)
+                    if entries is not None:
+                        stack.append((iter(entries), depth + 1))
+        finally:
+            self._conn.commit()
+            logger.info("ディレクトリインデックスを更新しました: %s (走査 %d / 省略 %d)",
+                        root, self.scanned_dirs, self.skipped_dirs)
+
+    def _dir_entries(self, folder: str):
+        """
+        folder 直下のエントリを列挙順の [(ディレクトリか, パス, 名前), ...] で返す。
+        mtime が記録と一致すれば記録から返し、そうでなければ列挙し直して記録を更新する。
+        folder を参照できない場合は記録から取り除いて None を返す。
+        """
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+        except OSError as e:
+            logger.error("探索中のエラー: %s", e)
+            self._remove_dir(folder)
+            return None
+        row = self._conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (folder,)).fetchone()
+        if row is None or row[0] != mtime_ns:
+            entries = self._rescan_dir(folder, mtime_ns)
+            if entries is not None:
+                self.scanned_dirs += 1
+            return entries
+        self.skipped_dirs += 1
+        rows = [(seq, False, path, name)
+                for path, name, seq in self._conn.execute("SELECT path, name, seq FROM files WHERE dir = ?", (folder,))]
+        rows.extend((seq, True, path, os.path.basename(path))
+                    for path, seq in self._conn.execute("SELECT path, seq FROM dirs WHERE parent = ?", (folder,)))
+        rows.sort(key=lambda r: r[0])
+        return [(is_dir, path, name) for _, is_dir, path, name in rows]
+
+    def _rescan_dir(self, folder: str, mtime_ns: int):
+        try:
+            with os.scandir(folder) as it:
+                scanned = list(it)
+        except OSError as e:
+            logger.error("探索中のエラー: %s", e)
+            return None
+        entries = []
+        files = []
+        subdirs = []
+        for seq, entry in enumerate(scanned):
+            try:
+                if entry.is_file():
+                    files.append((entry.path, folder, entry.name, os.path.splitext(entry.name)[1].lower(), seq))
+                    entries.append((False, entry.path, entry.name))
+                elif entry.is_dir():
+                    subdirs.append((entry.path, folder, seq))
+                    entries.append((True, entry.path, entry.name))
+            except OSError as e:
+                logger.error("探索中のエラー: %s", e)
+        known = {r[0] for r in self._conn.execute("SELECT path FROM dirs WHERE parent = ?", (folder,))}
+        for removed in known.difference(path for path, _, _ in subdirs):
+            self._remove_dir(removed)
+        self._conn.execute("DELETE FROM files WHERE dir = ?", (folder,))
+        self._conn.executemany("INSERT OR REPLACE INTO files (path, dir, name, ext, seq) VALUES (?, ?, ?, ?, ?)", files)
+        # 新しいサブディレクトリは mtime 未確定 (NULL) として登録し、降りた時点で走査する
+        self._conn.executemany(
+            "INSERT INTO dirs (path, parent, seq, mtime_ns) VALUES (?, ?, ?, NULL) "
+            "ON CONFLICT(path) DO UPDATE SET seq = excluded.seq",
+            subdirs,
+        )
+        self._conn.execute(
+            "INSERT INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns",
+            (folder, os.path.dirname(folder), mtime_ns),
+        )
+        return entries
+
+    def _remove_dir(self, folder: str):
+        lower, upper = _subtree_range(folder)
+        self._conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (folder, lower, upper))
+        self._conn.execute("DELETE FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)", (folder, lower, upper))
+
+    def query(self, root: str, keywords: list = None, unit: str = None, extensions=None, max_depth: int = 3) -> list:
+        """
+        インデックスから root 以下のファイルの相対パスをパス順に返す（ファイルシステムには触れない）。
+        keywords のいずれか・unit を名前に含むもの、extensions の拡張子のものに絞り込む。
+        """
+        root = os.path.abspath(root)
+        lower, upper = _subtree_range(root)
+        sql = "SELECT path, name FROM files WHERE (dir = ? OR (dir >= ? AND dir < ?))"
+        params = [root, lower, upper]
+        if extensions:
+            exts = [ext.lower() if ext.startswith(".") else f".{ext.lower()}" for ext in extensions]
+            sql += f" AND ext IN ({', '.join('?' for _ in exts)})"
+            params.extend(exts)
+        if unit:
+            sql += " AND instr(name, ?) > 0"
+            params.append(unit)
+        sql += " ORDER BY path"
+        matcher = compile_keyword_matcher(keywords) if keywords is not None else None
+        if keywords is not None and matcher is None:
+            return []
+        results = []
+        for path, name in self._conn.execute(sql, params):
+            if matcher is not None and not matcher.search(name):
+                continue
+            rel_path = os.path.relpath(path, root)
+            if rel_path.count(os.sep) > max_depth:
+                continue
+            results.append(rel_path)
+        return results
+
+    def close(self):
+        self._conn.close()
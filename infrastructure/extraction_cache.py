@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import time
+import zlib
+from config import EXTRACTION_CACHE_FILE, EXTRACTION_CACHE_MAX_BYTES
+from infrastructure.utils import ensure_folder_exists
+
+logger = logging.getLogger(__name__)
+
+def file_content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """ファイル内容の SHA-256 ハッシュ (16 進文字列) を返す"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """
+    XLSX 抽出結果 ({ sheet: { group: [row, ...] } }) の永続キャッシュ。
+
+    キーは元ファイルのパスで、サイズ・更新時刻・内容ハッシュを併せて保存する。
+    サイズと更新時刻が一致すればハッシュ計算なしでヒットとし、
+    更新時刻だけが変わっている場合は内容ハッシュを比較して再利用可否を判定する。
+    合計サイズが max_bytes を超えた場合は最終参照時刻の古いものから削除する (LRU)。
+    複数プロセスから同時に開いてよい (SQLite のロックで排他する)。
+    """
+    def __init__(self, db_path: str = None, max_bytes: int = None):
+        self.db_path = db_path or EXTRACTION_CACHE_FILE
+        self.max_bytes = EXTRACTION_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        ensure_folder_exists(os.path.dirname(self.db_path))
+        self._conn = sqlite3.connect(self.db_path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                nbytes INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)")
+        self._conn.commit()
+
+    def get(self, file_path: str):
+        """キャッシュが有効ならば抽出結果を、無効・未登録ならば None を返す"""
+        key = os.path.abspath(file_path)
+        st = os.stat(file_path)
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, content_hash, payload FROM entries WHERE path = ?", (key,)
+        ).fetchone()
+        if row is None or row[0] != st.st_size:
+            self.misses += 1
+            return None
+        size, mtime_ns, content_hash, payload = row
+        if mtime_ns != st.st_mtime_ns:
+            # 更新時刻のみ変化した場合 (コピーし直し等) は内容が同じなら再利用する
+            if file_content_hash(file_path) != content_hash:
+                self.misses += 1
+                return None
+        with self._conn:
+            self._conn.execute(
+                "UPDATE entries SET mtime_ns = ?, last_access = ? WHERE path = ?",
+                (st.st_mtime_ns, time.time(), key),
+            )
+        self.hits += 1
+        return pickle.loads(zlib.decompress(payload))
+
+    def put(self, file_path: str, data: dict):
+        """抽出結果を登録し、上限を超えていれば LRU で削除する"""
+        key = os.path.abspath(file_path)
+        st = os.stat(file_path)
+        payload = zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (path, size, mtime_ns, content_hash, payload, nbytes, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, st.st_size, st.st_mtime_ns, file_content_hash(file_path), payload, len(payload), time.time()),
+            )
+        self.evict()
+
+    def evict(self) -> int:
+        """合計サイズが max_bytes 以下になるまで古いエントリを削除し、削除件数を返す"""
+        total = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        with self._conn:
+            for path, nbytes in self._conn.execute(
+                "SELECT path, nbytes FROM entries ORDER BY last_access"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+                total -= nbytes
+                removed += 1
+        self.evictions += removed
+        if removed:
+            logger.info("抽出キャッシュから %d 件を削除しました", removed)
+        return removed
+
+    def clear(self):
+        with self._conn:
+            self._conn.execute("DELETE FROM entries")
+
+    def stats(self) -> dict:
+        """ヒット/ミス/削除件数 (このインスタンス分) と、キャッシュ全体の件数・サイズを返す"""
+        entries, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM entries"
+        ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        self._conn.close()
@@ -1,27 +1,34 @@
 import os
-import shutil
 import logging
 from config import TMP_FOLDER
 from infrastructure.utils import ensure_folder_exists
 
 logger = logging.getLogger(__name__)
 
+def flatten_relative_path(in_file_path: str, base_folder: str) -> str:
+    """
+    INフォルダからの相対パスを、区切り文字をアンダースコアに置換した 1 つのファイル名に変換する。
+    不要な ".." 部分は除去します。
+    """
+    rel_path = os.path.relpath(in_file_path, base_folder)
+    rel_path = rel_path.replace("..", "")
+    return rel_path.replace(os.sep, "_").replace("/", "_").replace("\\", "_")
+
 def copy_xlsx_file(in_file_path: str, base_folder: str) -> str:
     """
     INフォルダ内の指定 XLSX ファイル（in_file_path）を、
     INフォルダからの相対パス情報を用いて TMP_FOLDER にコピーする。
     コピー先のファイル名は、相対パスの区切り文字をアンダースコアに置換し、
     不要な ".." 部分は除去して生成します。
+    コピー先にサイズ・更新時刻が同じファイルがあればコピーを省略し、可能なら reflink などで複製します
+    （config.COPY_SKIP_UNCHANGED / config.COPY_LINK_MODE）。
     コピー先のファイルパスを返します。
     """
+    from infrastructure.bulk_transfer import copy_file
+
     ensure_folder_exists(TMP_FOLDER)
-    rel_path = os.path.relpath(in_file_path, base_folder)
-    rel_path = rel_path.replace("..", "")
-    new_filename = rel_path.replace(os.sep, "_").replace("/", "_").replace("\\", "_")
-    dest_path = os.path.join(TMP_FOLDER, new_filename)
-    try:
-        shutil.copy2(in_file_path, dest_path)
-    except Exception as e:
-        logger.error("XLSXファイルのコピーに失敗 (%s -> %s): %s", in_file_path, dest_path, e)
-        raise e
+    dest_path = os.path.join(TMP_FOLDER, flatten_relative_path(in_file_path, base_folder))
+    result = copy_file(in_file_path, dest_path)
+    if not result.ok:
+        raise OSError(f"XLSXファイルのコピーに失敗 ({in_file_path} -> {dest_path}): {result.error}")
     return dest_path
@@ -0,0 +1,249 @@
+import io
+import json
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from config import RUN_REPORT_ENABLED, RUN_REPORT_FOLDER, RUN_REPORT_KEEP, PROFILE_CPU, PROFILE_MEMORY
+from infrastructure.utils import ensure_folder_exists
+
+logger = logging.getLogger(__name__)
+
+STAGE_LABELS = {
+    "discovery": "ファイル探索",
+    "copy": "コピー",
+    "extract": "XLSX 読み込み",
+    "cache": "キャッシュ参照",
+    "write_tmp": "中間ファイル書き出し",
+    "extract_wait": "抽出待ち",
+    "merge": "合算",
+    "csv": "CSV 変換",
+}
+
+class RunMetrics:
+    """
+    1 回の処理（情報取得・合算・CSV 変換など）の、工程ごとの所要時間とカウンタを集計するクラス。
+
+    工程の時間は stage() で計測するか、ワーカープロセスで計測した値を add_time() で加える。
+    ワーカーの工程 (copy / extract / write_tmp) はファイルごとの時間の合計で、並列実行時は経過時間より大きくなる。
+    profile_cpu / profile_memory が True の場合は、start() から finish() までの間（メインプロセスのみ）
+    cProfile・tracemalloc で計測し、結果をレポートに含める。
+    """
+    def __init__(self, name: str, profile_cpu: bool = None, profile_memory: bool = None):
+        self.name = name
+        self.profile_cpu = PROFILE_CPU if profile_cpu is None else profile_cpu
+        self.profile_memory = PROFILE_MEMORY if profile_memory is None else profile_memory
+        self.stages = {}    # 工程名 -> {"seconds": 合計秒数, "calls": 回数}
+        self.counters = {}  # カウンタ名 -> 値
+        self.cache_stats = None
+        self.failures = []  # {"file": ..., "error": ...}
+        self.profile = {}
+        self.started_at = None
+        self.finished_at = None
+        self.report_path = None
+        self._start_time = None
+        self._elapsed = None
+        self._profiler = None
+
+    def start(self):
+        self.started_at = datetime.now()
+        self._start_time = time.perf_counter()
+        if self.profile_cpu:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        if self.profile_memory:
+            import tracemalloc
+            tracemalloc.start()
+        return self
+
+    def finish(self):
+        if self._start_time is None or self._elapsed is not None:
+            return self
+        self._elapsed = time.perf_counter() - self._start_time
+        self.finished_at = datetime.now()
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.profile["cpu_top"] = self._cpu_top(self._profiler)
+            self._profiler = None
+        if self.profile_memory:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.profile["memory_peak_bytes"] = peak
+                self.profile["memory_current_bytes"] = current
+        return self
+
+    @staticmethod
+    def _cpu_top(profiler, limit: int = 30) -> list:
+        """累積時間の上位の関数を [{"function": ..., "calls": ..., "total": ..., "cumulative": ...}] で返す"""
+        import pstats
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        entries = []
+        for (filename, line, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            entries.append({
+                "function": f"{filename}:{line}({func})",
+                "calls": ncalls,
+                "total": round(tottime, 6),
+                "cumulative": round(cumtime, 6),
+            })
+        entries.sort(key=lambda e: e["cumulative"], reverse=True)
+        return entries[:limit]
+
+    @property
+    def elapsed(self) -> float:
+        if self._start_time is None:
+            return 0.0
+        if self._elapsed is not None:
+            return self._elapsed
+        return time.perf_counter() - self._start_time
+
+    @contextmanager
+    def stage(self, name: str):
+        """with ブロックの経過時間を工程 name の時間として加える"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float, calls: int = 1):
+        entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+        entry["seconds"] += seconds
+        entry["calls"] += calls
+
+    def add_timings(self, timings: dict):
+        """ワーカーから返された 工程名 → 秒数 の辞書をまとめて加える"""
+        for name, seconds in (timings or {}).items():
+            self.add_time(name, seconds)
+
+    def count(self, name: str, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_pipeline_result(self, pipeline_result):
+        """PipelineResult のファイル数・成否・キャッシュ統計とワーカーの計測値を取り込む"""
+        for result in pipeline_result.results:
+            self.add_timings(result.timings)
+            self.count("rows", result.rows)
+            self.count("bytes", result.bytes)
+            if not result.ok:
+                self.failures.append({"file": result.file, "error": result.error})
+        self.count("files", len(pipeline_result.results))
+        self.count("succeeded", len(pipeline_result.succeeded))
+        self.count("failed", len(pipeline_result.failed))
+        self.count("cache_hits", pipeline_result.cache_hits)
+        self.count("unchanged", len(pipeline_result.unchanged))
+        if pipeline_result.cache_stats is not None:
+            self.cache_stats = pipeline_result.cache_stats
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "started_at": self.started_at.isoformat(timespec="seconds") if self.started_at else None,
+            "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+            "elapsed_seconds": round(self.elapsed, 6),
+            "stages": {name: {"seconds": round(e["seconds"], 6), "calls": e["calls"]} for name, e in self.stages.items()},
+            "counters": dict(self.counters),
+            "cache": self.cache_stats,
+            "failures": list(self.failures),
+            "profile": dict(self.profile),
+        }
+
+    def summary_lines(self) -> list:
+        """UI・コンソール表示用の要約（1 行ずつ）"""
+        lines = [f"所要時間: {self.elapsed:.2f} 秒"]
+        for name, entry in sorted(self.stages.items(), key=lambda item: item[1]["seconds"], reverse=True):
+            label = STAGE_LABELS.get(name, name)
+            lines.append(f"  {label}: {entry['seconds']:.2f} 秒 ({entry['calls']} 回)")
+        counters = self.counters
+        if "files" in counters:
+            lines.append(f"ファイル: {counters['files']} 件 (成功 {counters.get('succeeded', 0)} / "
+                         f"失敗 {counters.get('failed', 0)} / キャッシュ {counters.get('cache_hits', 0)} / "
+                         f"未変更 {counters.get('unchanged', 0)})")
+        if counters.get("rows"):
+            lines.append(f"行数: {counters['rows']:,} 行 ({counters['rows'] / self.elapsed:,.0f} 行/秒)"
+                         if self.elapsed else f"行数: {counters['rows']:,} 行")
+        if counters.get("bytes"):
+            lines.append(f"入力サイズ: {counters['bytes'] / 1024 / 1024:,.1f} MiB")
+        if "memory_peak_bytes" in self.profile:
+            lines.append(f"メモリ使用量のピーク: {self.profile['memory_peak_bytes'] / 1024 / 1024:,.1f} MiB")
+        return lines
+
+    def close(self, write_report: bool = None) -> "RunMetrics":
+        """計測を終了し、write_report が True なら（未指定時は config.RUN_REPORT_ENABLED）レポートを書き出す"""
+        self.finish()
+        if RUN_REPORT_ENABLED if write_report is None else write_report:
+            self.write_report()
+        return self
+
+    def summary_text(self) -> str:
+        """summary_lines にレポートの保存先を加えた、ダイアログ表示用の文字列"""
+        lines = self.summary_lines()
+        if self.report_path:
+            lines.append(f"実行レポート: {self.report_path}")
+        return "\n".join(lines)
+
+    def write_report(self, folder: str = None, keep: int = None) -> str:
+        """
+        計測結果を folder（未指定時は config.RUN_REPORT_FOLDER）に run_report_{name}_YYYYMMDD_HHMMSS.json として保存し、
+        そのパスを返す。書き出しに失敗した場合は None を返す。
+        書き出し後、同じ name のレポートは新しいものから keep 件（未指定時は config.RUN_REPORT_KEEP）だけ残す。
+        """
+        self.finish()
+        folder = folder or RUN_REPORT_FOLDER
+        stamp = (self.started_at or datetime.now()).strftime("%Y%m%d_%H%M%S")
+        report_path = os.path.join(folder, f"run_report_{self.name}_{stamp}.json")
+        try:
+            ensure_folder_exists(folder)
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=4)
+        except Exception as e:
+            logger.error("実行レポートの書き出しエラー (%s): %s", report_path, e)
+            return None
+        logger.info("実行レポートを書き出しました: %s", report_path)
+        self.report_path = report_path
+        prune_reports(folder, self.name, RUN_REPORT_KEEP if keep is None else keep)
+        return report_path
+
+def prune_reports(folder: str, name: str, keep: int) -> list:
+    """
+    folder にある run_report_{name}_YYYYMMDD_HHMMSS.json のうち、新しいものから keep 件を残して削除し、
+    削除したファイルパスのリストを返す。keep が None の場合は何もしない。
+    """
+    if keep is None:
+        return []
+    pattern = re.compile(rf"run_report_{re.escape(name)}_\d{{8}}_\d{{6}}\.json")
+    try:
+        reports = sorted(filename for filename in os.listdir(folder) if pattern.fullmatch(filename))
+    except OSError as e:
+        logger.warning("実行レポートの一覧を取得できません (%s): %s", folder, e)
+        return []
+    removed = []
+    for filename in reports[:max(len(reports) - keep, 0)]:
+        path = os.path.join(folder, filename)
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning("古い実行レポートを削除できません (%s): %s", path, e)
+            continue
+        removed.append(path)
+    return removed
+
+class StageTimer:
+    """
+    ワーカープロセス内で工程ごとの時間を計測し、工程名 → 秒数 の辞書として返すための小さなタイマー。
+    RunMetrics と異なりプロセス間で受け渡せる値（辞書）だけを保持する。
+    """
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
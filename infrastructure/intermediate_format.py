@@ -0,0 +1,246 @@
+import json
+import logging
+import os
+import struct
+from config import TMP_FOLDER, INTERMEDIATE_FORMAT, JSON_STREAMING_THRESHOLD_BYTES
+from infrastructure.json_stream import iter_nested_json_rows
+from infrastructure.json_writer import write_json_output
+from infrastructure.mmap_reader import open_mmap, iter_mmap_lines
+from infrastructure.row_record import json_default
+from infrastructure.utils import ensure_folder_exists
+
+logger = logging.getLogger(__name__)
+
+def _json_key(value) -> str:
+    """JSON オブジェクトのキーにした場合と同じ文字列へ変換する (None → "null" など)"""
+    return next(iter(json.loads(json.dumps({value: None}))))
+
+class JsonFormat:
+    """従来どおり { sheet: { group: [row, ...] } } をインデント付き JSON で保存する形式"""
+    name = "json"
+    extension = ".json"
+
+    def write(self, data: dict, out_filename: str) -> str:
+        return write_json_output(data, out_filename)
+
+    def read(self, file_path: str) -> dict:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    batch_size = 1000
+
+    def iter_row_batches(self, file_path: str):
+        """
+        グループごとの行のリストを順に返す。
+        JSON_STREAMING_THRESHOLD_BYTES を超えるファイルはストリーミングで読み込み（1 グループの行が多い場合は
+        batch_size 件ずつに分ける）、ファイル全体を辞書に展開しない。小さいファイルは一括読み込みの方が速いためそのまま読む。
+        """
+        if os.path.getsize(file_path) <= JSON_STREAMING_THRESHOLD_BYTES:
+            for groups in self.read(file_path).values():
+                for rows in groups.values():
+                    yield rows
+            return
+        current = None
+        batch = []
+        for path, row in iter_nested_json_rows(file_path, 2):
+            if path != current or len(batch) >= self.batch_size:
+                if batch:
+                    yield batch
+                current = path
+                batch = []
+            batch.append(row)
+        if batch:
+            yield batch
+
+class NdjsonFormat:
+    """
+    1 行に 1 レコード [sheet, group, row] を書く改行区切り JSON 形式。
+    読み込みはメモリマップしたファイルを 1 行ずつ復号するため、巨大なファイルでも必要な行しかメモリに載らない。
+    """
+    name = "ndjson"
+    extension = ".ndjson"
+    batch_size = 1000
+
+    def write(self, data: dict, out_filename: str) -> str:
+        ensure_folder_exists(TMP_FOLDER)
+        file_path = os.path.join(TMP_FOLDER, out_filename)
+        try:
+            with open(file_path, "w", encoding="utf-8") as f:
+                for sheet, groups in data.items():
+                    if not groups:
+                        # 行のないシートも読み込み時に復元できるよう、シート名だけのレコードを書く
+                        f.write(json.dumps([sheet], ensure_ascii=False) + "\n")
+                    for group, rows in groups.items():
+                        # JSON 形式と同じく、グループ名は JSON オブジェクトのキーの文字列に揃える
+                        group = _json_key(group)
+                        if not rows:
+                            f.write(json.dumps([sheet, group], ensure_ascii=False) + "\n")
+                        for row in rows:
+                            f.write(json.dumps([sheet, group, row], ensure_ascii=False, separators=(",", ":"), default=json_default) + "\n")
+        except Exception as e:
+            logger.error("中間ファイル書き出しエラー: %s", e)
+        return file_path
+
+    def iter_records(self, file_path: str):
+        """(シート名, グループ名, 行) を 1 行ずつ返す。シート名・グループ名だけのレコードは None で補う。"""
+        for line in iter_mmap_lines(file_path):
+            record = json.loads(line)
+            record.extend([None] * (3 - len(record)))
+            yield record
+
+    def read(self, file_path: str) -> dict:
+        data = {}
+        for sheet, group, row in self.iter_records(file_path):
+            groups = data.setdefault(sheet, {})
+            if group is None:
+                continue
+            group_rows = groups.setdefault(group, [])
+            if row is not None:
+                group_rows.append(row)
+        return data
+
+    def iter_row_batches(self, file_path: str):
+        current = None
+        batch = []
+        for sheet, group, row in self.iter_records(file_path):
+            if row is None:
+                continue
+            if (sheet, group) != current or len(batch) >= self.batch_size:
+                if batch:
+                    yield batch
+                current = (sheet, group)
+                batch = []
+            batch.append(row)
+        if batch:
+            yield batch
+
+class RowPackFormat:
+    """
+    ヘッダーを 1 度だけ書き、各行は値の配列として保持するコンパクトなバイナリ形式。
+
+    ファイルは MAGIC に続くフレームの列で、各フレームは
+    (種別 1 バイト, ペイロード長 4 バイト little endian, ペイロード) で構成される。
+      SHEET  : シート名 (UTF-8)
+      GROUP  : グループ名 (UTF-8。JSON オブジェクトのキーと同じ文字列に変換済み)
+      SCHEMA : 以降の行のキー (JSON オブジェクトのキーとして符号化し、JSON 形式と同じ型変換を行う)
+      ROWS   : 値の配列の配列 (区切りの空白を省いた JSON)
+    """
+    name = "rowpack"
+    extension = ".rowpack"
+    MAGIC = b"XRPK\x01"
+    SHEET, GROUP, SCHEMA, ROWS = 1, 2, 3, 4
+    _frame_header = struct.Struct("<BI")
+    batch_size = 1000
+
+    def _frame(self, f, kind: int, payload: bytes):
+        f.write(self._frame_header.pack(kind, len(payload)))
+        f.write(payload)
+
+    @staticmethod
+    def _dumps(value) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def write(self, data: dict, out_filename: str) -> str:
+        ensure_folder_exists(TMP_FOLDER)
+        file_path = os.path.join(TMP_FOLDER, out_filename)
+        try:
+            with open(file_path, "wb") as f:
+                f.write(self.MAGIC)
+                for sheet, groups in data.items():
+                    self._frame(f, self.SHEET, str(sheet).encode("utf-8"))
+                    for group, rows in groups.items():
+                        self._frame(f, self.GROUP, _json_key(group).encode("utf-8"))
+                        schema = None
+                        batch = []
+                        for row in rows:
+                            keys = tuple(row)
+                            if keys != schema:
+                                if batch:
+                                    self._frame(f, self.ROWS, self._dumps(batch))
+                                    batch = []
+                                schema = keys
+                                self._frame(f, self.SCHEMA, self._dumps(dict.fromkeys(keys)))
+                            batch.append(list(row.values()))
+                            if len(batch) >= self.batch_size:
+                                self._frame(f, self.ROWS, self._dumps(batch))
+                                batch = []
+                        if batch:
+                            self._frame(f, self.ROWS, self._dumps(batch))
+        except Exception as e:
+            logger.error("中間ファイル書き出しエラー: %s", e)
+        return file_path
+
+    def _iter_frames(self, file_path: str):
+        """
+        (種別, ペイロード) を順に返す。ファイルはメモリマップし、フレームヘッダーはコピーせずに解釈する。
+        ペイロードはフレーム単位で切り出すため、一度にメモリに載るのは 1 フレーム分だけになる。
+        """
+        header_size = self._frame_header.size
+        with open_mmap(file_path) as mapped:
+            size = len(mapped)
+            if mapped[:len(self.MAGIC)] != self.MAGIC:
+                raise ValueError(f"rowpack 形式のファイルではありません: {file_path}")
+            pos = len(self.MAGIC)
+            while pos < size:
+                if pos + header_size > size:
+                    raise ValueError(f"rowpack ファイルが途中で終了しています: {file_path}")
+                kind, length = self._frame_header.unpack_from(mapped, pos)
+                pos += header_size
+                if pos + length > size:
+                    raise ValueError(f"rowpack ファイルが途中で終了しています: {file_path}")
+                yield kind, mapped[pos:pos + length]
+                pos += length
+
+    def iter_records(self, file_path: str):
+        """(シート名, グループ名, 行のリスト) を ROWS フレーム単位で順に返す"""
+        sheet = group = None
+        schema = ()
+        for kind, payload in self._iter_frames(file_path):
+            if kind == self.SHEET:
+                sheet = payload.decode("utf-8")
+                yield sheet, None, None
+            elif kind == self.GROUP:
+                group = payload.decode("utf-8")
+                yield sheet, group, None
+            elif kind == self.SCHEMA:
+                schema = tuple(json.loads(payload))
+            elif kind == self.ROWS:
+                yield sheet, group, [dict(zip(schema, values)) for values in json.loads(payload)]
+
+    def read(self, file_path: str) -> dict:
+        data = {}
+        for sheet, group, rows in self.iter_records(file_path):
+            groups = data.setdefault(sheet, {})
+            if group is None:
+                continue
+            group_rows = groups.setdefault(group, [])
+            if rows:
+                group_rows.extend(rows)
+        return data
+
+    def iter_row_batches(self, file_path: str):
+        for _, _, rows in self.iter_records(file_path):
+            if rows:
+                yield rows
+
+FORMATS = {fmt.name: fmt for fmt in (JsonFormat(), RowPackFormat(), NdjsonFormat())}
+
+def get_format(name: str = None):
+    """名前から中間形式を返す（未指定時は config.INTERMEDIATE_FORMAT）"""
+    name = name or INTERMEDIATE_FORMAT
+    try:
+        return FORMATS[name]
+    except KeyError:
+        raise ValueError(f"未対応の中間形式です: {name}")
+
+def format_for_path(file_path: str):
+    """拡張子から中間形式を判定する。対応する形式がなければ None を返す"""
+    lower = file_path.lower()
+    for fmt in FORMATS.values():
+        if lower.endswith(fmt.extension):
+            return fmt
+    return None
+
+def write_intermediate_output(data: dict, out_filename: str, fmt=None) -> str:
+    """data を TMP_FOLDER に中間形式 fmt で保存し、作成したファイルパスを返す"""
+    return (fmt or get_format()).write(data, out_filename)
@@ -1,102 +1,202 @@
+import hashlib
 import json
 import os
 import logging
-from config import TMP_FOLDER, OUT_FOLDER
-from infrastructure.utils import ensure_folder_exists
+from config import TMP_FOLDER, OUT_FOLDER, WRITE_CSV_ON_MERGE, QUERY_INDEX_ENABLED
+from infrastructure.intermediate_format import format_for_path
+from infrastructure.json_to_csv import write_grouped_rows_to_csv
+from infrastructure.merge_accumulator import UnitMergeAccumulator
+from infrastructure.query_index import build_query_index
+from infrastructure.utils import ensure_folder_exists, gc_paused
 
 logger = logging.getLogger(__name__)
 
-def merge_json_files_by_unit(keywords: list) -> dict:
-    """
-    TMP_FOLDER 内の JSON ファイルを、ファイル名に含まれる単位（keywords に該当する文字列）ごとに合算する。
+def find_unit(filename: str, keywords: list):
+    for kw in keywords:
+        if kw in filename:
+            return kw
+    return None
 
-    合算処理:
-      - 各 JSON ファイルは XLSX 変換時の出力（構造は { sheet: { group: [row, ...], ... } } ）とする。
-      - 各 row について、結合主キー「グループ」「指図書No」「補足」でマージし、"時間" フィールドの値を合計する。
-      - 合算対象の行（"時間" が数値または null の場合）は、"merged_files" フィールドに寄与したファイル名を必ずリストで追加する。
-    その後、unit ごとにマージした結果を、さらに「グループ」ごとに分けた辞書形式に変換し、
-    OUT_FOLDER に output_{unit}.json として保存します。
-    戻り値は、unit → 出力ファイルパス の辞書です。
+def _iter_tmp_files(keywords: list):
     """
-    merged_data = {}  # unit -> { composite_key: row }　（composite_key = (グループ, 指図書No, 補足)）
-    ensure_folder_exists(OUT_FOLDER)
-    
-    # TMP_FOLDER 内の JSON ファイルを処理
-    for filename in os.listdir(TMP_FOLDER):
-        if not filename.lower().endswith(".json"):
+    TMP_FOLDER 内の中間ファイル（JSON / rowpack などの登録済み形式）のうち、ファイル名に単位 (keywords) を含むものを
+    (unit, filename, file_path, fmt) としてファイル名の順に返す。
+    filename は merged_files に記録する名前で、中間形式によらず JSON 形式のファイル名（拡張子 .json）とする。
+    """
+    for name in sorted(os.listdir(TMP_FOLDER)):
+        fmt = format_for_path(name)
+        if fmt is None:
             continue
-        file_path = os.path.join(TMP_FOLDER, filename)
-        unit_found = None
-        for kw in keywords:
-            if kw in filename:
-                unit_found = kw
-                break
+        unit_found = find_unit(name, keywords)
         if not unit_found:
             continue
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except Exception as e:
-            logger.error("JSON読み込みエラー %s: %s", file_path, e)
-            continue
-        if unit_found not in merged_data:
-            merged_data[unit_found] = {}
-        # data は { sheet: { group: [row, ...], ... }, ... }
-        for sheet, groups in data.items():
-            for group, rows in groups.items():
-                for row in rows:
-                    try:
-                        composite_key = (
-                            str(row["グループ"]).strip(),
-                            str(row["指図書No"]).strip(),
-                            str(row["補足"]).strip()
-                        )
-                    except Exception as e:
-                        logger.error("必要なキーが存在しない行: %s", row)
-                        continue
-                    # "時間" が null の場合は 0.0 として扱う
-                    if row["時間"] is None:
-                        time_val = 0.0
-                    else:
-                        try:
-                            time_val = float(row["時間"])
-                        except Exception as e:
-                            logger.error("時間の値が不正な行 (ファイル %s): %s", file_path, row)
-                            continue
-                    if composite_key in merged_data[unit_found]:
-                        merged_entry = merged_data[unit_found][composite_key]
-                        merged_entry["時間"] += time_val
-                        if "merged_files" in merged_entry:
-                            if filename not in merged_entry["merged_files"]:
-                                merged_entry["merged_files"].append(filename)
-                        else:
-                            merged_entry["merged_files"] = [filename]
-                    else:
-                        new_row = row.copy()
-                        new_row["時間"] = time_val
-                        new_row["merged_files"] = [filename]
-                        merged_data[unit_found][composite_key] = new_row
-    
-    # ここから、各 unit ごとに「グループ」ごとに分ける
-    final_output = {}  # unit -> { group_name: [row, ...], ... }
-    for unit, comp_dict in merged_data.items():
-        grouped = {}
-        for comp_key, row in comp_dict.items():
-            # comp_key の最初の要素がグループ名
-            group_name = comp_key[0]
-            if group_name not in grouped:
-                grouped[group_name] = []
-            grouped[group_name].append(row)
-        final_output[unit] = grouped
-    
+        filename = os.path.splitext(name)[0] + ".json"
+        yield unit_found, filename, os.path.join(TMP_FOLDER, name), fmt
+
+def has_intermediate_files(keywords: list) -> bool:
+    """TMP_FOLDER に合算対象の中間ファイル（ファイル名に単位を含む登録済み形式のファイル）があるかどうか"""
+    if not os.path.isdir(TMP_FOLDER):
+        return False
+    return next(_iter_tmp_files(keywords), None) is not None
+
+def find_unit_outputs(keywords: list) -> dict:
+    """OUT_FOLDER に既にある output_{unit}.json を unit → ファイルパス の辞書で返す"""
+    output_paths = {}
+    for unit in keywords:
+        out_path = os.path.join(OUT_FOLDER, f"output_{unit}.json")
+        if os.path.isfile(out_path):
+            output_paths[unit] = out_path
+    return output_paths
+
+class _DigestWriter:
+    """書き出す内容のダイジェストを求めながら、ある程度まとめてファイルに書き込む（json.dump の出力先に使う）"""
+    def __init__(self, f, buffer_size: int = 1024 * 1024):
+        self._f = f
+        self._hash = hashlib.blake2b(digest_size=16)
+        self._chunks = []
+        self._buffered = 0
+        self._buffer_size = buffer_size
+
+    def write(self, text: str):
+        self._chunks.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        text = "".join(self._chunks)
+        self._chunks.clear()
+        self._buffered = 0
+        self._f.write(text)
+        self._hash.update(text.encode("utf-8"))
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+def write_unit_outputs(final_output: dict, write_csv: bool = None, build_index: bool = None) -> dict:
+    """
+    unit → { group_name: [row, ...] } の辞書を OUT_FOLDER に output_{unit}.json として保存し、
+    unit → 出力ファイルパス の辞書を返す。
+    write_csv が True の場合は（未指定時は config.WRITE_CSV_ON_MERGE）、JSON を読み直さずに
+    同じ内容を output_{unit}.csv としても書き出す。
+    build_index が True の場合は（未指定時は config.QUERY_INDEX_ENABLED）、同じ内容で検索用インデックスを更新する。
+    その際は書き出した内容のダイジェストを単位ごとに求め、前回から内容が変わった単位だけをインデックスに入れ直す。
+    インデックスの更新に失敗しても出力ファイルはそのまま返す。
+    """
+    if write_csv is None:
+        write_csv = WRITE_CSV_ON_MERGE
+    if build_index is None:
+        build_index = QUERY_INDEX_ENABLED
+    ensure_folder_exists(OUT_FOLDER)
     output_paths = {}
+    unit_digests = {}
     for unit, merged_dict in final_output.items():
         out_filename = f"output_{unit}.json"
         out_path = os.path.join(OUT_FOLDER, out_filename)
         try:
             with open(out_path, "w", encoding="utf-8") as f:
-                json.dump(merged_dict, f, ensure_ascii=False, indent=4)
+                if build_index:
+                    writer = _DigestWriter(f)
+                    json.dump(merged_dict, writer, ensure_ascii=False, indent=4)
+                    writer.flush()
+                    unit_digests[unit] = writer.hexdigest()
+                else:
+                    json.dump(merged_dict, f, ensure_ascii=False, indent=4)
             output_paths[unit] = out_path
         except Exception as e:
             logger.error("出力ファイル書き出しエラー (%s): %s", out_path, e)
+            continue
+        if write_csv:
+            write_grouped_rows_to_csv(merged_dict, os.path.join(OUT_FOLDER, f"output_{unit}.csv"))
+    if build_index:
+        try:
+            build_query_index(final_output, unit_digests=unit_digests)
+        except Exception as e:
+            logger.error("検索用インデックスの更新エラー（検索画面には以前の内容が表示されます）: %s", e)
     return output_paths
+
+def merge_json_files_by_unit(keywords: list) -> dict:
+    """
+    TMP_FOLDER 内の中間ファイル (JSON 等) を、ファイル名に含まれる単位（keywords に該当する文字列）ごとに合算する。
+
+    合算処理:
+      - 各中間ファイルは XLSX 変換時の出力（構造は { sheet: { group: [row, ...], ... } } ）とする。
+      - 各 row について、結合主キー「グループ」「指図書No」「補足」でマージし、"時間" フィールドの値を合計する。
+      - 合算対象の行（"時間" が数値または null の場合）は、"merged_files" フィールドに寄与したファイル名を必ずリストで追加する。
+    その後、unit ごとにマージした結果を、さらに「グループ」ごとに分けた辞書形式に変換し、
+    OUT_FOLDER に output_{unit}.json として保存します。
+    戻り値は、unit → 出力ファイルパス の辞書です。
+    """
+    with gc_paused():
+        merged = _merge_tmp_files(_iter_tmp_files(keywords))
+    return write_unit_outputs(merged)
+
+def merge_rows_by_unit(sources, keywords: list) -> dict:
+    """
+    抽出結果を TMP JSON を経由せずに単位ごとに合算し、OUT_FOLDER に output_{unit}.json として保存する。
+
+    sources は (filename, row_batches) を順に返すイテラブルで、row_batches は行のリストのイテラブル。
+    filename は merged_files に記録される名前で、単位 (keywords) の判定にも使われる。
+    合算規則・出力形式は merge_json_files_by_unit と同じ。戻り値は unit → 出力ファイルパス の辞書。
+    """
+    accumulators = {}  # unit -> UnitMergeAccumulator
+    with gc_paused():
+        for filename, row_batches in sources:
+            unit_found = find_unit(filename, keywords)
+            if not unit_found:
+                continue
+            if unit_found not in accumulators:
+                accumulators[unit_found] = UnitMergeAccumulator()
+            accumulators[unit_found].add_file(filename, row_batches)
+        merged = {unit: acc.to_grouped() for unit, acc in accumulators.items()}
+    return write_unit_outputs(merged)
+
+def merge_rows_incrementally(sources, keywords: list, store) -> dict:
+    """
+    抽出結果で永続化された合算状態 (IncrementalMergeStore) を更新し、
+    すべての単位の output_{unit}.json を状態から書き出す。
+
+    sources は今回選択されたファイルの (source, filename, row_batches, stamp) を順に返すイテラブル。
+    source は元ファイルのキー (merge_state.source_key)、filename は merged_files に記録される名前で、
+    単位 (keywords) の判定にも使われる。row_batches が None のファイルは前回から変更がないものとして寄与をそのまま使う。
+    既に登録済みの source は置き換えられ、そのファイルに関係するキーだけが再計算される。
+    sources に現れなかったファイル（選択から外れた・処理に失敗したファイル）の寄与は取り除くため、
+    出力には今回選択したファイルの寄与だけが含まれる。
+    """
+    keep = set()
+    with gc_paused():
+        for source, filename, row_batches, stamp in sources:
+            unit_found = find_unit(filename, keywords)
+            if not unit_found:
+                continue
+            keep.add((unit_found, source))
+            if row_batches is None:
+                store.rename_file(unit_found, source, filename)
+            else:
+                store.upsert_file(unit_found, source, filename, row_batches, stamp)
+        removed = store.retain(keep)
+        if removed:
+            logger.info("選択されていないファイルの寄与を合算状態から取り除きました: %d 件", removed)
+        store.save()
+        merged = store.to_output()
+    return write_unit_outputs(merged)
+
+def _merge_tmp_files(tmp_files) -> dict:
+    """
+    (unit, filename, file_path, fmt) の列を単位ごとの UnitMergeAccumulator で合算し、
+    unit → { group_name: [row, ...] } を返す。
+    各ファイルは fmt.iter_row_batches で行のリストを少しずつ読み込み、ファイル全体を辞書に展開しない。
+    読み込みに失敗したファイルは、途中まで読んだ行も含めて合算せずにスキップする。
+    """
+    accumulators = {}  # unit -> UnitMergeAccumulator
+    for unit_found, filename, file_path, fmt in tmp_files:
+        accumulator = accumulators.get(unit_found)
+        if accumulator is None:
+            accumulator = UnitMergeAccumulator()
+        try:
+            accumulator.add_file(filename, fmt.iter_row_batches(file_path))
+        except Exception as e:
+            logger.error("JSON読み込みエラー %s: %s", file_path, e)
+            continue
+        accumulators[unit_found] = accumulator
+    return {unit: acc.to_grouped() for unit, acc in accumulators.items()}
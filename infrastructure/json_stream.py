@@ -0,0 +1,115 @@
+import json
+import logging
+from infrastructure.mmap_reader import MmapTextReader
+
+logger = logging.getLogger(__name__)
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+class _StreamBuffer:
+    """read(size) を持つテキストストリームを一定サイズずつ読み込み、解析済みの部分を捨てながら保持するバッファ"""
+    def __init__(self, f, chunk_size: int):
+        self._f = f
+        self._chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """追加で読み込む。これ以上読み込めなければ False を返す"""
+        if self.eof:
+            return False
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # 解析済みの部分を捨ててからつなげ、メモリ使用量を 1 要素 + チャンク程度に保つ
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self):
+        while True:
+            text, pos = self.text, self.pos
+            while pos < len(text) and text[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(text) or not self.fill():
+                return
+
+    def peek(self) -> str:
+        self.skip_whitespace()
+        if self.pos >= len(self.text):
+            raise ValueError("JSON が途中で終了しています")
+        return self.text[self.pos]
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"JSON の形式が不正です: '{char}' が必要な位置に '{self.text[self.pos]}' があります")
+        self.pos += 1
+
+    def decode_value(self):
+        """
+        現在位置から JSON の値 (文字列・オブジェクト) を 1 つ読み取る。
+        バッファ内で値が完結していなければ、追加で読み込んで再試行する。
+        """
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            self.pos = end
+            return value
+
+def _iter_object_rows(buf: _StreamBuffer, depth: int, path: tuple):
+    """
+    現在位置の JSON オブジェクトを読み、depth 段目の値である配列の各要素を (キーのタプル, 要素) として返す。
+    """
+    buf.expect("{")
+    if buf.peek() == "}":
+        buf.pos += 1
+        return
+    while True:
+        key = buf.decode_value()
+        buf.expect(":")
+        if depth > 1:
+            yield from _iter_object_rows(buf, depth - 1, path + (key,))
+        else:
+            buf.expect("[")
+            if buf.peek() != "]":
+                while True:
+                    yield path + (key,), buf.decode_value()
+                    if buf.peek() == ",":
+                        buf.pos += 1
+                        continue
+                    break
+            buf.expect("]")
+        if buf.peek() == ",":
+            buf.pos += 1
+            continue
+        buf.expect("}")
+        return
+
+def iter_nested_json_rows(json_filepath: str, depth: int, chunk_size: int = 64 * 1024):
+    """
+    depth 段のオブジェクトの下に行の配列がある JSON ファイルを先頭から順に読み、
+    (キーのタプル, row) を 1 件ずつ返すジェネレータ。
+    例えば中間ファイル { sheet: { group: [row, ...] } } は depth=2 で ((sheet, group), row) となる。
+    ファイルはメモリマップして少しずつ復号するため、読み込んだ範囲以外はメモリに載らない。
+    """
+    with MmapTextReader(json_filepath) as reader:
+        buf = _StreamBuffer(reader, chunk_size)
+        yield from _iter_object_rows(buf, depth, ())
+
+def iter_grouped_json_rows(json_filepath: str, chunk_size: int = 64 * 1024):
+    """
+    { "グループ名": [row, row, ...], ... } 形式の JSON ファイルを先頭から順に読み、
+    (グループ名, row) を 1 件ずつ返すジェネレータ。
+    ファイル全体を読み込まないため、メモリ使用量は 1 行分とチャンクサイズ程度に収まる。
+    """
+    for (group,), row in iter_nested_json_rows(json_filepath, 1, chunk_size):
+        yield group, row
@@ -1,45 +1,95 @@
-import json
 import csv
 import os
 import logging
+from concurrent.futures import as_completed
+from config import MAX_WORKERS
+from infrastructure.json_stream import iter_grouped_json_rows
+from infrastructure.process_pool import logging_process_pool
 
 logger = logging.getLogger(__name__)
 
+def _csv_row(row: dict) -> dict:
+    """"merged_files" がリストの場合はカンマ区切りの文字列に変換した行を返す（元の行は変更しない）"""
+    merged_files = row.get("merged_files")
+    if isinstance(merged_files, list):
+        row = dict(row)
+        row["merged_files"] = ", ".join(merged_files)
+    return row
+
+def _header_union(rows) -> list:
+    """全行のキーを、最初に現れた順に並べたヘッダーを返す"""
+    headers = {}
+    for row in rows:
+        for key in row:
+            if key not in headers:
+                headers[key] = None
+    return list(headers)
+
+def _write_csv(csv_filepath: str, headers: list, rows) -> bool:
+    try:
+        with open(csv_filepath, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=headers)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(_csv_row(row))
+    except Exception as e:
+        logger.error("CSVファイル書き出しエラー (%s): %s", csv_filepath, e)
+        return False
+    return True
+
 def convert_json_file_to_csv(json_filepath: str, csv_filepath: str) -> bool:
     """
     指定された JSON ファイルを読み込み、その内容を CSV ファイルに変換して csv_filepath に保存します。
     JSON の形式は、辞書型でキーがグループ名、値がそのグループの行リスト（各行は辞書）となっていることを想定しています。
     各グループの行をフラットに連結し、"merged_files" がリストの場合はカンマ区切りの文字列に変換します。
+    JSON は 2 回ストリーミングで読み込み（1 回目でヘッダー＝全行のキーの和集合を求め、2 回目で書き出す）、
+    ファイル全体をメモリに展開しません。
     """
     try:
-        with open(json_filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        headers = _header_union(row for _, row in iter_grouped_json_rows(json_filepath))
     except Exception as e:
         logger.error("JSONファイルの読み込みエラー (%s): %s", json_filepath, e)
         return False
 
-    # data は { "グループ名": [row, row, ...], ... } の形式を想定
-    rows = []
-    for group, group_rows in data.items():
-        for row in group_rows:
-            # merged_files がリストなら文字列に変換
-            if "merged_files" in row and isinstance(row["merged_files"], list):
-                row["merged_files"] = ", ".join(row["merged_files"])
-            rows.append(row)
-    
-    if not rows:
+    if not headers:
         logger.info("変換対象の行が存在しません: %s", json_filepath)
         return False
 
-    headers = list(rows[0].keys())
-    try:
-        with open(csv_filepath, "w", encoding="utf-8", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-            for row in rows:
-                writer.writerow(row)
-    except Exception as e:
-        logger.error("CSVファイル書き出しエラー (%s): %s", csv_filepath, e)
+    return _write_csv(csv_filepath, headers, (row for _, row in iter_grouped_json_rows(json_filepath)))
+
+def write_grouped_rows_to_csv(grouped: dict, csv_filepath: str) -> bool:
+    """
+    合算結果 { グループ名: [row, ...], ... } を、JSON を経由せずに直接 CSV に書き出します。
+    形式は convert_json_file_to_csv と同じです。
+    """
+    rows = [row for group_rows in grouped.values() for row in group_rows]
+    if not rows:
+        logger.info("変換対象の行が存在しません: %s", csv_filepath)
         return False
+    return _write_csv(csv_filepath, _header_union(rows), rows)
 
-    return True
+def convert_json_files_to_csv(file_pairs: list, max_workers: int = None, progress_callback=None) -> dict:
+    """
+    (json_filepath, csv_filepath) のリストを、プロセスプールで並列に CSV へ変換します。
+    progress_callback(done, total) は 1 ファイル完了するごとに呼ばれます。
+    戻り値は json_filepath → 成否 の辞書（file_pairs の順）です。
+    """
+    if max_workers is None:
+        max_workers = MAX_WORKERS
+    results = {json_filepath: False for json_filepath, _ in file_pairs}
+    if not file_pairs:
+        return results
+    with logging_process_pool(max_workers) as executor:
+        futures = {
+            executor.submit(convert_json_file_to_csv, json_filepath, csv_filepath): json_filepath
+            for json_filepath, csv_filepath in file_pairs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            json_filepath = futures[future]
+            try:
+                results[json_filepath] = future.result()
+            except Exception as e:
+                logger.error("CSV変換中にエラー (%s): %s", json_filepath, e)
+            if progress_callback:
+                progress_callback(done, len(file_pairs))
+    return results
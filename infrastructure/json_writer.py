@@ -3,6 +3,7 @@ import os
 from datetime import datetime
 import logging
 from config import TMP_FOLDER
+from infrastructure.row_record import json_default
 from infrastructure.utils import ensure_folder_exists
 
 logger = logging.getLogger(__name__)
@@ -12,6 +13,7 @@ def write_json_output(data: dict, out_filename: str = None) -> str:
     data の内容を TMP_FOLDER に JSON ファイルとして保存し、
     作成したファイルパスを返す関数。
     out_filename が指定されなければ "output_YYYYMMDD_HHMMSS.json" を生成します。
+    抽出結果の Record はここで辞書に変換して書き出します。
     """
     ensure_folder_exists(TMP_FOLDER)
     if not out_filename:
@@ -19,7 +21,7 @@ def write_json_output(data: dict, out_filename: str = None) -> str:
     file_path = os.path.join(TMP_FOLDER, out_filename)
     try:
         with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+            json.dump(data, f, ensure_ascii=False, indent=4, default=json_default)
     except Exception as e:
         logger.error("JSONファイル書き出しエラー: %s", e)
     return file_path
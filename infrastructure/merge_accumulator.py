@@ -0,0 +1,126 @@
+import logging
+from operator import itemgetter
+
+logger = logging.getLogger(__name__)
+
+_key_getter = itemgetter("グループ", "指図書No", "補足")
+_time_getter = itemgetter("時間")
+
+def _encode_rows_checked(filename: str, rows: list):
+    """行ごとに検証しながら (キー列, 時間列, 行列) を作る。不正な行はログに出してスキップする。"""
+    keys = []
+    times = []
+    valid_rows = []
+    for row in rows:
+        try:
+            composite_key = (
+                str(row["グループ"]).strip(),
+                str(row["指図書No"]).strip(),
+                str(row["補足"]).strip()
+            )
+        except Exception:
+            logger.error("必要なキーが存在しない行: %s", row)
+            continue
+        # "時間" が null の場合は 0.0 として扱う
+        if row["時間"] is None:
+            time_val = 0.0
+        else:
+            try:
+                time_val = float(row["時間"])
+            except Exception:
+                logger.error("時間の値が不正な行 (ファイル %s): %s", filename, row)
+                continue
+        keys.append(composite_key)
+        times.append(time_val)
+        valid_rows.append(row)
+    return keys, times, valid_rows
+
+def encode_rows(filename: str, rows: list):
+    """
+    行のリストを (キー列, 時間列, 行列) に変換する。
+    通常は内包表記でまとめて変換し、不正な行が含まれる場合のみ行ごとの検証に切り替える。
+    """
+    try:
+        keys = [(str(g).strip(), str(o).strip(), str(s).strip()) for g, o, s in map(_key_getter, rows)]
+        times = [0.0 if t is None else float(t) for t in map(_time_getter, rows)]
+    except Exception:
+        return _encode_rows_checked(filename, rows)
+    return keys, times, rows
+
+class UnitMergeAccumulator:
+    """
+    1 つの単位 (unit) 分の合算状態を、列指向 (配列) で保持するアキュムレータ。
+
+    結合主キー (グループ, 指図書No, 補足) を整数 ID に符号化し、
+    "時間" の合計・最初の行・寄与ファイル名を ID を添字とする並列の列 (リスト) に保持する。
+    行の辞書は各キーで最初に現れた行への参照のみを保持し、to_grouped() で初めて出力用の辞書を作る。
+    加算の順序は従来の行単位の実装と同じため、出力は完全に一致する。
+    """
+    def __init__(self):
+        self._key_ids = {}          # composite_key -> ID (挿入順 = ID 順)
+        self._first_rows = []       # ID -> 最初に現れた行
+        self._times = []            # ID -> "時間" の合計
+        self._files = []            # ID -> 寄与したファイル名のリスト
+
+    def __len__(self):
+        return len(self._key_ids)
+
+    def add_rows(self, filename: str, rows):
+        """
+        filename に由来する行をまとめて加算する。
+        同じファイルの行は連続して渡すこと（複数回に分けて渡してもよい）。
+        """
+        self.add_file(filename, [rows])
+
+    def add_file(self, filename: str, row_batches):
+        """
+        filename に由来する行のリストのイテラブル (row_batches) を順に読みながら加算する。
+        row_batches は遅延評価でよく、ファイル全体の行を一度に保持する必要はない。
+        読み込みの途中で例外が発生した場合は、このファイルの行は 1 件も加算されずに例外が送出される。
+        """
+        # 読み込みが完了するまでは、キー・時間と未登録キーの最初の行だけを保持しておく
+        staged_keys = []
+        staged_times = []
+        new_rows = {}  # 未登録の composite_key -> 最初に現れた行 (出現順)
+        key_ids = self._key_ids
+        for rows in row_batches:
+            if not isinstance(rows, list):
+                rows = list(rows)
+            keys, times, rows = encode_rows(filename, rows)
+            if None in map(key_ids.get, keys):
+                for key, row in zip(keys, rows):
+                    if key not in key_ids and key not in new_rows:
+                        new_rows[key] = row
+            staged_keys.extend(keys)
+            staged_times.extend(times)
+        if not staged_keys:
+            return
+        # 未登録のキーに ID を割り当て、最初に現れた行を保持する
+        first_rows = self._first_rows
+        for key, row in new_rows.items():
+            key_ids[key] = len(first_rows)
+            first_rows.append(row)
+            # -0.0 は加算の単位元なので、初回の加算結果は値そのものになる
+            self._times.append(-0.0)
+            self._files.append([])
+        ids = list(map(key_ids.__getitem__, staged_keys))
+        totals = self._times
+        for key_id, time_val in zip(ids, staged_times):
+            totals[key_id] += time_val
+        files = self._files
+        for key_id in set(ids):
+            key_files = files[key_id]
+            if not key_files or key_files[-1] != filename:
+                key_files.append(filename)
+
+    def to_grouped(self) -> dict:
+        """合算結果を { グループ名: [row, ...], ... } の形式で返す"""
+        grouped = {}
+        for composite_key, key_id in self._key_ids.items():
+            row = {**self._first_rows[key_id], "時間": self._times[key_id], "merged_files": list(self._files[key_id])}
+            # composite_key の最初の要素がグループ名
+            group_name = composite_key[0]
+            if group_name not in grouped:
+                grouped[group_name] = []
+            grouped[group_name].append(row)
+        return grouped
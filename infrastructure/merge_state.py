@@ -0,0 +1,310 @@
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import zlib
+from array import array
+from config import MERGE_STATE_FILE
+from infrastructure.merge_accumulator import encode_rows
+from infrastructure.utils import ensure_folder_exists
+
+logger = logging.getLogger(__name__)
+
+# 保存する合算状態の形式。変更した場合は以前の状態を破棄して作り直す
+STATE_VERSION = 3
+
+def source_key(path: str) -> str:
+    """
+    元ファイルを識別するキー（正規化した絶対パス）。
+    中間形式や選択した IN フォルダによって変わる merged_files のファイル名とは異なり、同じファイルなら常に同じになる。
+    """
+    return os.path.normcase(os.path.abspath(path))
+
+def _pack_times(times: list) -> bytes:
+    return array("d", times).tobytes()
+
+def _unpack_times(blob: bytes) -> array:
+    times = array("d")
+    times.frombytes(blob)
+    return times
+
+class IncrementalMergeStore:
+    """
+    単位ごとの合算状態を、ファイルごとの寄与として SQLite (MERGE_STATE_FILE) に永続化するクラス。
+
+    ファイルは元ファイルのキー (source_key) で識別し、追加順の番号 (seq) と merged_files に出力するファイル名を持つ。
+    寄与はキー (グループ, 指図書No, 補足) × ファイルごとに、ファイル内で最初に現れた位置と "時間" の値の列を保存し、
+    各キーの最初の行はファイルごとにまとめて（ファイル内の位置の順に）保存する。
+    キーごとの "時間" の合計と、出力での並び（最初に現れたファイルの seq・ファイル内の位置）も保存しておき、
+    ファイルの追加・置換・削除のたびにそのファイルに含まれるキーの分だけ更新する。
+    そのため 1 ファイルの更新は、そのファイルの行数に比例する計算量で済む（全体に比例するのは to_output だけ）。
+    加算の順序は、同じ順序のファイルを一括で合算した場合と同じになるため、出力も一致する。
+    変更は save() で確定する（save() 前に例外で中断した場合は、前回保存した状態のまま）。
+    """
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or MERGE_STATE_FILE
+        ensure_folder_exists(os.path.dirname(self.db_path))
+        self._conn = sqlite3.connect(self.db_path, timeout=30)
+        self._conn.execute("PRAGMA cache_size = -65536")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != STATE_VERSION:
+            # 以前の形式の状態は破棄する（次回の合算で作り直される）
+            logger.info("以前の形式の合算状態のため作り直します: %s", self.db_path)
+            self._conn.executescript(
+                "DROP TABLE IF EXISTS sources; DROP TABLE IF EXISTS merge_keys; DROP TABLE IF EXISTS contributions;"
+            )
+            self._conn.execute(f"PRAGMA user_version = {STATE_VERSION}")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                seq INTEGER PRIMARY KEY,
+                unit TEXT NOT NULL,
+                source TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                stamp TEXT,
+                rows BLOB NOT NULL,
+                UNIQUE (unit, source)
+            );
+            -- total は -0.0 をそのまま保持するため型を指定しない
+            CREATE TABLE IF NOT EXISTS merge_keys (
+                id INTEGER PRIMARY KEY,
+                unit TEXT NOT NULL,
+                grp TEXT NOT NULL,
+                order_no TEXT NOT NULL,
+                note TEXT NOT NULL,
+                total NOT NULL,
+                first_seq INTEGER NOT NULL,
+                first_pos INTEGER NOT NULL,
+                UNIQUE (unit, grp, order_no, note)
+            );
+            CREATE INDEX IF NOT EXISTS idx_merge_keys_order ON merge_keys (unit, first_seq, first_pos);
+            -- ファイルごとにまとめて追加・削除するため (seq, pos) の順に格納する
+            CREATE TABLE IF NOT EXISTS contributions (
+                seq INTEGER NOT NULL,
+                pos INTEGER NOT NULL,
+                key_id INTEGER NOT NULL,
+                times BLOB NOT NULL,
+                PRIMARY KEY (seq, pos)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_contributions_key ON contributions (key_id, seq);
+            CREATE TEMP TABLE incoming (
+                pos INTEGER PRIMARY KEY,
+                grp TEXT NOT NULL,
+                order_no TEXT NOT NULL,
+                note TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def units(self) -> list:
+        """寄与ファイルのある単位の一覧"""
+        return sorted(unit for unit, in self._conn.execute("SELECT DISTINCT unit FROM sources"))
+
+    def is_empty(self) -> bool:
+        """寄与ファイルのある単位が 1 つもなければ True"""
+        return self._conn.execute("SELECT 1 FROM sources LIMIT 1").fetchone() is None
+
+    def sources(self, unit: str) -> list:
+        """unit に登録済みのファイル (source) を追加順に返す"""
+        return [source for source, in self._conn.execute(
+            "SELECT source FROM sources WHERE unit = ? ORDER BY seq", (unit,))]
+
+    def _seq(self, unit: str, source: str):
+        row = self._conn.execute("SELECT seq FROM sources WHERE unit = ? AND source = ?", (unit, source)).fetchone()
+        return None if row is None else row[0]
+
+    def is_unchanged(self, unit: str, source: str, stamp) -> bool:
+        """source が stamp と同じ状態で unit に登録済みかどうか"""
+        if stamp is None:
+            return False
+        row = self._conn.execute(
+            "SELECT stamp FROM sources WHERE unit = ? AND source = ?", (unit, source)).fetchone()
+        return row is not None and row[0] == json.dumps(stamp)
+
+    def rename_file(self, unit: str, source: str, filename: str) -> bool:
+        """登録済みの source の merged_files に出力するファイル名を変更する（寄与はそのまま）。変更した場合は True。"""
+        cursor = self._conn.execute(
+            "UPDATE sources SET filename = ? WHERE unit = ? AND source = ? AND filename != ?",
+            (filename, unit, source, filename),
+        )
+        return cursor.rowcount > 0
+
+    def upsert_file(self, unit: str, source: str, filename: str, row_batches, stamp=None):
+        """
+        source の寄与を、merged_files に出力するファイル名 filename で unit に登録する。
+        既に登録済みならば置き換える（並び順は維持する）。
+        stamp には変更検出用の値（元ファイルのサイズ・更新時刻など）を渡す。
+        """
+        contribution = {}  # composite_key -> [時間, ...] (ファイル内で最初に現れた順)
+        first_rows = []    # ファイル内の位置 -> 最初に現れた行
+        for rows in row_batches:
+            if not isinstance(rows, list):
+                rows = list(rows)
+            keys, times, rows = encode_rows(filename, rows)
+            for composite_key, time_val, row in zip(keys, times, rows):
+                key_times = contribution.get(composite_key)
+                if key_times is None:
+                    contribution[composite_key] = [time_val]
+                    first_rows.append(row)
+                else:
+                    key_times.append(time_val)
+        stamp_text = None if stamp is None else json.dumps(stamp)
+        rows_blob = zlib.compress(pickle.dumps(first_rows, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        seq = self._seq(unit, source)
+        if seq is not None:
+            self._conn.execute("UPDATE sources SET filename = ?, stamp = ?, rows = ? WHERE seq = ?",
+                               (filename, stamp_text, rows_blob, seq))
+            old_keys = self._take_contributions(seq)
+            key_ids = self._insert_contributions(unit, seq, contribution)
+            self._recompute(old_keys.union(key_ids))
+            return
+        # 新しいファイルの seq は既存のどのファイルよりも大きいため、既存の合計にこのファイルの時間を順に足すだけでよい
+        seq = self._conn.execute(
+            "INSERT INTO sources (unit, source, filename, stamp, rows) VALUES (?, ?, ?, ?, ?)",
+            (unit, source, filename, stamp_text, rows_blob),
+        ).lastrowid
+        self._insert_contributions(unit, seq, contribution, append=True)
+
+    def _insert_contributions(self, unit: str, seq: int, contribution: dict, append: bool = False) -> list:
+        """
+        contribution を seq の寄与として登録し、キーの ID のリスト（ファイル内の位置の順）を返す。
+        append が True の場合は既存のキーの合計にこのファイルの時間を足す。未登録のキーはこのファイルの位置で登録する。
+        キーの照合は一時テーブルとの結合でまとめて行う。
+        """
+        conn = self._conn
+        conn.execute("DELETE FROM temp.incoming")
+        conn.executemany("INSERT INTO temp.incoming VALUES (?, ?, ?, ?)",
+                         ((pos, *composite_key) for pos, composite_key in enumerate(contribution)))
+        match_sql = ("SELECT i.pos, k.id, k.total FROM temp.incoming i JOIN merge_keys k "
+                     "ON k.unit = ? AND k.grp = i.grp AND k.order_no = i.order_no AND k.note = i.note")
+        existing = {pos: (key_id, total) for pos, key_id, total in conn.execute(match_sql, (unit,))}
+        inserts = []
+        updates = []
+        for pos, (composite_key, times) in enumerate(contribution.items()):
+            found = existing.get(pos)
+            if found is None:
+                # -0.0 は加算の単位元なので、初回の加算結果は値そのものになる
+                total = -0.0
+                for time_val in times:
+                    total += time_val
+                inserts.append((unit, *composite_key, total, seq, pos))
+            elif append:
+                key_id, total = found
+                for time_val in times:
+                    total += time_val
+                updates.append((total, key_id))
+        conn.executemany("UPDATE merge_keys SET total = ? WHERE id = ?", updates)
+        # INTEGER PRIMARY KEY の ID は既存の最大値から順に割り当てられるため、追加したキーの ID は問い合わせずに求まる
+        next_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM merge_keys").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO merge_keys (unit, grp, order_no, note, total, first_seq, first_pos) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", inserts)
+        key_ids = []
+        for pos in range(len(contribution)):
+            found = existing.get(pos)
+            if found is None:
+                key_ids.append(next_id)
+                next_id += 1
+            else:
+                key_ids.append(found[0])
+        conn.executemany("INSERT INTO contributions VALUES (?, ?, ?, ?)",
+                         ((seq, pos, key_id, _pack_times(times))
+                          for pos, (key_id, times) in enumerate(zip(key_ids, contribution.values()))))
+        return key_ids
+
+    def _take_contributions(self, seq: int) -> set:
+        """seq の寄与を削除し、寄与していたキーの ID の集合を返す"""
+        key_ids = {key_id for key_id, in self._conn.execute("SELECT key_id FROM contributions WHERE seq = ?", (seq,))}
+        self._conn.execute("DELETE FROM contributions WHERE seq = ?", (seq,))
+        return key_ids
+
+    def _recompute(self, key_ids):
+        """指定したキーの合計と並びを、寄与しているファイルの順に計算し直す（寄与がなくなったキーは削除する）"""
+        conn = self._conn
+        for key_id in key_ids:
+            contributions = conn.execute(
+                "SELECT seq, pos, times FROM contributions WHERE key_id = ? ORDER BY seq", (key_id,)).fetchall()
+            if not contributions:
+                conn.execute("DELETE FROM merge_keys WHERE id = ?", (key_id,))
+                continue
+            total = -0.0
+            for _, _, blob in contributions:
+                for time_val in _unpack_times(blob):
+                    total += time_val
+            first_seq, first_pos, _ = contributions[0]
+            conn.execute("UPDATE merge_keys SET total = ?, first_seq = ?, first_pos = ? WHERE id = ?",
+                         (total, first_seq, first_pos, key_id))
+
+    def remove_file(self, unit: str, source: str) -> bool:
+        """unit から source の寄与を取り除く。登録されていなければ False を返す。"""
+        seq = self._seq(unit, source)
+        if seq is None:
+            return False
+        self._conn.execute("DELETE FROM sources WHERE seq = ?", (seq,))
+        self._recompute(self._take_contributions(seq))
+        return True
+
+    def retain(self, keep) -> int:
+        """
+        (unit, source) の集合 keep に含まれないファイルの寄与をすべての単位から取り除き、取り除いた件数を返す。
+        今回選択されなかったファイルや処理に失敗したファイルを合算結果から外すために使う。
+        """
+        removed = 0
+        for unit, source in self._conn.execute("SELECT unit, source FROM sources ORDER BY seq").fetchall():
+            if (unit, source) not in keep:
+                self.remove_file(unit, source)
+                removed += 1
+        return removed
+
+    def save(self):
+        """変更を確定する"""
+        self._conn.commit()
+
+    def reset(self):
+        """全単位の状態を削除する"""
+        with self._conn:
+            self._conn.executescript("DELETE FROM sources; DELETE FROM merge_keys; DELETE FROM contributions;")
+
+    def to_grouped(self, unit: str) -> dict:
+        """
+        unit の合算結果を { グループ名: [row, ...], ... } の形式で返す。
+        キーの並びは、ファイルの追加順・ファイル内の出現順で最初に現れた位置の順。
+        キーは最初に現れたファイルの順に並ぶため、最初の行はファイルごとに 1 回だけ読み込めばよい。
+        """
+        grouped = {}
+        current_id = None
+        merged_row = None
+        rows_seq = None
+        first_rows = None
+        for key_id, group_name, total, first_seq, first_pos, filename in self._conn.execute(
+            "SELECT k.id, k.grp, k.total, k.first_seq, k.first_pos, s.filename "
+            "FROM merge_keys k JOIN contributions c ON c.key_id = k.id JOIN sources s ON s.seq = c.seq "
+            "WHERE k.unit = ? ORDER BY k.first_seq, k.first_pos, c.seq",
+            (unit,),
+        ).fetchall():
+            if key_id != current_id:
+                current_id = key_id
+                if first_seq != rows_seq:
+                    rows_seq = first_seq
+                    blob, = self._conn.execute("SELECT rows FROM sources WHERE seq = ?", (first_seq,)).fetchone()
+                    first_rows = pickle.loads(zlib.decompress(blob))
+                merged_row = {**first_rows[first_pos], "時間": total, "merged_files": []}
+                if group_name not in grouped:
+                    grouped[group_name] = []
+                grouped[group_name].append(merged_row)
+            merged_row["merged_files"].append(filename)
+        return grouped
+
+    def to_output(self) -> dict:
+        """unit → { group_name: [row, ...] } を返す（寄与ファイルのない単位は除く）"""
+        return {unit: self.to_grouped(unit) for unit in self.units()}
@@ -0,0 +1,73 @@
+import codecs
+import mmap
+import os
+from contextlib import contextmanager
+
+@contextmanager
+def open_mmap(file_path: str):
+    """
+    ファイルを読み取り専用でメモリマップして返すコンテキストマネージャ。
+    空ファイルはメモリマップできないため、その場合は b"" を返す。
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+class MmapTextReader:
+    """
+    メモリマップしたファイルを、read(size) で少しずつ文字列として読み出すリーダー。
+    UTF-8 の多バイト文字がチャンク境界で分割されても正しく復号する。
+    読み出した範囲以外のページには触れないため、ファイル全体をメモリに読み込まない。
+    """
+    def __init__(self, file_path: str, encoding: str = "utf-8"):
+        self._context = open_mmap(file_path)
+        self._mapped = self._context.__enter__()
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._pos = 0
+        # UTF-8 の BOM は読み飛ばす
+        if self._mapped[:3] == codecs.BOM_UTF8:
+            self._pos = 3
+
+    def read(self, size: int) -> str:
+        """
+        最大 size バイト分を復号して返す。空文字列はファイルの終端を表すため、
+        チャンクが多バイト文字の途中で終わって何も復号できなかった場合は続けて読み込む。
+        """
+        while True:
+            chunk = self._mapped[self._pos:self._pos + size]
+            self._pos += len(chunk)
+            text = self._decoder.decode(chunk, final=self._pos >= len(self._mapped))
+            if text or not chunk:
+                return text
+
+    def close(self):
+        self._context.__exit__(None, None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_mmap_lines(file_path: str):
+    """
+    メモリマップしたファイルから、改行区切りの各行 (改行を除いた bytes) を順に返すジェネレータ。
+    空行は返さない。
+    """
+    with open_mmap(file_path) as mapped:
+        size = len(mapped)
+        pos = 0
+        while pos < size:
+            end = mapped.find(b"\n", pos)
+            if end < 0:
+                end = size
+            line = mapped[pos:end]
+            pos = end + 1
+            if line.strip():
+                yield line
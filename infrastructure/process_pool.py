@@ -0,0 +1,43 @@
+import logging
+import logging.handlers
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+class _ForwardToLogger(logging.Handler):
+    """ワーカーから届いたログを、親プロセスの同名のロガーで処理し直すハンドラー"""
+    def emit(self, record: logging.LogRecord):
+        logger = logging.getLogger(record.name)
+        if logger.isEnabledFor(record.levelno):
+            logger.handle(record)
+
+def _init_worker_logging(log_queue, level: int):
+    """
+    ワーカープロセスの初期化処理。ルートロガーのハンドラーを log_queue への QueueHandler だけにする。
+    fork で起動したワーカーは親の QueueHandler (親のスレッドしか読み出さないキュー) などを引き継ぐため、置き換える。
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+@contextmanager
+def logging_process_pool(max_workers: int = None):
+    """
+    ワーカーのログを親プロセスへ転送する ProcessPoolExecutor を返すコンテキストマネージャー。
+    ワーカーのログは multiprocessing のキューで親へ送られ、親のログ設定（コンソール・error.log など）で出力される。
+    終了時はワーカーの終了を待ってから、キューに残ったログをすべて処理する。
+    """
+    import multiprocessing
+
+    log_queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(log_queue, _ForwardToLogger())
+    listener.start()
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker_logging,
+                                 initargs=(log_queue, logging.getLogger().getEffectiveLevel())) as executor:
+            yield executor
+    finally:
+        listener.stop()
+        log_queue.close()
+        log_queue.join_thread()
@@ -0,0 +1,412 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from config import QUERY_INDEX_FILE
+from infrastructure.row_record import json_default
+from infrastructure.utils import ensure_folder_exists
+
+logger = logging.getLogger(__name__)
+
+# 明細の検索結果の既定の上限件数
+DEFAULT_LIMIT = 1000
+
+# スキーマを変更したら上げる（異なる版のインデックスは作り直す）
+INDEX_VERSION = 2
+
+_TABLES = [
+    """
+    CREATE TABLE meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """,
+    # 合算結果の行 (output_{unit}.json の 1 行)。data は行全体の JSON
+    """
+    CREATE TABLE merged_rows (
+        id INTEGER PRIMARY KEY,
+        unit TEXT NOT NULL,
+        grp TEXT NOT NULL,
+        order_no TEXT,
+        note TEXT,
+        hours REAL NOT NULL,
+        data TEXT NOT NULL
+    )
+    """,
+    # 合算結果の行に寄与したファイル (merged_files)。ファイル名は files に 1 回だけ保持する
+    """
+    CREATE TABLE files (
+        id INTEGER PRIMARY KEY,
+        filename TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE contributions (
+        row_id INTEGER NOT NULL,
+        file_id INTEGER NOT NULL
+    )
+    """,
+    # 集計済みの合計: 単位・指図書No ごと / 単位・グループごと / ファイルごとの寄与した行数
+    """
+    CREATE TABLE order_totals (
+        unit TEXT NOT NULL,
+        order_no TEXT,
+        hours REAL NOT NULL,
+        row_count INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE group_totals (
+        unit TEXT NOT NULL,
+        grp TEXT NOT NULL,
+        hours REAL NOT NULL,
+        row_count INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE file_totals (
+        file_id INTEGER PRIMARY KEY,
+        row_count INTEGER NOT NULL
+    )
+    """,
+]
+
+# 索引。すべての単位を作り直す場合は、行を入れ終えてから作成する
+_INDEXES = [
+    "CREATE INDEX idx_rows_unit_grp ON merged_rows (unit, grp)",
+    "CREATE INDEX idx_rows_grp ON merged_rows (grp)",
+    "CREATE INDEX idx_rows_order ON merged_rows (order_no)",
+    "CREATE UNIQUE INDEX idx_files_filename ON files (filename)",
+    "CREATE INDEX idx_contrib_file ON contributions (file_id, row_id)",
+    "CREATE INDEX idx_contrib_row ON contributions (row_id)",
+    "CREATE INDEX idx_order_totals ON order_totals (order_no, unit)",
+    "CREATE INDEX idx_group_totals ON group_totals (grp, unit)",
+]
+
+# 行全体の JSON（data 列）。行ごとに json.dumps を呼ぶより、エンコーダーを使い回すほうが速い
+_encode_row = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=json_default).encode
+
+def _key_text(value):
+    """指図書No・補足などのキーを、合算時の結合キーと同じく前後の空白を除いた文字列にする（None はそのまま）"""
+    return None if value is None else str(value).strip()
+
+def _connect_for_update(db_path: str) -> sqlite3.Connection:
+    """
+    更新用に開く。SQLite のデータベースとして読めないファイルは削除して作り直す。
+    WAL モードにするため、更新中も検索側は更新前の内容を読める。
+    """
+    for attempt in range(2):
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            return conn
+        except sqlite3.DatabaseError as e:
+            conn.close()
+            if attempt:
+                raise
+            logger.warning("検索用インデックスを読み込めないため作り直します (%s): %s", db_path, e)
+            for path in (db_path, db_path + "-wal", db_path + "-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+def _reset_schema(conn: sqlite3.Connection):
+    """すべての表を削除し、索引のない空の表を作り直す（トランザクション内で呼ぶ）"""
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+        conn.execute(f'DROP TABLE "{name}"')
+    for statement in _TABLES:
+        conn.execute(statement)
+    conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+def _delete_units(conn: sqlite3.Connection, units: list) -> tuple:
+    """指定した単位の行と集計を削除し、(削除した行数, 寄与していたファイルの ID の集合) を返す"""
+    deleted = 0
+    file_ids = set()
+    for unit in units:
+        row_ids = "SELECT id FROM merged_rows WHERE unit = ?"
+        file_ids.update(file_id for file_id, in conn.execute(
+            f"SELECT DISTINCT file_id FROM contributions WHERE row_id IN ({row_ids})", (unit,)))
+        conn.execute(f"DELETE FROM contributions WHERE row_id IN ({row_ids})", (unit,))
+        deleted += conn.execute("DELETE FROM merged_rows WHERE unit = ?", (unit,)).rowcount
+        conn.execute("DELETE FROM order_totals WHERE unit = ?", (unit,))
+        conn.execute("DELETE FROM group_totals WHERE unit = ?", (unit,))
+    return deleted, file_ids
+
+def _insert_units(conn: sqlite3.Connection, final_output: dict, units: list) -> tuple:
+    """指定した単位の行・寄与ファイル・集計を追加し、(追加した行数, 寄与したファイルの ID の集合) を返す"""
+    row_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM merged_rows").fetchone()[0]
+    first_row_id = row_id
+    file_ids = dict(conn.execute("SELECT filename, id FROM files"))
+    next_file_id = max(file_ids.values(), default=0) + 1
+    new_files = []
+    used_file_ids = set()
+    rows = []
+    contributions = []
+    for unit in units:
+        for group_name, group_rows in final_output[unit].items():
+            group_text = str(group_name)
+            for row in group_rows:
+                row_id += 1
+                rows.append((row_id, unit, group_text, _key_text(row.get("指図書No")),
+                             _key_text(row.get("補足")), row.get("時間") or 0.0, _encode_row(row)))
+                for filename in row.get("merged_files") or ():
+                    file_id = file_ids.get(filename)
+                    if file_id is None:
+                        file_id = file_ids[filename] = next_file_id
+                        next_file_id += 1
+                        new_files.append((file_id, filename))
+                    used_file_ids.add(file_id)
+                    contributions.append((row_id, file_id))
+            if len(rows) >= 10000:
+                conn.executemany("INSERT INTO merged_rows VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.executemany("INSERT INTO contributions VALUES (?, ?)", contributions)
+                rows.clear()
+                contributions.clear()
+        conn.executemany("INSERT INTO merged_rows VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO contributions VALUES (?, ?)", contributions)
+        rows.clear()
+        contributions.clear()
+        conn.execute(
+            "INSERT INTO order_totals SELECT unit, order_no, SUM(hours), COUNT(*) FROM merged_rows "
+            "WHERE unit = ? GROUP BY order_no", (unit,)
+        )
+        conn.execute(
+            "INSERT INTO group_totals SELECT unit, grp, SUM(hours), COUNT(*) FROM merged_rows "
+            "WHERE unit = ? GROUP BY grp", (unit,)
+        )
+    conn.executemany("INSERT INTO files VALUES (?, ?)", new_files)
+    return row_id - first_row_id, used_file_ids
+
+def _update_file_totals(conn: sqlite3.Connection, file_ids: set):
+    """指定したファイルの寄与した行数を数え直し、寄与がなくなったファイルは削除する"""
+    for file_id in file_ids:
+        conn.execute("DELETE FROM file_totals WHERE file_id = ?", (file_id,))
+        count = conn.execute("SELECT COUNT(*) FROM contributions WHERE file_id = ?", (file_id,)).fetchone()[0]
+        if count:
+            conn.execute("INSERT INTO file_totals VALUES (?, ?)", (file_id, count))
+        else:
+            conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+def _stale_marker_path(db_path: str) -> str:
+    """インデックスの更新に失敗したことを示すファイル（内容はエラーメッセージ）"""
+    return db_path + ".stale"
+
+def build_query_index(final_output: dict, db_path: str = None, unit_digests: dict = None) -> str:
+    """
+    合算結果 (unit → { group_name: [row, ...] }) で検索用の SQLite インデックスを更新し、そのパスを返す。
+
+    unit_digests (unit → 出力内容のダイジェスト) を渡すと、前回の更新時と同じダイジェストの単位はそのまま残し、
+    内容が変わった単位と、なくなった単位の行だけを入れ替える。未指定の場合はすべての単位を作り直す。
+    更新は既存のファイルに対して 1 つのトランザクションで行う。WAL モードのため、検索画面などが
+    インデックスを開いたままでも更新でき、更新中・失敗時も以前の内容をそのまま読める。
+    グループ・指図書No・単位・寄与したファイルに索引を張り、単位ごとの 指図書No 別・グループ別の合計は
+    更新時に集計しておく。
+    更新に失敗した場合は、インデックスが合算結果より古いことを QueryIndex.info() の "stale" で知らせられるよう
+    印のファイルを残してから例外を送出する（次に更新に成功すると削除する）。
+    """
+    db_path = db_path or QUERY_INDEX_FILE
+    ensure_folder_exists(os.path.dirname(db_path))
+    try:
+        _update_query_index(final_output, db_path, unit_digests)
+    except Exception as e:
+        try:
+            with open(_stale_marker_path(db_path), "w", encoding="utf-8") as f:
+                f.write(str(e) or type(e).__name__)
+        except OSError as marker_error:
+            logger.warning("検索用インデックスの状態を記録できません: %s", marker_error)
+        raise
+    if os.path.exists(_stale_marker_path(db_path)):
+        os.remove(_stale_marker_path(db_path))
+    return db_path
+
+def _update_query_index(final_output: dict, db_path: str, unit_digests: dict):
+    start = time.perf_counter()
+    conn = _connect_for_update(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            meta = {}
+            if conn.execute("PRAGMA user_version").fetchone()[0] == INDEX_VERSION:
+                meta = dict(conn.execute("SELECT key, value FROM meta"))
+            stored_digests = json.loads(meta.get("digests") or "{}")
+            stored_units = json.loads(meta.get("units") or "[]")
+            if unit_digests is None or not meta:
+                changed = list(final_output)
+            else:
+                changed = [unit for unit in final_output
+                           if unit_digests.get(unit) is None or stored_digests.get(unit) != unit_digests.get(unit)]
+            removed = [unit for unit in stored_units if unit not in final_output]
+            if set(changed) >= set(stored_units):
+                # すべての単位を作り直す場合は、表を作り直して行を入れてから索引を作るほうが速い
+                _reset_schema(conn)
+                row_count, _ = _insert_units(conn, final_output, changed)
+                conn.execute("INSERT INTO file_totals SELECT file_id, COUNT(*) FROM contributions GROUP BY file_id")
+                for statement in _INDEXES:
+                    conn.execute(statement)
+            else:
+                deleted, old_file_ids = _delete_units(conn, changed + removed)
+                inserted, new_file_ids = _insert_units(conn, final_output, changed)
+                _update_file_totals(conn, old_file_ids | new_file_ids)
+                row_count = int(meta.get("rows") or 0) - deleted + inserted
+            digests = {unit: (unit_digests or {}).get(unit) for unit in final_output}
+            conn.execute("DELETE FROM meta")
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("built_at", time.strftime("%Y-%m-%dT%H:%M:%S")),
+                ("units", json.dumps(sorted(final_output), ensure_ascii=False)),
+                ("rows", str(row_count)),
+                ("digests", json.dumps(digests, ensure_ascii=False)),
+            ])
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    logger.info("検索用インデックスを更新しました: %s (%d 単位を更新, %d 行, %.2f 秒)",
+                db_path, len(changed) + len(removed), row_count, time.perf_counter() - start)
+
+class QueryIndex:
+    """
+    build_query_index で作成した合算結果のインデックスを読み取り専用で検索するクラス。
+    output_{unit}.json を読み直さずに、指図書No・グループ・単位・寄与したファイルで絞り込める。
+    インデックスが存在しない場合は FileNotFoundError を送出する。
+    """
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or QUERY_INDEX_FILE
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"検索用インデックスがありません。合算処理を実行してください: {self.db_path}")
+        uri = "file:" + os.path.abspath(self.db_path).replace("\\", "/") + "?mode=ro"
+        self._conn = sqlite3.connect(uri, uri=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def info(self) -> dict:
+        """
+        更新日時 (built_at)・単位の一覧 (units)・行数 (rows)・直近の更新の失敗 (stale)。
+        stale は最後の更新に失敗していればそのエラーメッセージ（インデックスは合算結果より古い）、それ以外は None。
+        """
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        stale = None
+        try:
+            with open(_stale_marker_path(self.db_path), encoding="utf-8") as f:
+                stale = f.read() or "不明なエラー"
+        except OSError:
+            pass
+        return {
+            "built_at": meta.get("built_at"),
+            "units": json.loads(meta.get("units") or "[]"),
+            "rows": int(meta.get("rows") or 0),
+            "stale": stale,
+        }
+
+    def units(self) -> list:
+        return self.info()["units"]
+
+    def order_totals(self, order_no: str = None, unit: str = None, by_unit: bool = False,
+                     group: str = None, filename: str = None) -> list:
+        """
+        指図書No ごとの時間の合計を [{"指図書No", "単位", "時間", "行数"}] で返す（時間の多い順）。
+        by_unit が False なら単位をまたいで合計し、"単位" は None とする。
+        order_no を指定した場合はその指図書No だけを返す。
+        group・filename を指定した場合は、そのグループの行・そのファイルが寄与した行だけを合計する
+        （集計済みの合計ではなく行から集計する。時間は合算後の行の時間で、ファイルごとの内訳ではない）。
+        """
+        unit_column = "r.unit" if by_unit else "NULL"
+        group_by = "r.order_no, r.unit" if by_unit else "r.order_no"
+        if group is None and filename is None:
+            where, params = self._where(("r.order_no", order_no), ("r.unit", unit))
+            select = f"SELECT r.order_no, {unit_column}, SUM(r.hours), SUM(r.row_count) FROM order_totals r"
+        else:
+            where, params = self._where(("r.order_no", order_no), ("r.unit", unit), ("r.grp", group))
+            source, params = self._row_source(filename, params)
+            select = f"SELECT r.order_no, {unit_column}, SUM(r.hours), COUNT(*) FROM {source}"
+        sql = f"{select}{where} GROUP BY {group_by} ORDER BY SUM(r.hours) DESC, r.order_no"
+        return [
+            {"指図書No": order, "単位": unit_value, "時間": hours, "行数": count}
+            for order, unit_value, hours, count in self._conn.execute(sql, params)
+        ]
+
+    def group_totals(self, group: str = None, unit: str = None, order_no: str = None, filename: str = None) -> list:
+        """
+        単位・グループごとの時間の合計を [{"単位", "グループ", "時間", "行数"}] で返す。
+        order_no・filename を指定した場合は、その指図書No の行・そのファイルが寄与した行だけを行から集計する。
+        """
+        if order_no is None and filename is None:
+            where, params = self._where(("r.grp", group), ("r.unit", unit))
+            sql = f"SELECT r.unit, r.grp, r.hours, r.row_count FROM group_totals r{where} ORDER BY r.unit, r.grp"
+        else:
+            where, params = self._where(("r.grp", group), ("r.unit", unit), ("r.order_no", order_no))
+            source, params = self._row_source(filename, params)
+            sql = (f"SELECT r.unit, r.grp, SUM(r.hours), COUNT(*) FROM {source}{where} "
+                   "GROUP BY r.unit, r.grp ORDER BY r.unit, r.grp")
+        return [
+            {"単位": unit_value, "グループ": grp, "時間": hours, "行数": count}
+            for unit_value, grp, hours, count in self._conn.execute(sql, params)
+        ]
+
+    def contributing_files(self, group: str = None, order_no: str = None, unit: str = None,
+                           filename: str = None) -> list:
+        """
+        グループ・指図書No・単位で絞り込んだ行に寄与したファイルを [{"ファイル", "行数"}] で返す（ファイル名順）。
+        filename を指定した場合はそのファイルだけを返す。
+        """
+        where, params = self._where(("r.grp", group), ("r.order_no", order_no), ("r.unit", unit),
+                                    ("f.filename", filename))
+        if not params:
+            sql = "SELECT f.filename, t.row_count FROM files f JOIN file_totals t ON t.file_id = f.id ORDER BY f.filename"
+        else:
+            sql = ("SELECT f.filename, COUNT(*) FROM merged_rows r JOIN contributions c ON c.row_id = r.id "
+                   f"JOIN files f ON f.id = c.file_id{where} GROUP BY f.id ORDER BY f.filename")
+        return [{"ファイル": filename, "行数": count} for filename, count in self._conn.execute(sql, params)]
+
+    def rows(self, unit: str = None, group: str = None, order_no: str = None, filename: str = None,
+             limit: int = DEFAULT_LIMIT) -> list:
+        """
+        合算結果の行（output_{unit}.json と同じ辞書）を絞り込んで返す。
+        filename を指定した場合は、そのファイルが寄与した行だけを返す（ドリルダウン用）。
+        各行には単位を "単位" として加える。limit を超える分は返さない (None で無制限)。
+        """
+        where, params = self._where(("r.unit", unit), ("r.grp", group), ("r.order_no", order_no))
+        source, params = self._row_source(filename, params)
+        sql = f"SELECT r.unit, r.data FROM {source}{where} ORDER BY r.id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        result = []
+        for unit_value, data in self._conn.execute(sql, params):
+            row = json.loads(data)
+            row["単位"] = unit_value
+            result.append(row)
+        return result
+
+    @staticmethod
+    def _row_source(filename: str, params: list) -> tuple:
+        """
+        合算結果の行 (別名 r) の FROM 句と、params の前に filename を加えたパラメーターを返す。
+        filename を指定した場合は、そのファイルが寄与した行だけに絞り込む。
+        """
+        if filename is None:
+            return "merged_rows r", params
+        source = ("merged_rows r JOIN contributions c ON c.row_id = r.id"
+                  " JOIN files f ON f.id = c.file_id AND f.filename = ?")
+        return source, [filename] + params
+
+    @staticmethod
+    def _where(*conditions) -> tuple:
+        """(列名, 値) のうち値が None でないものを AND でつないだ WHERE 句とパラメーターを返す"""
+        clauses = []
+        params = []
+        for column, value in conditions:
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
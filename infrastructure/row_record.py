@@ -0,0 +1,91 @@
+import sys
+from collections.abc import Mapping
+
+GROUP_KEY = "グループ"
+ORDER_KEY = "指図書No"
+
+class RowSchema:
+    """
+    1 シート分の行が共有するヘッダー情報。
+
+    keys は辞書にした場合のキーの並び（ヘッダーの重複は最初の位置、値は最後の列）で、
+    「グループ」列がなければ末尾に追加する。index はキー → 行タプル内の位置で、「グループ」は -1
+    （値は Record.group に保持する）。
+    """
+    __slots__ = ("headers", "keys", "index", "group_index", "order_index", "other_indices")
+
+    def __init__(self, headers):
+        self.headers = tuple(headers)
+        index = {}
+        for i, header in enumerate(self.headers):
+            index[header] = i
+        try:
+            self.group_index = self.headers.index(GROUP_KEY)
+        except ValueError:
+            self.group_index = 0
+        # グループ変更用行の判定に使う、「グループ」列以外の値の位置
+        self.other_indices = tuple(index[header] for i, header in enumerate(self.headers) if i != self.group_index)
+        self.order_index = index.get(ORDER_KEY)
+        index[GROUP_KEY] = -1
+        self.keys = tuple(index)
+        self.index = index
+
+    def __reduce__(self):
+        return RowSchema, (self.headers,)
+
+class Record(Mapping):
+    """
+    抽出した 1 行を表す読み取り専用のマッピング。
+
+    値は XLSX から読んだ行タプルをそのまま保持し、キーはシートごとに共有する RowSchema から引く。
+    行ごとに辞書を作らないため、幅の広いシートでもメモリ使用量が小さい。
+    辞書が必要な箇所（JSON への書き出しなど）では to_dict() で変換する。
+    """
+    __slots__ = ("schema", "values_tuple", "group")
+
+    def __init__(self, schema: RowSchema, values_tuple: tuple, group):
+        self.schema = schema
+        self.values_tuple = values_tuple
+        self.group = group
+
+    def __getitem__(self, key):
+        i = self.schema.index[key]
+        if i < 0:
+            return self.group
+        return self.values_tuple[i]
+
+    def __contains__(self, key):
+        return key in self.schema.index
+
+    def __iter__(self):
+        return iter(self.schema.keys)
+
+    def __len__(self):
+        return len(self.schema.keys)
+
+    def __repr__(self):
+        return f"Record({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return Record, (self.schema, self.values_tuple, self.group)
+
+    def to_dict(self) -> dict:
+        values = self.values_tuple
+        group = self.group
+        return dict(zip(self.schema.keys, [group if i < 0 else values[i] for i in self.schema.index.values()]))
+
+    def copy(self) -> dict:
+        """dict.copy と同様に、変更可能な辞書として複製する"""
+        return self.to_dict()
+
+def intern_value(value):
+    """文字列であれば sys.intern したものを返す（同じ値の文字列を 1 つのオブジェクトで共有する）"""
+    if type(value) is str:
+        return sys.intern(value)
+    return value
+
+def json_default(obj):
+    """json.dump の default 引数用。Record を辞書に変換する。"""
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -1,6 +1,21 @@
+import gc
 import os
+from contextlib import contextmanager
 
 def ensure_folder_exists(folder_path: str):
-    """フォルダが存在しなければ作成する"""
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path)
\ No newline at end of file
+    """フォルダが存在しなければ作成する（複数のワーカーから同時に呼ばれてもよい）"""
+    os.makedirs(folder_path, exist_ok=True)
+
+@contextmanager
+def gc_paused():
+    """
+    大量の辞書・リストを生成する処理の間だけ循環参照 GC を止める。
+    生成中に世代別 GC が何度も全体を走査するのを避けるためで、終了時に元の状態へ戻す。
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
@@ -1,74 +1,202 @@
 import json
 import logging
-from openpyxl import load_workbook
+import re
+from config import XLSX_STREAMING
+from infrastructure.row_record import Record, RowSchema, intern_value, json_default
 
 logger = logging.getLogger(__name__)
 
-def extract_xlsx_to_json(file_path: str) -> dict:
+def _load_workbook(file_path: str, **kwargs):
+    """openpyxl.load_workbook を呼び出す。openpyxl は読み込みに時間がかかるため、最初の呼び出し時に import する。"""
+    from openpyxl import load_workbook as openpyxl_load_workbook
+    return openpyxl_load_workbook(file_path, **kwargs)
+
+def _iter_grouped_rows(rows):
     """
-    指定された XLSX ファイルの内容を JSON 形式の辞書として抜き出す関数。
-    
-    ・各シートの 1 行目をヘッダーとして使用し、2 行目以降をデータ行として扱う。
+    シートの行イテレータ（1 行目がヘッダー）から、(グループ名, Record) を 1 行ずつ返すジェネレータ。
+
     ・ヘッダーに「グループ」が存在すれば、その列の値をグループキーとして利用し、
       グループ列が空欄の場合は直前のグループ（current_group）の値を割り当てる。
     ・ただし、行のうち「グループ」以外のすべての値が null の場合は、
       グループ更新用の行とみなし、データとしては出力しない。
-    
-    結果は { シート名: { グループ名: [rowの辞書, ...], ... } } の形式となる。
+    ・各行はシートで共有する RowSchema を参照する Record として返し、行ごとの辞書は作らない。
+      グループ名と「指図書No」の文字列は intern して、同じ値の行で共有する。
+    """
+    rows = iter(rows)
+    header_row = next(rows, None)
+    if header_row is None:
+        return
+    schema = RowSchema(header_row)
+    width = len(schema.headers)
+    group_index = schema.group_index
+    order_index = schema.order_index
+    other_indices = schema.other_indices
+
+    current_group = None
+    for row in rows:
+        if all(cell is None for cell in row):
+            continue
+        # 読み取り専用モードでは末尾の空セルが省略されることがあるため、ヘッダー幅まで補う
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
+        elif type(row) is not tuple:
+            row = tuple(row)
+        group_value = row[group_index]
+        # 更新: グループ列に値があれば current_group を更新
+        if group_value is not None and str(group_value).strip() != "":
+            current_group = intern_value(group_value)
+            # 判定: 「グループ」以外の全列が None なら、これはグループ変更用行とみなし、出力対象から除外する
+            if all(row[i] is None for i in other_indices):
+                continue
+        if current_group is None:
+            current_group = "UNDEFINED"
+
+        if order_index is not None and type(row[order_index]) is str:
+            row = row[:order_index] + (intern_value(row[order_index]),) + row[order_index + 1:]
+
+        # 「グループ」フィールドは常に current_group となる
+        yield current_group, Record(schema, row, current_group)
+
+def iter_xlsx_rows(file_path: str):
+    """
+    指定された XLSX ファイルを読み取り専用モードで開き、
+    (シート名, グループ名, Record) を 1 行ずつ返すジェネレータ。
+
+    シート全体をメモリに展開しないため、大きなブックでもメモリ使用量が行数に比例しない。
+    グループの引き継ぎ・グループ変更用行の扱いは extract_xlsx_records と同じ。
     """
+    workbook = _load_workbook(file_path, read_only=True, data_only=True)
     try:
-        workbook = load_workbook(file_path, data_only=True)
-        result = {}
         for sheet_name in workbook.sheetnames:
             ws = workbook[sheet_name]
-            rows = list(ws.iter_rows(values_only=True))
-            if not rows:
-                result[sheet_name] = {}
-                continue
-            headers = list(rows[0])
-            try:
-                group_index = headers.index("グループ")
-            except ValueError:
-                group_index = 0
-
-            data_by_group = {}
-            current_group = None
-
-            for row in rows[1:]:
-                if all(cell is None for cell in row):
-                    continue
-                row_dict = {header: value for header, value in zip(headers, row)}
-                group_value = row[group_index]
-                # 更新: グループ列に値があれば current_group を更新
-                if group_value is not None and str(group_value).strip() != "":
-                    current_group = group_value
-                if current_group is None:
-                    current_group = "UNDEFINED"
-                
-                # 判定: 「グループ」以外の全列が None なら、これはグループ変更用行とみなす
-                is_group_header = False
-                if group_value is not None and str(group_value).strip() != "":
-                    # グループ列以外の値を取得
-                    other_values = [row_dict[header] for i, header in enumerate(headers) if i != group_index]
-                    if all(val is None for val in other_values):
-                        is_group_header = True
-                
-                # 常に「グループ」フィールドは current_group に設定
-                row_dict["グループ"] = current_group
-                
-                # グループ変更用行の場合は、出力対象から除外する
-                if is_group_header:
-                    continue
-
-                if current_group not in data_by_group:
-                    data_by_group[current_group] = []
-                data_by_group[current_group].append(row_dict)
-            result[sheet_name] = data_by_group
-        return result
+            for group, record in _iter_grouped_rows(ws.iter_rows(values_only=True)):
+                yield sheet_name, group, record
+    finally:
+        workbook.close()
+
+def _collect_groups(rows) -> dict:
+    data_by_group = {}
+    for group, record in _iter_grouped_rows(rows):
+        if group not in data_by_group:
+            data_by_group[group] = []
+        data_by_group[group].append(record)
+    return data_by_group
+
+def _extract_streaming(file_path: str, sheet_names: list = None) -> dict:
+    workbook = _load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        return {
+            sheet_name: _collect_groups(workbook[sheet_name].iter_rows(values_only=True))
+            for sheet_name in (workbook.sheetnames if sheet_names is None else sheet_names)
+        }
+    finally:
+        workbook.close()
+
+def _extract_full(file_path: str, sheet_names: list = None) -> dict:
+    workbook = _load_workbook(file_path, data_only=True)
+    return {
+        sheet_name: _collect_groups(workbook[sheet_name].iter_rows(values_only=True))
+        for sheet_name in (workbook.sheetnames if sheet_names is None else sheet_names)
+    }
+
+# シート XML の先頭にある dimension 要素（シートの範囲）と、データ部 sheetData の開始タグ
+_DIMENSION_OR_DATA = re.compile(rb"<(?:[A-Za-z_][\w.-]*:)?(dimension|sheetData)\b")
+
+def _iter_sheet_parts(zf):
+    """ブック (zipfile.ZipFile) 内の (シート名, シート XML のパス) をシートの並び順に返す"""
+    import posixpath
+    from xml.etree import ElementTree
+
+    main_ns = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+    rel_ns = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+    rel_id = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+    names = set(zf.namelist())
+
+    def read_rels(path):
+        if path not in names:
+            return []
+        return list(ElementTree.fromstring(zf.read(path)).iter(f"{rel_ns}Relationship"))
+
+    def resolve(base_dir, target):
+        return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(base_dir, target))
+
+    workbook_path = "xl/workbook.xml"
+    for rel in read_rels("_rels/.rels"):
+        if rel.get("Type", "").endswith("/officeDocument"):
+            workbook_path = resolve("", rel.get("Target"))
+    base_dir, name = posixpath.split(workbook_path)
+    targets = {
+        rel.get("Id"): resolve(base_dir, rel.get("Target"))
+        for rel in read_rels(posixpath.join(base_dir, "_rels", name + ".rels"))
+    }
+    for sheet in ElementTree.fromstring(zf.read(workbook_path)).iter(f"{main_ns}sheet"):
+        yield sheet.get("name"), targets.get(sheet.get(rel_id))
+
+def _has_dimension(zf, path: str, probe_bytes: int) -> bool:
+    """シート XML が、データ部より前に dimension 要素（シートの範囲）を持っていれば True を返す"""
+    if path is None:
+        return False
+    with zf.open(path) as f:
+        match = _DIMENSION_OR_DATA.search(f.read(probe_bytes))
+    return match is not None and match.group(1) == b"dimension"
+
+def inspect_sheets(file_path: str, probe_bytes: int = 64 * 1024) -> tuple:
+    """
+    ブックを 1 回だけ開き、(シートのサイズのリスト, すべてのシートが dimension 要素を持つかどうか) を返す。
+
+    シートのサイズのリストは (シート名, シート XML の展開後のサイズ [バイト]) をシートの並び順に並べたもの。
+    openpyxl を使わずに zip の目録と workbook.xml、各シート XML の先頭 probe_bytes だけを読むため、
+    大きなブックでもすぐに求められる。サイズはシートの行数のおおよその目安で、シート単位で並列に抽出する際の
+    負荷の見積もりに使う。
+    読み取り専用モードの openpyxl はブックを開く際に全シートの範囲を求め、dimension 要素がないシートは
+    XML を最後まで読む。そのようなブックはシートを分けて開くたびに全シートを読み直すことになるため、
+    シート単位の並列抽出の対象にするかどうかの判定に使う（Excel で保存したブックは dimension 要素を持つ）。
+    """
+    import zipfile
+
+    with zipfile.ZipFile(file_path) as zf:
+        sizes = {info.filename: info.file_size for info in zf.infolist()}
+        parts = list(_iter_sheet_parts(zf))
+        has_dimensions = all(_has_dimension(zf, path, probe_bytes) for _, path in parts)
+        return [(name, sizes.get(path, 0)) for name, path in parts], has_dimensions
+
+def extract_xlsx_records(file_path: str, streaming: bool = None, sheet_names: list = None) -> dict:
+    """
+    指定された XLSX ファイルの内容を { シート名: { グループ名: [Record, ...], ... } } の形式で抜き出す関数。
+
+    ・各シートの 1 行目をヘッダーとして使用し、2 行目以降をデータ行として扱う。
+    ・ヘッダーに「グループ」が存在すれば、その列の値をグループキーとして利用し、
+      グループ列が空欄の場合は直前のグループ（current_group）の値を割り当てる。
+    ・ただし、行のうち「グループ」以外のすべての値が null の場合は、
+      グループ更新用の行とみなし、データとしては出力しない。
+    ・streaming が True の場合は読み取り専用モードで 1 行ずつ読み込む（未指定時は config.XLSX_STREAMING）。
+    ・sheet_names を指定した場合は、そのシートだけを指定した順に抜き出す（シート単位の並列抽出用）。
+
+    各行は読み取り専用のマッピング Record で、行ごとの辞書は作らない（抽出パイプラインの内部で使う）。
+    JSON への書き出しは json_default で、それ以外で辞書が必要な場合は Record.to_dict() で変換する。
+    """
+    if streaming is None:
+        streaming = XLSX_STREAMING
+    try:
+        if streaming:
+            return _extract_streaming(file_path, sheet_names)
+        return _extract_full(file_path, sheet_names)
     except Exception as e:
         logger.error("XLSX ファイルの読み込みエラー: %s", e)
         raise e
 
+def extract_xlsx_to_json(file_path: str, streaming: bool = None, sheet_names: list = None) -> dict:
+    """
+    指定された XLSX ファイルの内容を JSON 形式の辞書として抜き出す関数。
+    結果は { シート名: { グループ名: [row, ...], ... } } の形式で、各 row は変更可能な辞書となる。
+    抽出規則と引数は extract_xlsx_records と同じ。
+    """
+    data = extract_xlsx_records(file_path, streaming, sheet_names)
+    return {
+        sheet_name: {group: [row.to_dict() for row in rows] for group, rows in groups.items()}
+        for sheet_name, groups in data.items()
+    }
+
 def extract_xlsx_to_json_str(file_path: str) -> str:
-    data = extract_xlsx_to_json(file_path)
-    return json.dumps(data, ensure_ascii=False, indent=4)
+    data = extract_xlsx_records(file_path)
+    return json.dumps(data, ensure_ascii=False, indent=4, default=json_default)
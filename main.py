@@ -1,6 +1,8 @@
 import tkinter as tk
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 from presentation.ui import ResultMergeUI
 from config import PROJECT_ROOT, ERR_FOLDER, KEYWORDS
@@ -10,20 +12,36 @@ def tk_exception_handler(exc, val, tb):
     print("Tkinter 内部で例外が発生しました。詳細は Err フォルダ内のログをご確認ください。", file=sys.stderr)
 
 def setup_logging():
+    """
+    ログはキューに積むだけの QueueHandler で受け取り、コンソール・ファイルへの書き込みは
+    QueueListener の別スレッドで行う（UI スレッドやワーカーのスレッドがファイル I/O で待たされない）。
+    ワーカープロセスのログは process_pool.logging_process_pool が親プロセスへ転送し、ここで設定した出力先に書かれる。
+    戻り値の QueueListener は終了時に stop() してキューに残ったログを書き出すこと。
+    """
     if not os.path.exists(ERR_FOLDER):
         os.makedirs(ERR_FOLDER)
     log_file = ERR_FOLDER + "/error.log"
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler(log_file, encoding="utf-8")
-        ]
-    )
+    formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    handlers = [
+        logging.StreamHandler(),
+        # ファイルは最初のログ出力時に開く
+        logging.FileHandler(log_file, encoding="utf-8", delay=True)
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # QueueHandler はキューに積む前にメッセージを整形するため、書式はリスナー側のハンドラーにだけ設定する
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG)
+    root.addHandler(queue_handler)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
 
 def main():
-    setup_logging()
+    listener = setup_logging()
     try:
         root = tk.Tk()
         root.title("実績合算・分析アプリ")
@@ -32,6 +50,8 @@ def main():
         root.mainloop()
     except Exception as e:
         logging.exception("Tkinter アプリケーション起動時にエラーが発生しました: %s", e)
+    finally:
+        listener.stop()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,137 @@
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class JobCancelled(Exception):
+    """ジョブがユーザー操作により中止されたことを表す例外"""
+
+class JobContext:
+    """
+    バックグラウンドで実行される処理に渡されるコンテキスト。
+    進捗の通知と中止要求の確認に使用する（ワーカースレッドから呼び出してよい）。
+    """
+    def __init__(self, message_queue: queue.Queue, cancel_event: threading.Event):
+        self._queue = message_queue
+        self.cancel_event = cancel_event
+        self.started_at = time.perf_counter()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """中止要求があれば JobCancelled を送出する"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def report(self, done: int, total: int, message: str = None):
+        """進捗 (done/total) をメインスレッドへ通知する"""
+        self._queue.put(("progress", (done, total, message)))
+
+    def emit(self, payload):
+        """途中結果 (例: 見つかったファイルのバッチ) をメインスレッドへ送る"""
+        self._queue.put(("item", payload))
+
+class BackgroundJobRunner:
+    """
+    時間のかかる処理をワーカースレッドで実行し、進捗・結果をキュー経由で
+    Tk のメインスレッドへ受け渡すスケジューラ。
+    キューは root.after で定期的にポーリングするため、コールバックは常にメインスレッドで呼ばれる。
+    同時に実行できるジョブは 1 つだけで、実行中の submit は拒否される（二重実行防止）。
+    """
+    def __init__(self, root, on_progress=None, on_busy_changed=None, poll_interval_ms: int = 100):
+        self.root = root
+        self.on_progress = on_progress          # (done, total, message, elapsed) -> None
+        self.on_busy_changed = on_busy_changed  # (busy) -> None
+        self.poll_interval_ms = poll_interval_ms
+        self._queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+        self._context = None
+        self._callbacks = None
+
+    @property
+    def busy(self) -> bool:
+        return self._thread is not None
+
+    def submit(self, work, on_done=None, on_error=None, on_cancelled=None, on_item=None) -> bool:
+        """
+        work(context) をワーカースレッドで実行する。
+        context.emit で送られた途中結果は on_item で受け取る。
+        実行中のジョブがある場合は何もせず False を返す。
+        """
+        if self.busy:
+            logger.info("ジョブ実行中のため、新しいジョブは受け付けません")
+            return False
+        self._queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._context = JobContext(self._queue, self._cancel_event)
+        self._callbacks = (on_done, on_error, on_cancelled, on_item)
+        self._thread = threading.Thread(target=self._run, args=(work, self._context, self._queue), daemon=True)
+        self._set_busy(True)
+        self._thread.start()
+        self.root.after(self.poll_interval_ms, self._poll)
+        return True
+
+    def cancel(self):
+        """実行中のジョブに中止を要求する（処理側が JobContext で確認した時点で止まる）"""
+        if self.busy:
+            self._cancel_event.set()
+
+    def _run(self, work, context, message_queue):
+        try:
+            result = work(context)
+            if context.cancelled:
+                message_queue.put(("cancelled", None))
+            else:
+                message_queue.put(("done", result))
+        except JobCancelled:
+            message_queue.put(("cancelled", None))
+        except Exception as e:
+            if context.cancelled:
+                # 中止要求に伴って処理側が送出した例外は中止として扱う
+                message_queue.put(("cancelled", None))
+                return
+            logger.exception("バックグラウンド処理中にエラー: %s", e)
+            message_queue.put(("error", e))
+
+    def _poll(self):
+        finished = None
+        try:
+            while True:
+                kind, payload = self._queue.get_nowait()
+                if kind == "progress":
+                    if self.on_progress:
+                        done, total, message = payload
+                        self.on_progress(done, total, message, time.perf_counter() - self._context.started_at)
+                elif kind == "item":
+                    on_item = self._callbacks[3]
+                    if on_item:
+                        on_item(payload)
+                else:
+                    finished = (kind, payload)
+                    break
+        except queue.Empty:
+            pass
+        if finished is None:
+            self.root.after(self.poll_interval_ms, self._poll)
+            return
+
+        on_done, on_error, on_cancelled, _ = self._callbacks
+        self._thread = None
+        self._callbacks = None
+        self._set_busy(False)
+        kind, payload = finished
+        if kind == "done" and on_done:
+            on_done(payload)
+        elif kind == "error" and on_error:
+            on_error(payload)
+        elif kind == "cancelled" and on_cancelled:
+            on_cancelled()
+
+    def _set_busy(self, busy: bool):
+        if self.on_busy_changed:
+            self.on_busy_changed(busy)
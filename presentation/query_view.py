@@ -0,0 +1,180 @@
+import logging
+import time
+import tkinter as tk
+from tkinter import messagebox, ttk
+
+logger = logging.getLogger(__name__)
+
+# 表示の種類 → (ラベル, 列)
+VIEWS = {
+    "orders": ("指図書No 別合計", ["指図書No", "単位", "時間", "行数"]),
+    "groups": ("グループ別合計", ["単位", "グループ", "時間", "行数"]),
+    "files": ("寄与ファイル", ["ファイル", "行数"]),
+    "rows": ("明細", ["単位", "グループ", "指図書No", "補足", "時間", "merged_files"]),
+}
+
+class QueryView(tk.Toplevel):
+    """
+    合算結果の検索用インデックス (infrastructure.query_index) を検索するウィンドウ。
+    単位・グループ・指図書No・ファイルで絞り込み、指図書No 別合計 / グループ別合計 / 寄与ファイル / 明細 を表示する。
+    行をダブルクリックすると、その指図書No・グループ・ファイルで絞り込んだ明細（グループの場合は寄与ファイル）を表示する。
+    インデックスの検索は数ミリ秒で終わるため、バックグラウンドジョブにせずメインスレッドで実行する。
+    """
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("集計検索")
+        self.geometry("800x500")
+        self.view_var = tk.StringVar(value="orders")
+        self.unit_var = tk.StringVar()
+        self.group_var = tk.StringVar()
+        self.order_var = tk.StringVar()
+        self.file_var = tk.StringVar()
+        self.by_unit_var = tk.BooleanVar(value=False)
+        self._records = {}  # Treeview の行 ID → 検索結果 (表示用の文字列ではなく元の値)
+        self.create_widgets()
+        self.load_units()
+        self.run_query()
+
+    def create_widgets(self):
+        # --- 上部：絞り込み条件 ---
+        filter_frame = tk.Frame(self)
+        filter_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(10, 0))
+        tk.Label(filter_frame, text="単位:").pack(side=tk.LEFT)
+        self.unit_box = ttk.Combobox(filter_frame, textvariable=self.unit_var, width=10, state="readonly")
+        self.unit_box.pack(side=tk.LEFT, padx=(0, 10))
+        for label, var in (("グループ:", self.group_var), ("指図書No:", self.order_var), ("ファイル:", self.file_var)):
+            tk.Label(filter_frame, text=label).pack(side=tk.LEFT)
+            entry = tk.Entry(filter_frame, textvariable=var, width=14)
+            entry.pack(side=tk.LEFT, padx=(0, 10))
+            entry.bind("<Return>", lambda e: self.run_query())
+        tk.Button(filter_frame, text="検索", command=self.run_query).pack(side=tk.LEFT)
+        tk.Button(filter_frame, text="クリア", command=self.clear_filters).pack(side=tk.LEFT, padx=5)
+
+        view_frame = tk.Frame(self)
+        view_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=5)
+        for name, (label, _) in VIEWS.items():
+            tk.Radiobutton(view_frame, text=label, value=name, variable=self.view_var,
+                           command=self.run_query).pack(side=tk.LEFT)
+        tk.Checkbutton(view_frame, text="単位ごと", variable=self.by_unit_var,
+                       command=self.run_query).pack(side=tk.LEFT, padx=10)
+
+        # --- 中央：結果 ---
+        table_frame = tk.Frame(self)
+        table_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10)
+        self.table = ttk.Treeview(table_frame, show="headings")
+        scrollbar = tk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.table.yview)
+        self.table.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.table.bind("<Double-Button-1>", self.drill_down)
+
+        # --- 下部：件数・所要時間 ---
+        self.status_label = tk.Label(self, text="", anchor="w", relief=tk.SUNKEN)
+        self.status_label.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(5, 10))
+
+    def _open_index(self):
+        from infrastructure.query_index import QueryIndex
+        return QueryIndex()
+
+    def load_units(self):
+        try:
+            with self._open_index() as index:
+                info = index.info()
+        except FileNotFoundError as e:
+            self.status_label.config(text=str(e))
+            return
+        except Exception as e:
+            logger.error("検索用インデックスの読み込みエラー: %s", e)
+            self.status_label.config(text=f"検索用インデックスを読み込めません: {e}")
+            return
+        self.unit_box.config(values=[""] + info["units"])
+        self.title(f"集計検索 ({info['built_at']} 更新・{info['rows']:,} 行)")
+        if info["stale"]:
+            # 直近の合算でインデックスを更新できなかった場合は、古い内容であることを知らせる
+            self.title(f"集計検索 ({info['built_at']} 更新・{info['rows']:,} 行・最新の合算結果ではありません)")
+            messagebox.showwarning(
+                "警告", f"直近の合算結果で検索用インデックスを更新できませんでした。{info['built_at']} 時点の内容を表示します。"
+                        f"\n合算処理をやり直してください。\n{info['stale']}", parent=self)
+
+    def clear_filters(self):
+        for var in (self.unit_var, self.group_var, self.order_var, self.file_var):
+            var.set("")
+        self.run_query()
+
+    @staticmethod
+    def _value(var: tk.StringVar):
+        """入力欄の値。空欄は絞り込まない (None)"""
+        value = var.get().strip()
+        return value or None
+
+    def run_query(self):
+        from infrastructure.query_index import DEFAULT_LIMIT
+
+        view = self.view_var.get()
+        unit, group = self._value(self.unit_var), self._value(self.group_var)
+        order_no, filename = self._value(self.order_var), self._value(self.file_var)
+        start = time.perf_counter()
+        try:
+            with self._open_index() as index:
+                if view == "orders":
+                    records = index.order_totals(order_no, unit, by_unit=self.by_unit_var.get() or unit is not None,
+                                                 group=group, filename=filename)
+                elif view == "groups":
+                    records = index.group_totals(group, unit, order_no, filename)
+                elif view == "files":
+                    records = index.contributing_files(group, order_no, unit, filename)
+                else:
+                    records = index.rows(unit, group, order_no, filename)
+        except FileNotFoundError as e:
+            self.show_records(view, [])
+            self.status_label.config(text=str(e))
+            return
+        except Exception as e:
+            logger.error("集計検索中にエラー: %s", e)
+            messagebox.showerror("エラー", f"集計検索中にエラーが発生しました:\n{e}", parent=self)
+            return
+        elapsed = time.perf_counter() - start
+        self.show_records(view, records)
+        text = f"{len(records):,} 件 ({elapsed * 1000:.1f} ミリ秒)"
+        if view == "rows" and len(records) >= DEFAULT_LIMIT:
+            text += f" ※先頭の {DEFAULT_LIMIT:,} 件のみ表示しています。条件を絞り込んでください"
+        self.status_label.config(text=text)
+
+    def show_records(self, view: str, records: list):
+        columns = VIEWS[view][1]
+        self.table.delete(*self.table.get_children())
+        self._records = {}
+        self.table.config(columns=columns)
+        for column in columns:
+            self.table.heading(column, text=column)
+            self.table.column(column, width=200 if column in ("ファイル", "merged_files") else 100,
+                              anchor="e" if column in ("時間", "行数") else "w")
+        for record in records:
+            values = []
+            for column in columns:
+                value = record.get(column)
+                if isinstance(value, list):
+                    value = ", ".join(map(str, value))
+                elif isinstance(value, float):
+                    value = f"{value:g}"
+                values.append("" if value is None else value)
+            self._records[self.table.insert("", tk.END, values=values)] = record
+
+    def drill_down(self, event):
+        record = self._records.get(self.table.identify_row(event.y))
+        if record is None:
+            return
+        view = self.view_var.get()
+        if view == "orders":
+            self.order_var.set(record["指図書No"] or "")
+            self.view_var.set("rows")
+        elif view == "groups":
+            self.unit_var.set(record["単位"])
+            self.group_var.set(record["グループ"])
+            self.view_var.set("files")
+        elif view == "files":
+            self.file_var.set(record["ファイル"])
+            self.view_var.set("rows")
+        else:
+            return
+        self.run_query()
@@ -1,19 +1,19 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 import logging
 import os
 import shutil
-from use_cases.file_search_usecase import get_matched_files
-from config import TMP_FOLDER, KEYWORDS, OUT_FOLDER
-from infrastructure.file_copier import copy_xlsx_file
-from infrastructure.json_writer import write_json_output
-from infrastructure.xlsx_extractor import extract_xlsx_to_json
-from infrastructure.json_merger import merge_json_files_by_unit
-from infrastructure.clear_folder import clear_folder_contents
-from infrastructure.json_to_csv import convert_json_file_to_csv  # 追加
+from config import TMP_FOLDER, KEYWORDS, OUT_FOLDER, DIRECT_MERGE, INCREMENTAL_MERGE
+from presentation.job_runner import BackgroundJobRunner
+from presentation.virtual_list import VirtualListView
+# 処理系のモジュール (use_cases / infrastructure、openpyxl など) は、ウィンドウ表示を速くするため
+# 各処理を最初に実行するときに読み込む（バックグラウンドジョブ内で import する）
 
 logger = logging.getLogger(__name__)
 
+# ファイル一覧へまとめて追加する件数
+FILE_LIST_BATCH_SIZE = 200
+
 class ResultMergeUI(tk.Frame):
     def __init__(self, root, keywords):
         super().__init__(root, width=600, height=400, borderwidth=1, relief='groove')
@@ -23,6 +23,9 @@ class ResultMergeUI(tk.Frame):
         self.pack(fill=tk.BOTH, expand=True)
         self.pack_propagate(0)
         self.create_widgets()
+        self.job_runner = BackgroundJobRunner(
+            root, on_progress=self.update_progress, on_busy_changed=self.set_busy
+        )
     
     def create_widgets(self):
         # --- 上部：ボタン群 ---
@@ -34,29 +37,68 @@ class ResultMergeUI(tk.Frame):
         self.info_button.pack(side=tk.LEFT, padx=5)
         self.merge_button = tk.Button(button_frame, text="合算処理", command=self.merge_json_files)
         self.merge_button.pack(side=tk.LEFT, padx=5)
+        self.reset_button = tk.Button(button_frame, text="合算リセット", command=self.reset_merge_state)
+        if DIRECT_MERGE and INCREMENTAL_MERGE:
+            self.reset_button.pack(side=tk.LEFT, padx=5)
         self.close_button = tk.Button(button_frame, text="閉じる", command=self.root.destroy)
         self.close_button.pack(side=tk.RIGHT, padx=5)
         self.csv_button = tk.Button(button_frame, text="CSV変換", command=self.convert_json_to_csv)
         self.csv_button.pack(side=tk.RIGHT, padx=5)  # 新規ボタン「CSV変換」
+        self.query_button = tk.Button(button_frame, text="集計検索", command=self.open_query_view)
+        self.query_button.pack(side=tk.RIGHT, padx=5)
+        self.cancel_button = tk.Button(button_frame, text="中止", command=self.cancel_job, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.RIGHT, padx=5)
         
         
         # --- 中央：ステータスバー ---
         self.status_label = tk.Label(self, text="次の作業: フォルダを選択してください", anchor='w', relief=tk.SUNKEN)
         self.status_label.pack(side=tk.TOP, fill=tk.X, padx=10)
+
+        # --- 進捗バー (処理済み件数/全件数・スループット) ---
+        progress_frame = tk.Frame(self)
+        progress_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(5, 0))
+        self.progress_bar = ttk.Progressbar(progress_frame, orient=tk.HORIZONTAL, mode='determinate')
+        self.progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.progress_label = tk.Label(progress_frame, text="", width=28, anchor='e')
+        self.progress_label.pack(side=tk.RIGHT)
         
         # --- 下部：ファイル一覧 (スクロールバー付き) ---
         list_frame = tk.Frame(self)
         list_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10, pady=10)
         tk.Label(list_frame, text="ファイル一覧").pack(anchor='w')
-        listbox_frame = tk.Frame(list_frame, height=300)
-        listbox_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-        scrollbar = tk.Scrollbar(listbox_frame, orient=tk.VERTICAL)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.file_listbox = tk.Listbox(listbox_frame, selectmode=tk.EXTENDED, yscrollcommand=scrollbar.set)
-        self.file_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.config(command=self.file_listbox.yview)
+        # 大量のファイルでも軽快に動くよう、見えている行だけを描画する仮想リストを使う
+        self.file_list = VirtualListView(list_frame, height=300)
+        self.file_list.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
     
+    def set_busy(self, busy: bool):
+        """ジョブ実行中は処理ボタンを無効化し、二重実行を防ぐ"""
+        state = tk.DISABLED if busy else tk.NORMAL
+        # 合算中は検索用インデックスを更新しているため、集計検索も開けないようにする
+        for button in (self.select_folder_button, self.info_button, self.merge_button, self.reset_button, self.csv_button,
+                       self.query_button):
+            button.config(state=state)
+        self.cancel_button.config(state=tk.NORMAL if busy else tk.DISABLED)
+        if busy:
+            self.progress_bar.config(value=0, maximum=1)
+            self.progress_label.config(text="")
+
+    def update_progress(self, done, total, message, elapsed):
+        self.progress_bar.config(maximum=max(total, 1), value=done)
+        throughput = done / elapsed if elapsed > 0 else 0.0
+        self.progress_label.config(text=f"{done}/{total} 件 ({throughput:.1f} 件/秒)")
+        if message:
+            self.status_label.config(text=message)
+
+    def cancel_job(self):
+        self.job_runner.cancel()
+        self.status_label.config(text="中止しています...")
+
+    def on_job_cancelled(self):
+        self.status_label.config(text="処理を中止しました")
+
     def select_folder(self):
+        from infrastructure.clear_folder import clear_folder_contents
+
         # TMP_FOLDER の中身のみ削除
         if os.path.exists(TMP_FOLDER):
             try:
@@ -68,90 +110,220 @@ class ResultMergeUI(tk.Frame):
         if folder_path:
             self.base_folder = folder_path
             self.populate_file_list(folder_path)
-            self.status_label.config(text="次の作業: XLSXファイルを選択し、情報取得ボタンをクリックしてください")
-    
+
     def populate_file_list(self, folder_path):
-        self.file_listbox.delete(0, tk.END)
-        try:
-            matched_files = get_matched_files(folder_path, self.keywords)
-            if matched_files:
-                for file in matched_files:
-                    self.file_listbox.insert(tk.END, file)
-            else:
-                self.file_listbox.insert(tk.END, "一致するファイルがありません")
-        except Exception as e:
-            self.file_listbox.delete(0, tk.END)
-            self.file_listbox.insert(tk.END, f"エラー: {e}")
+        self.file_list.clear(placeholder="")
+        self.status_label.config(text="ファイルを検索しています...")
+
+        def work(context):
+            from infrastructure.instrumentation import RunMetrics
+            from use_cases.file_search_usecase import iter_matched_files
+
+            # 見つかった順にまとめてメインスレッドへ送り、探索完了を待たずに一覧を埋めていく
+            metrics = RunMetrics("discovery").start()
+            count = 0
+            batch = []
+            with metrics.stage("discovery"):
+                for file in iter_matched_files(folder_path, self.keywords, cancel_event=context.cancel_event):
+                    context.check_cancelled()
+                    batch.append(file)
+                    if len(batch) >= FILE_LIST_BATCH_SIZE:
+                        count += len(batch)
+                        context.emit(batch)
+                        context.report(count, count, f"ファイルを検索しています... ({count} 件)")
+                        batch = []
+                if batch:
+                    count += len(batch)
+                    context.emit(batch)
+            metrics.count("discovered", count)
+            metrics.close()
+            return count, metrics
+
+        def on_item(batch):
+            self.file_list.extend(batch)
+
+        def on_done(result):
+            count, metrics = result
+            if not count:
+                self.file_list.set_placeholder("一致するファイルがありません")
+            self.status_label.config(
+                text=f"次の作業: XLSXファイルを選択し、情報取得ボタンをクリックしてください ({count} 件 / {metrics.elapsed:.2f} 秒)"
+            )
+
+        def on_error(e):
+            self.file_list.clear(placeholder=f"エラー: {e}")
             logger.error("ファイルリスト取得中にエラー: %s", e)
-    
+
+        self.job_runner.submit(work, on_done, on_error, self.on_job_cancelled, on_item)
+
     def show_selected_info(self):
-        try:
+        selected_files = self.file_list.selected_items()
+        if not selected_files:
+            messagebox.showinfo("情報", "ファイルが選択されていません。")
+            return
+        base_folder = self.base_folder
+        self.status_label.config(text="XLSX ファイルを処理しています...")
+
+        def work(context):
+            from infrastructure.clear_folder import clear_folder_contents
+            from infrastructure.instrumentation import RunMetrics
+            from infrastructure.json_merger import merge_json_files_by_unit
+            from use_cases.extraction_pipeline import run_direct_merge_pipeline, run_extraction_pipeline
+
+            metrics = RunMetrics("extract").start()
             # Outフォルダの内容を削除（Outフォルダ自体は残す）
             clear_folder_contents(OUT_FOLDER)
-            
-            selected_indices = self.file_listbox.curselection()
-            files = self.file_listbox.get(0, tk.END)
-            if not selected_indices:
-                messagebox.showinfo("情報", "ファイルが選択されていません。")
-                return
-            json_file_paths = []
-            for idx in selected_indices:
-                file = files[idx]
-                if file.lower().endswith(".xlsx"):
-                    in_file_path = os.path.join(self.base_folder, file)
-                    tmp_file_path = copy_xlsx_file(in_file_path, self.base_folder)
-                    base_name, _ = os.path.splitext(os.path.basename(tmp_file_path))
-                    out_filename = f"{base_name}.json"
-                    data = extract_xlsx_to_json(tmp_file_path)
-                    json_filepath = write_json_output(data, out_filename)
-                    json_file_paths.append(f"{file} => {json_filepath}")
-            if json_file_paths:
-                msg = "以下の XLSX ファイルから JSON 出力が作成されました:\n" + "\n".join(json_file_paths)
+            if DIRECT_MERGE:
+                # 抽出結果を TMP JSON を経由せずにそのまま合算する
+                pipeline_result, output_path = run_direct_merge_pipeline(
+                    selected_files, base_folder, self.keywords,
+                    progress_callback=context.report, cancel_event=context.cancel_event, metrics=metrics,
+                )
+                return pipeline_result, output_path, metrics.close()
+            pipeline_result = run_extraction_pipeline(
+                selected_files, base_folder,
+                progress_callback=context.report, cancel_event=context.cancel_event, metrics=metrics,
+            )
+            context.check_cancelled()
+            # 自動的に合算処理も実行
+            with metrics.stage("merge"):
+                output_path = merge_json_files_by_unit(self.keywords)
+            return pipeline_result, output_path, metrics.close()
+
+        def on_done(result):
+            pipeline_result, output_path, metrics = result
+            json_file_paths = [f"{r.file} => {r.json_path}" if r.json_path else r.file for r in pipeline_result.succeeded]
+            failed_files = [f"{r.file}: {r.error}" for r in pipeline_result.failed]
+            if pipeline_result.results:
+                heading = "以下の XLSX ファイルを抽出し、合算しました:" if DIRECT_MERGE else "以下の XLSX ファイルから JSON 出力が作成されました:"
+                msg = heading + "\n" + "\n".join(json_file_paths)
+                if failed_files:
+                    msg += "\n\n以下のファイルは処理に失敗しました:\n" + "\n".join(failed_files)
+                if pipeline_result.unchanged:
+                    msg += f"\n\n前回から変更のないファイル: {len(pipeline_result.unchanged)} 件 (抽出を省略)"
+                if pipeline_result.cache_stats:
+                    stats = pipeline_result.cache_stats
+                    msg += f"\n\nキャッシュ: ヒット {stats['hits']} 件 / ミス {stats['misses']} 件"
+                msg += "\n\n" + metrics.summary_text()
             else:
                 msg = "選択されたファイルの中に XLSX ファイルはありませんでした。"
             messagebox.showinfo("出力完了", msg)
-            # 自動的に合算処理も実行
-            self.merge_json_files()
-            self.status_label.config(text="次の作業: 合算処理完了。再度ファイルを選択するか、終了してください")
-        except Exception as e:
+            self.show_merge_result(output_path)
+
+        def on_error(e):
             logger.error("XLSX抽出処理中にエラー: %s", e)
             messagebox.showerror("エラー", f"XLSX抽出処理中にエラーが発生しました:\n{e}")
-    
+
+        self.job_runner.submit(work, on_done, on_error, self.on_job_cancelled)
+
     def merge_json_files(self):
-        try:
-            # Outフォルダの内容を削除（Outフォルダ自体は残す）
-            clear_folder_contents(OUT_FOLDER)
-            
-            output_path = merge_json_files_by_unit(self.keywords)
-            if output_path:
-                msg = f"合算結果の JSON が作成されました:\n{output_path}"
-            else:
-                msg = "合算対象となる JSON ファイルが見つかりませんでした。"
-            messagebox.showinfo("合算完了", msg)
-            self.status_label.config(text="次の作業: 合算処理完了。再度ファイルを選択するか、終了してください")
-        except Exception as e:
+        self.status_label.config(text="合算処理を実行しています...")
+
+        def work(context):
+            from infrastructure.clear_folder import clear_folder_contents
+            from infrastructure.instrumentation import RunMetrics
+            from infrastructure.json_merger import find_unit_outputs, has_intermediate_files, merge_json_files_by_unit
+            from use_cases.extraction_pipeline import has_incremental_state, write_incremental_outputs
+
+            metrics = RunMetrics("merge").start()
+            existing = False
+            with metrics.stage("merge"):
+                # Outフォルダの内容は、新しい合算結果を書き出す場合だけ削除する（Outフォルダ自体は残す）
+                if DIRECT_MERGE and INCREMENTAL_MERGE and has_incremental_state():
+                    # 保存済みの合算状態から書き出すだけで、再集計は行わない
+                    clear_folder_contents(OUT_FOLDER)
+                    output_path = write_incremental_outputs()
+                elif has_intermediate_files(self.keywords):
+                    clear_folder_contents(OUT_FOLDER)
+                    output_path = merge_json_files_by_unit(self.keywords)
+                else:
+                    # 直接合算モードでは情報取得の時点で合算済みで、TMP に中間ファイルは残らない。
+                    # 出力を削除せず、既存の合算結果をそのまま表示する
+                    output_path = find_unit_outputs(self.keywords)
+                    existing = True
+            metrics.count("units", len(output_path))
+            return output_path, existing, metrics.close()
+
+        def on_done(result):
+            output_path, existing, metrics = result
+            self.show_merge_result(output_path, metrics, existing)
+
+        def on_error(e):
             logger.error("合算処理中にエラー: %s", e)
             messagebox.showerror("エラー", f"合算処理中にエラーが発生しました:\n{e}")
-    
+
+        self.job_runner.submit(work, on_done, on_error, self.on_job_cancelled)
+
+    def reset_merge_state(self):
+        if not messagebox.askyesno("確認", "保存されている合算状態をすべて削除しますか？"):
+            return
+        try:
+            from use_cases.extraction_pipeline import reset_incremental_state
+            reset_incremental_state()
+            self.status_label.config(text="合算状態を削除しました。次の作業: ファイルを選択し、情報取得ボタンをクリックしてください")
+        except Exception as e:
+            logger.error("合算状態の削除中にエラー: %s", e)
+            messagebox.showerror("エラー", f"合算状態の削除中にエラーが発生しました:\n{e}")
+
+    def show_merge_result(self, output_path, metrics=None, existing: bool = False):
+        if output_path and existing:
+            msg = f"新たに合算する中間ファイルがないため、既存の合算結果を表示します:\n{output_path}"
+        elif output_path:
+            msg = f"合算結果の JSON が作成されました:\n{output_path}"
+        else:
+            msg = "合算対象となる JSON ファイルが見つかりませんでした。"
+        if metrics is not None:
+            msg += "\n\n" + metrics.summary_text()
+        messagebox.showinfo("合算完了", msg)
+        self.status_label.config(text="次の作業: 合算処理完了。再度ファイルを選択するか、終了してください")
+
+    def open_query_view(self):
+        """合算結果の検索用インデックスを検索するウィンドウを開く"""
+        from presentation.query_view import QueryView
+        QueryView(self.root)
+
     def convert_json_to_csv(self):
         """
         OUT_FOLDER 内の各 JSON ファイルを CSV に変換します。
         変換後の CSV ファイルは、JSON ファイル名と同一のベース名に拡張子 .csv を付与し、OUT_FOLDER に保存します。
         """
-        from infrastructure.json_to_csv import convert_json_file_to_csv
-        csv_file_paths = []
-        for filename in os.listdir(OUT_FOLDER):
-            if filename.lower().endswith(".json"):
-                json_filepath = os.path.join(OUT_FOLDER, filename)
-                base_name, _ = os.path.splitext(filename)
-                csv_filename = f"{base_name}.csv"
-                csv_filepath = os.path.join(OUT_FOLDER, csv_filename)
-                success = convert_json_file_to_csv(json_filepath, csv_filepath)
-                if success:
-                    csv_file_paths.append(f"{filename} => {csv_filename}")
-        if csv_file_paths:
-            msg = "以下の JSON ファイルから CSV 変換が行われました:\n" + "\n".join(csv_file_paths)
-        else:
-            msg = "変換対象となる JSON ファイルが見つかりませんでした。"
-        messagebox.showinfo("CSV変換完了", msg)
-        self.status_label.config(text="次の作業: CSV変換完了。再度ファイルを選択するか、終了してください")
+        self.status_label.config(text="CSV 変換を実行しています...")
+
+        def work(context):
+            from infrastructure.instrumentation import RunMetrics
+            from infrastructure.json_to_csv import convert_json_files_to_csv
+
+            metrics = RunMetrics("csv").start()
+            json_files = [f for f in os.listdir(OUT_FOLDER) if f.lower().endswith(".json")]
+            file_pairs = [
+                (os.path.join(OUT_FOLDER, filename), os.path.join(OUT_FOLDER, f"{os.path.splitext(filename)[0]}.csv"))
+                for filename in json_files
+            ]
+            # 複数の単位ファイルを並列に変換する
+            with metrics.stage("csv"):
+                results = convert_json_files_to_csv(file_pairs, progress_callback=context.report)
+            metrics.count("files", len(file_pairs))
+            metrics.count("succeeded", sum(1 for ok in results.values() if ok))
+            metrics.count("bytes", sum(os.path.getsize(json_filepath) for json_filepath, _ in file_pairs))
+            csv_file_paths = [
+                f"{os.path.basename(json_filepath)} => {os.path.basename(csv_filepath)}"
+                for json_filepath, csv_filepath in file_pairs
+                if results[json_filepath]
+            ]
+            return csv_file_paths, metrics.close()
+
+        def on_done(result):
+            csv_file_paths, metrics = result
+            if csv_file_paths:
+                msg = "以下の JSON ファイルから CSV 変換が行われました:\n" + "\n".join(csv_file_paths)
+                msg += "\n\n" + metrics.summary_text()
+            else:
+                msg = "変換対象となる JSON ファイルが見つかりませんでした。"
+            messagebox.showinfo("CSV変換完了", msg)
+            self.status_label.config(text="次の作業: CSV変換完了。再度ファイルを選択するか、終了してください")
+
+        def on_error(e):
+            logger.error("CSV変換中にエラー: %s", e)
+            messagebox.showerror("エラー", f"CSV変換中にエラーが発生しました:\n{e}")
+
+        self.job_runner.submit(work, on_done, on_error, self.on_job_cancelled)
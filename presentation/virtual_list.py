@@ -0,0 +1,295 @@
+import tkinter as tk
+import tkinter.font as tkfont
+from array import array
+
+class VirtualListModel:
+    """
+    仮想リスト用のデータ。全件は items (リスト) に保持し、絞り込み結果は items への添字の配列で持つ。
+    選択状態は items の添字の集合で、絞り込みを変更すると表示されなくなった行の選択は解除する。
+    """
+    def __init__(self):
+        self.items = []
+        self._folded = []          # 絞り込み用に casefold した items
+        self.visible = array("l")  # 絞り込みに一致する items の添字（items の順）
+        self.selection = set()
+        self._terms = ()
+
+    def __len__(self):
+        return len(self.visible)
+
+    @property
+    def total(self) -> int:
+        return len(self.items)
+
+    def clear(self):
+        self.items = []
+        self._folded = []
+        self.visible = array("l")
+        self.selection.clear()
+
+    def _matching(self, start: int = 0):
+        """_folded[start:] のうち、すべての語を含む行の添字を返す"""
+        folded = self._folded
+        indices = range(start, len(folded))
+        for term in self._terms:
+            indices = [i for i in indices if term in folded[i]]
+        return indices
+
+    def extend(self, new_items):
+        """末尾に追加する。絞り込み中は、追加分だけを判定して表示対象に加える。"""
+        start = len(self.items)
+        self.items.extend(new_items)
+        self._folded.extend(item.casefold() for item in self.items[start:])
+        self.visible.extend(self._matching(start))
+
+    def set_filter(self, text: str):
+        """空白区切りの語をすべて含む行（大文字小文字は区別しない）だけを表示対象にする"""
+        self._terms = tuple(term.casefold() for term in text.split())
+        self.visible = array("l", self._matching())
+        if self._terms:
+            self.selection.intersection_update(self.visible)
+
+    def item_at(self, row: int) -> str:
+        return self.items[self.visible[row]]
+
+    def is_selected(self, row: int) -> bool:
+        return self.visible[row] in self.selection
+
+    def select_only(self, row: int):
+        self.selection = {self.visible[row]}
+
+    def toggle(self, row: int):
+        self.selection.symmetric_difference_update((self.visible[row],))
+
+    def select_range(self, first: int, last: int, extend: bool = False):
+        """表示上の行 first〜last を選択する。extend が False なら既存の選択を置き換える。"""
+        if first > last:
+            first, last = last, first
+        rows = self.visible[max(first, 0):last + 1]
+        if extend:
+            self.selection.update(rows)
+        else:
+            self.selection = set(rows)
+
+    def select_all(self):
+        self.selection = set(self.visible)
+
+    def selected_items(self) -> list:
+        """選択されている行を一覧の順に返す"""
+        return [self.items[i] for i in sorted(self.selection)]
+
+class VirtualListView(tk.Frame):
+    """
+    大量の行を表示するための仮想リスト。
+    Listbox には画面に見えている行だけを入れ、スクロールのたびに入れ替える。
+    複数選択 (クリック / Shift・Ctrl + クリック / ドラッグ / Ctrl+A) と、絞り込み用の入力欄を持つ。
+    """
+    def __init__(self, master, placeholder: str = "", **kwargs):
+        super().__init__(master, **kwargs)
+        self.model = VirtualListModel()
+        self.placeholder = placeholder
+        self._offset = 0        # 先頭に表示している行 (絞り込み後の行番号)
+        self._rows = 1          # 表示できる行数
+        self._anchor = None     # Shift 選択の起点
+        self._render_pending = False
+        self._filter_job = None
+
+        filter_frame = tk.Frame(self)
+        filter_frame.pack(side=tk.TOP, fill=tk.X, pady=(0, 5))
+        tk.Label(filter_frame, text="絞り込み:").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        self.filter_entry = tk.Entry(filter_frame, textvariable=self.filter_var)
+        self.filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.count_label = tk.Label(filter_frame, text="", anchor="e")
+        self.count_label.pack(side=tk.RIGHT)
+        self.filter_var.trace_add("write", self._on_filter_changed)
+
+        body = tk.Frame(self)
+        body.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.scrollbar = tk.Scrollbar(body, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox = tk.Listbox(body, selectmode=tk.BROWSE, exportselection=False, activestyle="none")
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self._line_height = max(tkfont.Font(font=self.listbox.cget("font")).metrics("linespace") + 1, 1)
+
+        listbox = self.listbox
+        listbox.bind("<Configure>", self._on_configure)
+        listbox.bind("<Button-1>", self._on_click)
+        listbox.bind("<Control-Button-1>", self._on_ctrl_click)
+        listbox.bind("<Shift-Button-1>", self._on_shift_click)
+        listbox.bind("<B1-Motion>", self._on_drag)
+        listbox.bind("<MouseWheel>", self._on_mousewheel)
+        listbox.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        listbox.bind("<Button-5>", lambda e: self._scroll_by(3))
+        listbox.bind("<Up>", lambda e: self._move_cursor(-1, e))
+        listbox.bind("<Down>", lambda e: self._move_cursor(1, e))
+        listbox.bind("<Prior>", lambda e: self._move_cursor(-self._rows, e))
+        listbox.bind("<Next>", lambda e: self._move_cursor(self._rows, e))
+        listbox.bind("<Home>", lambda e: self._move_cursor(-len(self.model), e))
+        listbox.bind("<End>", lambda e: self._move_cursor(len(self.model), e))
+        listbox.bind("<Control-a>", self._on_select_all)
+        # Listbox 既定の選択処理は使わない
+        for sequence in ("<ButtonRelease-1>", "<Double-Button-1>", "<Shift-Up>", "<Shift-Down>"):
+            listbox.bind(sequence, lambda e: "break")
+
+    # --- データ操作 ---
+    def clear(self, placeholder: str = None):
+        self.model.clear()
+        self._offset = 0
+        self._anchor = None
+        if placeholder is not None:
+            self.placeholder = placeholder
+        self._schedule_render()
+
+    def extend(self, items):
+        """末尾に行を追加する（発見済みのファイルを順次追加する用途。描画はまとめて行う）"""
+        self.model.extend(items)
+        self._schedule_render()
+
+    def set_placeholder(self, text: str):
+        """一覧が空のときに表示する文言を設定する"""
+        self.placeholder = text
+        self._schedule_render()
+
+    def selected_items(self) -> list:
+        return self.model.selected_items()
+
+    def all_items(self) -> list:
+        return list(self.model.items)
+
+    # --- 描画 ---
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+
+    def _render(self):
+        self._render_pending = False
+        model = self.model
+        total = len(model)
+        self._offset = max(0, min(self._offset, total - self._rows))
+        listbox = self.listbox
+        listbox.delete(0, tk.END)
+        if total == 0:
+            if self.placeholder and model.total == 0:
+                listbox.insert(tk.END, self.placeholder)
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            end = min(self._offset + self._rows + 1, total)
+            listbox.insert(tk.END, *(model.item_at(row) for row in range(self._offset, end)))
+            for i, row in enumerate(range(self._offset, end)):
+                if model.is_selected(row):
+                    listbox.selection_set(i)
+            self.scrollbar.set(self._offset / total, min((self._offset + self._rows) / total, 1.0))
+        if model.total and total != model.total:
+            self.count_label.config(text=f"{total:,} 件 / 全 {model.total:,} 件")
+        else:
+            self.count_label.config(text=f"{model.total:,} 件" if model.total else "")
+
+    def _on_configure(self, event):
+        self._rows = max(1, event.height // self._line_height)
+        self._schedule_render()
+
+    # --- スクロール ---
+    def yview(self, *args):
+        """スクロールバーからの要求 ("moveto", 位置) / ("scroll", 量, "units" | "pages") を処理する"""
+        total = len(self.model)
+        if not args or not total:
+            return
+        if args[0] == "moveto":
+            self._offset = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            self._offset += amount * (self._rows if args[2] == "pages" else 1)
+        self._schedule_render()
+
+    def _scroll_by(self, rows: int):
+        self._offset += rows
+        self._schedule_render()
+        return "break"
+
+    def _on_mousewheel(self, event):
+        # Windows は 120 単位、macOS は 1 単位で delta が通知される
+        step = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_by(-3 * step)
+
+    def _ensure_visible(self, row: int):
+        if row < self._offset:
+            self._offset = row
+        elif row >= self._offset + self._rows:
+            self._offset = row - self._rows + 1
+
+    # --- 選択 ---
+    def _row_at(self, event):
+        if not len(self.model):
+            return None
+        row = self._offset + self.listbox.nearest(event.y)
+        return min(row, len(self.model) - 1)
+
+    def _on_click(self, event):
+        self.listbox.focus_set()
+        row = self._row_at(event)
+        if row is not None:
+            self.model.select_only(row)
+            self._anchor = row
+            self._schedule_render()
+        return "break"
+
+    def _on_ctrl_click(self, event):
+        row = self._row_at(event)
+        if row is not None:
+            self.model.toggle(row)
+            self._anchor = row
+            self._schedule_render()
+        return "break"
+
+    def _on_shift_click(self, event):
+        row = self._row_at(event)
+        if row is not None:
+            self.model.select_range(self._anchor if self._anchor is not None else row, row)
+            self._schedule_render()
+        return "break"
+
+    def _on_drag(self, event):
+        if self._anchor is None or not len(self.model):
+            return "break"
+        # 上下にはみ出した場合はスクロールしながら選択範囲を広げる
+        if event.y < 0:
+            self._offset = max(self._offset - 1, 0)
+        elif event.y > self.listbox.winfo_height():
+            self._offset += 1
+        row = self._row_at(event)
+        self.model.select_range(self._anchor, row)
+        self._schedule_render()
+        return "break"
+
+    def _move_cursor(self, delta: int, event):
+        total = len(self.model)
+        if not total:
+            return "break"
+        current = self._anchor if self._anchor is not None else self._offset
+        row = max(0, min(current + delta, total - 1))
+        self.model.select_only(row)
+        self._anchor = row
+        self._ensure_visible(row)
+        self._schedule_render()
+        return "break"
+
+    def _on_select_all(self, event):
+        self.model.select_all()
+        self._schedule_render()
+        return "break"
+
+    # --- 絞り込み ---
+    def _on_filter_changed(self, *args):
+        # 入力のたびに全件を判定しないよう、入力が落ち着いてから絞り込む
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(150, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_job = None
+        self.model.set_filter(self.filter_var.get())
+        self._offset = 0
+        self._anchor = None
+        self._schedule_render()
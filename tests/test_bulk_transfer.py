@@ -0,0 +1,109 @@
+import os
+
+from infrastructure.bulk_transfer import copy_file, copy_files, delete_paths, find_flatten_collisions, is_up_to_date
+
+def _write(path: str, data: bytes, mtime_ns: int = None) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+def test_find_flatten_collisions_detects_separator_clashes():
+    files = [os.path.join("a_b", "c.xlsx"), os.path.join("a", "b_c.xlsx"), "d.xlsx"]
+    assert find_flatten_collisions(files, "/in") == {"a_b_c.xlsx": files[:2]}
+
+def test_find_flatten_collisions_uses_platform_case_rules():
+    files = ["Report.xlsx", "report.xlsx"]
+    collisions = find_flatten_collisions(files, "/in")
+    if os.path.normcase("Report.xlsx") == os.path.normcase("report.xlsx"):
+        assert collisions == {"Report.xlsx": files}
+    else:
+        assert collisions == {}
+
+def test_is_up_to_date_requires_exact_mtime(tmp_path):
+    base = 1_700_000_000_123_456_789
+    src = _write(str(tmp_path / "src" / "a.xlsx"), b"12345", base)
+    dest = _write(str(tmp_path / "dest" / "a.xlsx"), b"12345", base)
+    assert is_up_to_date(src, dest)
+
+    # 同じサイズのまま 1 秒以内に更新されたファイルは古いコピーとみなす
+    os.utime(src, ns=(base + 500_000_000, base + 500_000_000))
+    assert not is_up_to_date(src, dest)
+
+    _write(src, b"123456", base)
+    assert not is_up_to_date(src, dest)
+    assert not is_up_to_date(src, str(tmp_path / "dest" / "missing.xlsx"))
+
+def test_is_up_to_date_tolerates_coarse_destination_mtime(tmp_path):
+    base = 1_700_000_000_123_456_789
+    src = _write(str(tmp_path / "src" / "a.xlsx"), b"12345", base)
+    # FAT のように 2 秒単位へ切り上げられたコピー先
+    dest = _write(str(tmp_path / "dest" / "a.xlsx"), b"12345", 1_700_000_002_000_000_000)
+    assert is_up_to_date(src, dest)
+    os.utime(dest, ns=(1_700_000_004_000_000_000,) * 2)
+    assert not is_up_to_date(src, dest)
+
+def test_coarse_mtime_branch_applies_only_to_whole_second_destinations(tmp_path):
+    base = 1_700_000_000_123_456_789
+    src = _write(str(tmp_path / "src" / "a.xlsx"), b"12345", base)
+    dest = str(tmp_path / "dest" / "a.xlsx")
+
+    # 秒単位に切り捨てられたコピー先も許容する
+    _write(dest, b"12345", 1_700_000_000_000_000_000)
+    assert is_up_to_date(src, dest)
+    # 許容範囲内でもサイズが違えば古いコピー
+    _write(dest, b"1234", 1_700_000_000_000_000_000)
+    assert not is_up_to_date(src, dest)
+    # コピー先の時刻に秒未満の値があれば、差が許容範囲内でも一致を求める
+    _write(dest, b"12345", 1_700_000_001_000_000_001)
+    assert not is_up_to_date(src, dest)
+    # コピー元だけが秒単位の場合も一致を求める
+    os.utime(src, ns=(1_700_000_000_000_000_000,) * 2)
+    assert not is_up_to_date(src, dest)
+
+def test_copy_file_skips_onto_coarse_destination(tmp_path):
+    src = _write(str(tmp_path / "src" / "a.xlsx"), b"data", 1_700_000_000_123_456_789)
+    dest = _write(str(tmp_path / "dest" / "a.xlsx"), b"data", 1_700_000_002_000_000_000)
+    assert copy_file(src, dest, skip_unchanged=True, link_mode="copy").action == "skipped"
+    # 許容範囲を超えて更新されたコピー元は複製し直す
+    os.utime(src, ns=(1_700_000_004_123_456_789,) * 2)
+    assert copy_file(src, dest, skip_unchanged=True, link_mode="copy").action == "copied"
+    assert os.stat(dest).st_mtime_ns == os.stat(src).st_mtime_ns
+
+def test_copy_file_skips_only_unchanged(tmp_path):
+    src = _write(str(tmp_path / "src" / "a.xlsx"), b"old", 1_700_000_000_123_456_789)
+    dest = str(tmp_path / "dest" / "a.xlsx")
+    os.makedirs(os.path.dirname(dest))
+    assert copy_file(src, dest, skip_unchanged=True, link_mode="copy").action == "copied"
+    assert copy_file(src, dest, skip_unchanged=True, link_mode="copy").action == "skipped"
+
+    _write(src, b"new", 1_700_000_000_623_456_789)
+    result = copy_file(src, dest, skip_unchanged=True, link_mode="copy")
+    assert result.ok and result.action == "copied"
+    with open(dest, "rb") as f:
+        assert f.read() == b"new"
+
+def test_copy_files_rejects_duplicate_destinations(tmp_path):
+    first = _write(str(tmp_path / "src" / "x" / "a.xlsx"), b"1")
+    second = _write(str(tmp_path / "src" / "y" / "a.xlsx"), b"2")
+    third = _write(str(tmp_path / "src" / "b.xlsx"), b"3")
+    dest_folder = tmp_path / "dest"
+    dest_folder.mkdir()
+    results = copy_files([(first, str(dest_folder / "a.xlsx")), (second, str(dest_folder / "a.xlsx")),
+                          (third, str(dest_folder / "b.xlsx"))], link_mode="copy")
+    assert [r.src for r in results] == [first, second, third]
+    assert [r.ok for r in results] == [True, False, True]
+    assert first in results[1].error
+    with open(dest_folder / "a.xlsx", "rb") as f:
+        assert f.read() == b"1"
+
+def test_delete_paths_removes_files_and_folders(tmp_path):
+    file_path = _write(str(tmp_path / "a.json"), b"{}")
+    folder = tmp_path / "sub"
+    _write(str(folder / "b.json"), b"{}")
+    results = delete_paths([file_path, str(folder), str(tmp_path / "missing.json")])
+    assert all(r.ok for r in results)
+    assert not os.path.exists(file_path) and not folder.exists()
+    assert delete_paths([]) == []
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+import cli
+from infrastructure import file_copier, intermediate_format, json_merger, json_writer
+from use_cases import extraction_pipeline
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    """出力・TMP・ログをテスト用のフォルダへ向ける"""
+    out_folder, tmp_folder, err_folder = (str(tmp_path / name) for name in ("Out", "Tmp", "Err"))
+    monkeypatch.setattr(cli, "OUT_FOLDER", out_folder)
+    monkeypatch.setattr(cli, "TMP_FOLDER", tmp_folder)
+    monkeypatch.setattr(cli, "ERR_FOLDER", err_folder)
+    monkeypatch.setattr(cli, "LOG_FILE", os.path.join(err_folder, "error.log"))
+    monkeypatch.setattr(json_merger, "OUT_FOLDER", out_folder)
+    monkeypatch.setattr(json_merger, "TMP_FOLDER", tmp_folder)
+    monkeypatch.setattr(json_merger, "QUERY_INDEX_ENABLED", False)
+    for module in (file_copier, intermediate_format, json_writer, extraction_pipeline):
+        monkeypatch.setattr(module, "TMP_FOLDER", tmp_folder)
+    in_folder = tmp_path / "In"
+    in_folder.mkdir()
+    return {"in": str(in_folder), "out": out_folder, "err": err_folder}
+
+def _run(folders, *args) -> int:
+    return cli.main([folders["in"], "-q", "--no-cache", "--no-index", "--no-incremental", "--workers", "2",
+                     "--report-folder", folders["err"], *args])
+
+def test_missing_input_folder_is_fatal(folders):
+    assert cli.main([os.path.join(folders["in"], "なし"), "-q", "--report-folder", folders["err"]]) == cli.EXIT_FATAL
+
+def test_no_matching_files_is_ok(folders):
+    assert _run(folders) == cli.EXIT_OK
+
+@pytest.mark.parametrize("mode", ["direct", "tmp"])
+def test_all_files_failing_is_fatal(folders, mode):
+    with open(os.path.join(folders["in"], "実績_本間.xlsx"), "wb") as f:
+        f.write(b"not a workbook")
+    assert _run(folders, "--mode", mode) == cli.EXIT_FATAL
+
+@pytest.mark.parametrize("mode", ["direct", "tmp"])
+def test_some_files_failing_is_partial_failure(folders, mode):
+    pytest.importorskip("openpyxl")
+    from benchmarks.generators import generate_workbook
+
+    generate_workbook(os.path.join(folders["in"], "実績_金子.xlsx"), rows=20)
+    with open(os.path.join(folders["in"], "実績_本間.xlsx"), "wb") as f:
+        f.write(b"not a workbook")
+    assert _run(folders, "--mode", mode) == cli.EXIT_PARTIAL_FAILURE
+    assert os.listdir(folders["out"]) == ["output_金子.json"]
+
+def test_interrupt_and_unexpected_errors(folders, monkeypatch):
+    def interrupted(args, metrics):
+        raise KeyboardInterrupt()
+
+    def broken(args, metrics):
+        raise RuntimeError("予期しないエラー")
+
+    monkeypatch.setattr(cli, "run", interrupted)
+    assert _run(folders) == cli.EXIT_INTERRUPTED
+    monkeypatch.setattr(cli, "run", broken)
+    assert _run(folders) == cli.EXIT_FATAL
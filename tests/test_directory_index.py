@@ -0,0 +1,76 @@
+import os
+import threading
+
+import pytest
+
+from domain.file_searcher import iter_search_files
+from infrastructure.directory_index import DirectoryIndex
+
+KEYWORDS = ["金子", "本間"]
+
+def _touch(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+def _bump_mtime(folder: str):
+    """更新時刻の分解能が粗いファイルシステムでも変化が検出されるよう、ディレクトリの mtime を進める"""
+    st = os.stat(folder)
+    os.utime(folder, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "In"
+    for rel in ("実績_金子.xlsx", "メモ.txt", "a/実績_本間.xlsx", "a/b/c/実績_金子_深い.xlsx",
+                "a/b/c/d/実績_金子_対象外.xlsx", "z/本間.pdf"):
+        _touch(str(root / rel))
+    return str(root)
+
+@pytest.fixture
+def index(tmp_path):
+    index = DirectoryIndex(str(tmp_path / "index.sqlite3"))
+    yield index
+    index.close()
+
+def test_iter_files_matches_scandir_walk_order(tree, index):
+    expected = list(iter_search_files(tree, KEYWORDS))
+    assert list(index.iter_files(tree, KEYWORDS)) == expected
+    assert index.scanned_dirs > 0
+    # 2 回目は変化がないため、すべて記録から同じ順序で返す
+    assert list(index.iter_files(tree, KEYWORDS)) == expected
+    assert index.scanned_dirs == 0
+    assert index.query(tree, KEYWORDS) == sorted(expected)
+
+def test_iter_files_rescans_only_changed_dirs(tree, index):
+    index.refresh(tree)
+    _touch(os.path.join(tree, "a", "b", "新規_本間.xlsx"))
+    _bump_mtime(os.path.join(tree, "a", "b"))
+
+    assert list(index.iter_files(tree, KEYWORDS)) == list(iter_search_files(tree, KEYWORDS))
+    assert index.scanned_dirs == 1
+
+def test_iter_files_drops_removed_subtree(tree, index):
+    index.refresh(tree)
+    for dirpath, _, filenames in os.walk(os.path.join(tree, "a"), topdown=False):
+        for name in filenames:
+            os.remove(os.path.join(dirpath, name))
+        os.rmdir(dirpath)
+    _bump_mtime(tree)
+
+    assert list(index.iter_files(tree, KEYWORDS)) == list(iter_search_files(tree, KEYWORDS))
+    assert all(not path.startswith("a") for path in index.query(tree))
+
+def test_iter_files_filters_extensions(tree, index):
+    assert list(index.iter_files(tree, KEYWORDS, extensions=["pdf"])) == [os.path.join("z", "本間.pdf")]
+
+def test_iter_files_yields_before_walk_completes(tree, index):
+    files = index.iter_files(tree, KEYWORDS)
+    next(files)
+    # 走査対象は In, a, a/b, a/b/c, z の 5 つ（a/b/c/d は max_depth を超える）
+    assert index.scanned_dirs < 5
+    files.close()
+
+def test_iter_files_stops_on_cancel(tree, index):
+    cancel_event = threading.Event()
+    cancel_event.set()
+    assert list(index.iter_files(tree, KEYWORDS, cancel_event=cancel_event)) == ["実績_金子.xlsx"]
+    assert list(iter_search_files(tree, KEYWORDS, cancel_event=cancel_event)) == ["実績_金子.xlsx"]
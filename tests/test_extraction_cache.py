@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from infrastructure.extraction_cache import ExtractionCache
+
+DATA = {"1月": {"G001": [{"グループ": "G001", "指図書No": "A-0001", "補足": "", "時間": 1.5}]}}
+
+def _write(path, content: bytes, mtime_ns: int):
+    with open(path, "wb") as f:
+        f.write(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache" / "extraction_cache.sqlite3"))
+    yield cache
+    cache.close()
+
+def test_hit_and_miss_on_size_and_content_changes(tmp_path, cache):
+    path = _write(tmp_path / "a.xlsx", b"abcdef", 1_700_000_000_000_000_000)
+    assert cache.get(path) is None
+    cache.put(path, DATA)
+    assert cache.get(path) == DATA
+
+    # 更新時刻だけが変わった場合は内容ハッシュが同じなら再利用する
+    _write(path, b"abcdef", 1_700_000_100_000_000_000)
+    assert cache.get(path) == DATA
+
+    # 同じサイズでも内容が変われば使わない
+    _write(path, b"abcxyz", 1_700_000_200_000_000_000)
+    assert cache.get(path) is None
+
+    cache.put(path, DATA)
+    _write(path, b"abcdefg", 1_700_000_200_000_000_000)
+    assert cache.get(path) is None
+    assert (cache.hits, cache.misses) == (2, 3)
+
+def test_evicts_least_recently_used_entries(tmp_path, cache):
+    paths = [_write(tmp_path / f"{i}.xlsx", bytes([i]) * 10, 1_700_000_000_000_000_000) for i in range(3)]
+    for path in paths:
+        cache.put(path, DATA)
+    entry_bytes = cache.stats()["bytes"] // 3
+    cache.get(paths[0])  # paths[0] を最近参照したことにする
+    cache.max_bytes = entry_bytes * 2
+    assert cache.evict() == 1
+    assert cache.get(paths[1]) is None
+    assert cache.get(paths[0]) == DATA and cache.get(paths[2]) == DATA
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,181 @@
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import CancelledError, Future
+
+import pytest
+
+from infrastructure import file_copier, intermediate_format, json_writer
+from use_cases import extraction_pipeline
+from use_cases.extraction_pipeline import (
+    _JobScheduler, _partition_sheets, _SheetSplitJob, prepare_sheet_split, run_extraction_pipeline,
+)
+
+def test_partition_sheets_balances_sizes_and_keeps_sheet_order():
+    sheet_sizes = [("1月", 10), ("2月", 50), ("3月", 30), ("4月", 20), ("5月", 40)]
+    partitions = _partition_sheets(sheet_sizes, 2)
+    assert sorted(total for _, total in partitions) == [70, 80]
+    # 各組のシートは元の並び順
+    for names, _ in partitions:
+        assert names == sorted(names, key=[name for name, _ in sheet_sizes].index)
+    assert sorted(name for names, _ in partitions for name in names) == sorted(name for name, _ in sheet_sizes)
+
+def test_partition_sheets_never_returns_empty_parts():
+    assert _partition_sheets([("1月", 5), ("2月", 0)], 4) == [(["1月"], 5), (["2月"], 0)]
+    assert _partition_sheets([("1月", 5)], 1) == [(["1月"], 5)]
+
+class _ManualExecutor:
+    """submit したタスクを実行せず、テストから結果を設定できる Future を返す"""
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.calls.append((fn, args, future))
+        return future
+
+def _split_job(executor, scheduler, partitions, sheet_names):
+    job = _SheetSplitJob("/in/a.xlsx", 100, lambda data, hit, timer: (data, hit, timer.timings))
+    scheduler.jobs.append(job)
+    job.prepare = executor.submit(prepare_sheet_split)
+    job.prepare.set_result((None, sheet_names, partitions, "/tmp/a.xlsx", {"copy": 1.0}))
+    job.expand(scheduler)
+    return job
+
+def test_split_job_reassembles_parts_in_original_sheet_order():
+    executor = _ManualExecutor()
+    scheduler = _JobScheduler(executor, workers=2)
+    sheet_names = ["1月", "2月", "3月", "4月"]
+    job = _split_job(executor, scheduler, [(["2月", "3月"], 60), (["1月", "4月"], 40)], sheet_names)
+    scheduler._fill()
+    parts = executor.calls[1:]
+    # 大きい組から投入する
+    assert [args for _, args, _ in parts] == [("/tmp/a.xlsx", ["2月", "3月"]), ("/tmp/a.xlsx", ["1月", "4月"])]
+
+    parts[1][2].set_result(({"1月": {"G": [1]}, "4月": {"G": [4]}}, {"extract": 2.0}))
+    assert not job.done()
+    parts[0][2].set_result(({"2月": {"G": [2]}, "3月": {"G": [3]}}, {"extract": 3.0}))
+    assert job.done()
+    data, cache_hit, timings = job.result()
+    assert list(data) == sheet_names
+    assert [data[name]["G"] for name in sheet_names] == [[1], [2], [3], [4]]
+    assert not cache_hit
+    assert timings == {"copy": 1.0, "extract": 5.0}
+
+def test_split_job_extracts_whole_workbook_when_not_partitioned():
+    executor = _ManualExecutor()
+    scheduler = _JobScheduler(executor, workers=2)
+    job = _split_job(executor, scheduler, [], ["1月", "2月"])
+    scheduler._fill()
+    (fn, args, future), = executor.calls[1:]
+    assert fn is extraction_pipeline.extract_xlsx_sheets and args == ("/tmp/a.xlsx", None)
+    future.set_result(({"1月": {}, "2月": {}}, {}))
+    assert list(job.result()[0]) == ["1月", "2月"]
+
+def test_cancelled_split_job_does_not_submit_parts():
+    executor = _ManualExecutor()
+    scheduler = _JobScheduler(executor, workers=2)
+    job = _SheetSplitJob("/in/a.xlsx", 100, lambda data, hit, timer: data)
+    scheduler.jobs.append(job)
+    job.prepare = executor.submit(prepare_sheet_split)
+    job.prepare.set_running_or_notify_cancel()
+    scheduler.cancel()
+    assert not job.done()
+    job.prepare.set_result((None, ["1月", "2月"], [(["1月"], 1), (["2月"], 1)], "/tmp/a.xlsx", {}))
+    job.expand(scheduler)
+    scheduler._fill()
+    assert job.done() and len(executor.calls) == 1
+    with pytest.raises(CancelledError):
+        job.result()
+
+def _rewrite_sheets(path: str, transform):
+    """ブック内のシート XML を transform(content) の結果に置き換える"""
+    rewritten = path + ".rewritten"
+    with zipfile.ZipFile(path) as src, zipfile.ZipFile(rewritten, "w", zipfile.ZIP_DEFLATED) as dest:
+        for info in src.infolist():
+            content = src.read(info.filename)
+            if info.filename.startswith("xl/worksheets/"):
+                content = transform(content)
+            dest.writestr(info, content)
+    os.replace(rewritten, path)
+
+def _add_dimension(content: bytes) -> bytes:
+    """Excel で保存したブックと同じく、sheetData の前にシートの範囲 (dimension) を記録する"""
+    rows = content.count(b"<row ")
+    last_column = max(re.findall(rb'<c r="([A-Z]+)\d+"', content), key=lambda col: (len(col), col))
+    dimension = b'<dimension ref="A1:' + last_column + str(rows).encode() + b'"/>'
+    return content.replace(b"<sheetViews>", dimension + b"<sheetViews>", 1)
+
+def _generate_workbook(path: str, with_dimensions: bool = True, **kwargs) -> str:
+    from benchmarks.generators import generate_workbook
+
+    # openpyxl の書き込み専用モードは dimension を書き出さない（範囲を記録しないツールで保存したブックと同じ）
+    generate_workbook(path, **kwargs)
+    if with_dimensions:
+        _rewrite_sheets(path, _add_dimension)
+    return path
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    tmp_folder = str(tmp_path / "Tmp")
+    for module in (file_copier, intermediate_format, json_writer, extraction_pipeline):
+        monkeypatch.setattr(module, "TMP_FOLDER", tmp_folder)
+    in_folder = tmp_path / "In"
+    in_folder.mkdir()
+    return str(in_folder), tmp_folder
+
+def test_workbook_without_dimensions_is_not_split(folders):
+    pytest.importorskip("openpyxl")
+    in_folder, _ = folders
+    path = _generate_workbook(os.path.join(in_folder, "実績_金子.xlsx"), sheets=3, rows=30)
+    data, sheet_names, partitions, tmp_path, timings = prepare_sheet_split(path, in_folder, max_parts=3)
+    assert data is None and sheet_names == ["1月", "2月", "3月"] and len(partitions) == 3
+    assert os.path.isfile(tmp_path) and "copy" in timings
+
+    _generate_workbook(path, with_dimensions=False, sheets=3, rows=30)
+    data, sheet_names, partitions, _, _ = prepare_sheet_split(path, in_folder, max_parts=3)
+    assert data is None and sheet_names == ["1月", "2月", "3月"] and partitions == []
+
+@pytest.mark.parametrize("with_dimensions", [True, False])
+def test_split_extraction_matches_whole_workbook_extraction(folders, monkeypatch, with_dimensions):
+    pytest.importorskip("openpyxl")
+    in_folder, _ = folders
+    files = ["実績_金子.xlsx", "実績_本間.xlsx"]
+    _generate_workbook(os.path.join(in_folder, files[0]), with_dimensions, sheets=4, rows=60, seed=1)
+    _generate_workbook(os.path.join(in_folder, files[1]), with_dimensions, sheets=1, rows=40, seed=2)
+    split_parts = []
+    original_expand = _SheetSplitJob.expand
+
+    def recording_expand(job, scheduler):
+        original_expand(job, scheduler)
+        split_parts.append(len(job.futures))
+    monkeypatch.setattr(_SheetSplitJob, "expand", recording_expand)
+
+    def run(split: bool) -> dict:
+        monkeypatch.setattr(extraction_pipeline, "SHEET_SPLIT_ENABLED", split)
+        monkeypatch.setattr(extraction_pipeline, "SHEET_SPLIT_MIN_BYTES", 1)
+        result = run_extraction_pipeline(files, in_folder, max_workers=2, use_cache=False, intermediate_format="json")
+        assert [r.error for r in result.results] == [None, None]
+        outputs = {}
+        for r in result.results:
+            with open(r.json_path, "rb") as f:
+                outputs[r.file] = f.read()
+        return outputs
+
+    assert run(split=True) == run(split=False)
+    # シートが 1 つのブックと、範囲が記録されていないブックは分割しない
+    assert sorted(split_parts) == ([1, 2] if with_dimensions else [1, 1])
+
+def test_cancel_event_stops_scheduling(folders):
+    in_folder, _ = folders
+    files = []
+    for i in range(4):
+        files.append(f"実績_{i}_金子.xlsx")
+        with open(os.path.join(in_folder, files[-1]), "wb") as f:
+            f.write(b"not a workbook")
+    cancel_event = threading.Event()
+    cancel_event.set()
+    result = run_extraction_pipeline(files, in_folder, max_workers=1, use_cache=False, cancel_event=cancel_event)
+    # 最初に投入したタスクの完了後は、未着手のファイルを取り消す
+    assert [r.error for r in result.results].count(extraction_pipeline.CANCELLED_MESSAGE) >= 2
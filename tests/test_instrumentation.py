@@ -0,0 +1,41 @@
+import os
+from datetime import datetime, timedelta
+
+from infrastructure.instrumentation import RunMetrics, prune_reports
+
+def _touch(folder, filename: str) -> str:
+    path = os.path.join(folder, filename)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{}")
+    return path
+
+def test_write_report_keeps_only_the_latest_reports_of_the_same_name(tmp_path):
+    folder = str(tmp_path)
+    for day in range(1, 6):
+        _touch(folder, f"run_report_merge_202601{day:02d}_120000.json")
+    others = [_touch(folder, "run_report_info_20260101_120000.json"),
+              _touch(folder, "run_report_merge_csv_20260101_120000.json"),
+              _touch(folder, "error.log")]
+
+    metrics = RunMetrics("merge")
+    metrics.start()
+    metrics.started_at = datetime(2026, 2, 1, 9, 0, 0)
+    report_path = metrics.write_report(folder, keep=3)
+
+    assert report_path == os.path.join(folder, "run_report_merge_20260201_090000.json")
+    assert sorted(f for f in os.listdir(folder) if f.startswith("run_report_merge_2")) == [
+        "run_report_merge_20260104_120000.json",
+        "run_report_merge_20260105_120000.json",
+        "run_report_merge_20260201_090000.json",
+    ]
+    # 他の種類のレポートや、レポート以外のファイルは削除しない
+    assert all(os.path.exists(path) for path in others)
+
+def test_prune_reports_without_limit_or_folder_removes_nothing(tmp_path):
+    start = datetime(2026, 1, 1)
+    for i in range(3):
+        _touch(str(tmp_path), f"run_report_info_{(start + timedelta(hours=i)):%Y%m%d_%H%M%S}.json")
+    assert prune_reports(str(tmp_path), "info", None) == []
+    assert prune_reports(str(tmp_path / "なし"), "info", 1) == []
+    assert len(prune_reports(str(tmp_path), "info", 0)) == 3
+    assert os.listdir(tmp_path) == []
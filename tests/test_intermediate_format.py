@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from infrastructure import intermediate_format, json_writer
+from infrastructure.intermediate_format import FORMATS, format_for_path, get_format
+
+@pytest.fixture(autouse=True)
+def tmp_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(intermediate_format, "TMP_FOLDER", str(tmp_path))
+    monkeypatch.setattr(json_writer, "TMP_FOLDER", str(tmp_path))
+    return tmp_path
+
+def _sample_data() -> dict:
+    rows = [{"グループ": "G1", "指図書No": f"A-{i:05d}", "補足": "", "時間": None if i % 7 == 0 else i / 4,
+             "作業内容": "作業"} for i in range(2500)]
+    # 途中で列の構成が変わる行・キーが文字列でないグループ・行のないグループ / シートも含める
+    rows.insert(10, {"グループ": "G1", "指図書No": "B-1", "補足": "残業", "時間": 1.5})
+    return {
+        "1月": {"G1": rows, 2: [{"グループ": 2, "指図書No": 10, "補足": None, "時間": 3}], "空": []},
+        "2月": {},
+        "3月": {None: [{"グループ": None, "指図書No": "C-1", "補足": "", "時間": 0.25}]},
+    }
+
+def _as_json(data: dict) -> dict:
+    """JSON 形式で保存して読み直した場合と同じ値（グループ名は文字列のキーになる）"""
+    return json.loads(json.dumps(data, ensure_ascii=False))
+
+@pytest.mark.parametrize("name", sorted(FORMATS))
+def test_round_trip_matches_json(name):
+    fmt = get_format(name)
+    data = _sample_data()
+    path = fmt.write(data, "実績_本間" + fmt.extension)
+    assert format_for_path(path) is fmt
+    assert fmt.read(path) == _as_json(data)
+
+@pytest.mark.parametrize("name", sorted(FORMATS))
+def test_row_batches_yield_all_rows_in_order(name, monkeypatch):
+    # JSON 形式もストリーミングで読み込む経路を通す
+    monkeypatch.setattr(intermediate_format, "JSON_STREAMING_THRESHOLD_BYTES", 0)
+    fmt = get_format(name)
+    data = _sample_data()
+    path = fmt.write(data, "実績_本間" + fmt.extension)
+    batches = list(fmt.iter_row_batches(path))
+    expected = [row for groups in _as_json(data).values() for rows in groups.values() for row in rows]
+    assert [row for batch in batches for row in batch] == expected
+    assert all(0 < len(batch) <= fmt.batch_size for batch in batches)
+
+def test_rowpack_rejects_other_files(tmp_folder):
+    path = tmp_folder / "壊れた.rowpack"
+    path.write_bytes(b"not a rowpack")
+    with pytest.raises(ValueError):
+        list(get_format("rowpack").iter_row_batches(str(path)))
+
+def test_unknown_format():
+    assert format_for_path("memo.txt") is None
+    with pytest.raises(ValueError):
+        get_format("csv")
@@ -0,0 +1,96 @@
+import json
+import os
+import random
+
+import pytest
+
+from benchmarks.generators import generate_extracted_data
+from infrastructure import intermediate_format, json_merger, json_writer
+from infrastructure.intermediate_format import FORMATS
+
+KEYWORDS = ["金子", "本間"]
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    tmp_folder = tmp_path / "Tmp"
+    out_folder = tmp_path / "Out"
+    tmp_folder.mkdir()
+    monkeypatch.setattr(json_merger, "TMP_FOLDER", str(tmp_folder))
+    monkeypatch.setattr(json_merger, "OUT_FOLDER", str(out_folder))
+    monkeypatch.setattr(json_merger, "WRITE_CSV_ON_MERGE", False)
+    monkeypatch.setattr(json_merger, "QUERY_INDEX_ENABLED", False)
+    return str(tmp_folder), str(out_folder)
+
+def _write_tmp_files(tmp_folder: str, count: int = 4) -> dict:
+    rng = random.Random(1)
+    files = {}
+    for i in range(count):
+        filename = f"実績_{i}_{KEYWORDS[i % 2]}.json"
+        data = generate_extracted_data(rows=300, distinct_orders=40, rng=rng)
+        with open(os.path.join(tmp_folder, filename), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        files[filename] = data
+    return files
+
+def _read_outputs(output_paths: dict) -> dict:
+    outputs = {}
+    for unit, path in output_paths.items():
+        with open(path, encoding="utf-8") as f:
+            outputs[unit] = json.load(f)
+    return outputs
+
+def test_tmp_and_direct_merge_write_identical_outputs(folders):
+    tmp_folder, _ = folders
+    files = _write_tmp_files(tmp_folder)
+    merged = _read_outputs(json_merger.merge_json_files_by_unit(KEYWORDS))
+    # 直接合算は TMP のファイルと同じ順序（ファイル名の順）で渡せば同じ出力になる
+    sources = [
+        (filename, (rows for groups in files[filename].values() for rows in groups.values()))
+        for filename in sorted(files)
+    ]
+    direct = _read_outputs(json_merger.merge_rows_by_unit(sources, KEYWORDS))
+    assert merged == direct
+    assert set(merged) == set(KEYWORDS)
+
+def test_has_intermediate_files_and_find_unit_outputs(folders):
+    tmp_folder, out_folder = folders
+    assert not json_merger.has_intermediate_files(KEYWORDS)
+    assert json_merger.find_unit_outputs(KEYWORDS) == {}
+    _write_tmp_files(tmp_folder, count=1)
+    assert json_merger.has_intermediate_files(KEYWORDS)
+    output_paths = json_merger.merge_json_files_by_unit(KEYWORDS)
+    assert json_merger.find_unit_outputs(KEYWORDS) == output_paths == {
+        "金子": os.path.join(out_folder, "output_金子.json")
+    }
+
+def _read_output_bytes(output_paths: dict) -> dict:
+    outputs = {}
+    for unit, path in output_paths.items():
+        with open(path, "rb") as f:
+            outputs[unit] = f.read()
+    return outputs
+
+def test_merge_writes_identical_outputs_for_every_intermediate_format(folders, tmp_path, monkeypatch):
+    files = _write_tmp_files(str(tmp_path))
+
+    outputs = {}
+    for name, fmt in sorted(FORMATS.items()):
+        format_folder = tmp_path / f"Tmp_{name}"
+        format_folder.mkdir()
+        monkeypatch.setattr(intermediate_format, "TMP_FOLDER", str(format_folder))
+        monkeypatch.setattr(json_writer, "TMP_FOLDER", str(format_folder))
+        for filename, data in files.items():
+            fmt.write(data, os.path.splitext(filename)[0] + fmt.extension)
+        monkeypatch.setattr(json_merger, "TMP_FOLDER", str(format_folder))
+        monkeypatch.setattr(json_merger, "OUT_FOLDER", str(tmp_path / f"Out_{name}"))
+        outputs[name] = _read_output_bytes(json_merger.merge_json_files_by_unit(KEYWORDS))
+
+    assert set(outputs) == {"json", "ndjson", "rowpack"}
+    assert outputs["ndjson"] == outputs["json"] == outputs["rowpack"]
+    # merged_files には中間形式によらず JSON 形式のファイル名が記録される
+    merged_files = set()
+    for output in outputs["rowpack"].values():
+        for rows in json.loads(output).values():
+            for row in rows:
+                merged_files.update(row["merged_files"])
+    assert merged_files == set(files)
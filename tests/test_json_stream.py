@@ -0,0 +1,49 @@
+import codecs
+import json
+
+import pytest
+
+from infrastructure.json_stream import iter_grouped_json_rows, iter_nested_json_rows
+
+DATA = {
+    "1月": {
+        "組立": [{"グループ": "組立", "指図書No": f"A-{i}", "補足": "検査・調整 😀", "時間": i / 4} for i in range(30)],
+        "空": [],
+    },
+    "2月": {},
+    "3月": {"検査": [{"グループ": "検査", "指図書No": "B-1", "補足": "", "時間": None}]},
+}
+
+def _expected() -> list:
+    return [((sheet, group), row) for sheet, groups in DATA.items() for group, rows in groups.items() for row in rows]
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64 * 1024])
+def test_rows_match_json_load_for_any_chunk_size(tmp_path, chunk_size):
+    path = tmp_path / "a.json"
+    path.write_text(json.dumps(DATA, ensure_ascii=False, indent=4), encoding="utf-8")
+    assert list(iter_nested_json_rows(str(path), 2, chunk_size)) == _expected()
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64 * 1024])
+def test_utf8_bom_is_skipped(tmp_path, chunk_size):
+    path = tmp_path / "bom.json"
+    path.write_bytes(codecs.BOM_UTF8 + json.dumps(DATA, ensure_ascii=False).encode("utf-8"))
+    assert list(iter_nested_json_rows(str(path), 2, chunk_size)) == _expected()
+
+def test_grouped_rows(tmp_path):
+    path = tmp_path / "output.json"
+    grouped = {"組立": DATA["1月"]["組立"][:3], "空": [], "検査": DATA["3月"]["検査"]}
+    path.write_text(json.dumps(grouped, ensure_ascii=False), encoding="utf-8")
+    assert list(iter_grouped_json_rows(str(path), chunk_size=2)) == [
+        (group, row) for group, rows in grouped.items() for row in rows]
+
+def test_empty_object_yields_nothing(tmp_path):
+    path = tmp_path / "empty_object.json"
+    path.write_text(" {} \n", encoding="utf-8")
+    assert list(iter_nested_json_rows(str(path), 2)) == []
+
+@pytest.mark.parametrize("content", [b"", b"   \n", b'{"1\xe6\x9c\x88": {"G": [{"a": 1}'])
+def test_empty_or_truncated_file_is_an_error(tmp_path, content):
+    path = tmp_path / "broken.json"
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        list(iter_nested_json_rows(str(path), 2, chunk_size=4))
@@ -0,0 +1,59 @@
+import csv
+import json
+
+from infrastructure.json_to_csv import convert_json_file_to_csv, write_grouped_rows_to_csv
+
+# 後のグループ・行で初めて現れる列（"残業", "備考"）や、列の並びが異なる行を含める
+GROUPED = {
+    "G1": [
+        {"グループ": "G1", "指図書No": "A-1", "補足": "", "時間": 1.5, "merged_files": ["a.json", "b.json"]},
+        {"指図書No": "A-2", "グループ": "G1", "補足": "", "時間": 2.0, "残業": True, "merged_files": ["a.json"]},
+    ],
+    "空": [],
+    "G2": [
+        {"グループ": "G2", "指図書No": "B-1", "補足": "x", "時間": 0.25, "備考": "後から現れる列"},
+    ],
+}
+HEADERS = ["グループ", "指図書No", "補足", "時間", "merged_files", "残業", "備考"]
+
+def _read_csv(path) -> list:
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.reader(f))
+
+def _expected_rows() -> list:
+    return [
+        ["G1", "A-1", "", "1.5", "a.json, b.json", "", ""],
+        ["G1", "A-2", "", "2.0", "a.json", "True", ""],
+        ["G2", "B-1", "x", "0.25", "", "", "後から現れる列"],
+    ]
+
+def test_streaming_conversion_writes_union_of_all_row_keys(tmp_path):
+    json_path = tmp_path / "output_本間.json"
+    json_path.write_text(json.dumps(GROUPED, ensure_ascii=False, indent=4), encoding="utf-8")
+    csv_path = tmp_path / "output_本間.csv"
+
+    assert convert_json_file_to_csv(str(json_path), str(csv_path))
+    assert _read_csv(csv_path) == [HEADERS, *_expected_rows()]
+    # 元のデータの merged_files はリストのまま
+    assert GROUPED["G1"][0]["merged_files"] == ["a.json", "b.json"]
+
+def test_direct_and_streaming_conversion_write_identical_csv(tmp_path):
+    json_path = tmp_path / "output_本間.json"
+    json_path.write_text(json.dumps(GROUPED, ensure_ascii=False, indent=4), encoding="utf-8")
+    assert convert_json_file_to_csv(str(json_path), str(tmp_path / "streamed.csv"))
+    assert write_grouped_rows_to_csv(GROUPED, str(tmp_path / "direct.csv"))
+    assert (tmp_path / "streamed.csv").read_bytes() == (tmp_path / "direct.csv").read_bytes()
+    assert GROUPED["G1"][0]["merged_files"] == ["a.json", "b.json"]
+
+def test_no_rows_writes_nothing(tmp_path):
+    json_path = tmp_path / "output_本間.json"
+    json_path.write_text(json.dumps({"G1": []}), encoding="utf-8")
+    assert not convert_json_file_to_csv(str(json_path), str(tmp_path / "a.csv"))
+    assert not write_grouped_rows_to_csv({"G1": []}, str(tmp_path / "b.csv"))
+    assert not (tmp_path / "a.csv").exists()
+    assert not (tmp_path / "b.csv").exists()
+
+def test_unreadable_json_is_reported_as_failure(tmp_path):
+    json_path = tmp_path / "broken.json"
+    json_path.write_text('{"G1": [{"グループ": "G1",', encoding="utf-8")
+    assert not convert_json_file_to_csv(str(json_path), str(tmp_path / "broken.csv"))
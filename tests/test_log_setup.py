@@ -0,0 +1,57 @@
+import logging
+
+import pytest
+
+import main
+from infrastructure.process_pool import logging_process_pool
+
+def log_from_worker(message: str):
+    logging.getLogger("worker").error(message)
+    try:
+        raise ValueError("ワーカーの例外")
+    except ValueError:
+        logging.getLogger("worker").exception("WORKER-EXCEPTION")
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    """main.setup_logging でテスト用の error.log に出力し、終了時にルートロガーの設定を元に戻す"""
+    monkeypatch.setattr(main, "ERR_FOLDER", str(tmp_path))
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    path = tmp_path / "error.log"
+    try:
+        yield path
+    finally:
+        for handler in list(root.handlers):
+            if handler not in handlers:
+                root.removeHandler(handler)
+        root.setLevel(level)
+
+def _read(path) -> str:
+    return path.read_text(encoding="utf-8")
+
+def test_records_are_formatted_once(log_file):
+    listener = main.setup_logging()
+    logger = logging.getLogger("parent")
+    logger.error("PARENT-LOG")
+    try:
+        raise ValueError("親の例外")
+    except ValueError:
+        logger.exception("PARENT-EXCEPTION")
+    listener.stop()
+
+    content = _read(log_file)
+    assert "[ERROR] parent: PARENT-LOG\n" in content
+    assert "ERROR:parent" not in content
+    assert content.count("Traceback") == 1
+
+def test_worker_records_reach_the_log_file(log_file):
+    listener = main.setup_logging()
+    with logging_process_pool(2) as executor:
+        executor.submit(log_from_worker, "WORKER-LOG").result()
+    listener.stop()
+
+    content = _read(log_file)
+    assert content.count("[ERROR] worker: WORKER-LOG\n") == 1
+    assert content.count("[ERROR] worker: WORKER-EXCEPTION") == 1
+    assert "ワーカーの例外" in content
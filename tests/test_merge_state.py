@@ -0,0 +1,126 @@
+import random
+import sqlite3
+
+import pytest
+
+from benchmarks.generators import generate_extracted_data
+from infrastructure.merge_accumulator import UnitMergeAccumulator
+from infrastructure.merge_state import IncrementalMergeStore, source_key
+
+UNIT = "本間"
+
+def _batches(data: dict):
+    return [rows for groups in data.values() for rows in groups.values()]
+
+def _files(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [(f"/in/{i}_本間.xlsx", f"{i}_本間.json", generate_extracted_data(rows=200, distinct_orders=30, rng=rng))
+            for i in range(count)]
+
+def _bulk(files: list) -> dict:
+    """同じ順序のファイルを一括で合算した結果"""
+    accumulator = UnitMergeAccumulator()
+    for _, filename, data in files:
+        accumulator.add_file(filename, _batches(data))
+    return accumulator.to_grouped()
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "state" / "merge_state.sqlite3")
+
+@pytest.fixture
+def store(db_path):
+    store = IncrementalMergeStore(db_path)
+    yield store
+    store.close()
+
+def test_add_replace_remove_match_bulk_merge(store):
+    a, b, c = _files(3)
+    for source, filename, data in (a, b, c):
+        store.upsert_file(UNIT, source, filename, _batches(data), stamp=(1, 1))
+    assert store.to_grouped(UNIT) == _bulk([a, b, c])
+
+    # 置換しても並び順は登録順のまま
+    b2 = (b[0], b[1], generate_extracted_data(rows=150, distinct_orders=30, rng=random.Random(9)))
+    store.upsert_file(UNIT, b2[0], b2[1], _batches(b2[2]), stamp=(2, 2))
+    assert store.to_grouped(UNIT) == _bulk([a, b2, c])
+
+    assert store.remove_file(UNIT, a[0])
+    assert not store.remove_file(UNIT, a[0])
+    assert store.to_grouped(UNIT) == _bulk([b2, c])
+    assert store.sources(UNIT) == [b[0], c[0]]
+
+    # 削除後に追加したファイルは末尾に並ぶ
+    store.upsert_file(UNIT, a[0], a[1], _batches(a[2]))
+    assert store.to_grouped(UNIT) == _bulk([b2, c, a])
+
+def test_update_touches_only_the_keys_of_that_file(store):
+    a, b = _files(2)
+    store.upsert_file(UNIT, a[0], a[1], _batches(a[2]))
+    store.upsert_file(UNIT, "/in/x_本間.xlsx", "x_本間.json", [[
+        {"グループ": "X", "指図書No": "only-x", "補足": "", "時間": 1.0, "作業内容": "作業"}]])
+    store.save()
+    store.upsert_file(UNIT, b[0], b[1], _batches(b[2]))
+    # b の追加でキー only-x の寄与・合計は変わらない
+    assert store._conn.execute("SELECT total FROM merge_keys WHERE order_no = 'only-x'").fetchone() == (1.0,)
+    rows = {row["指図書No"]: row for row in store.to_grouped(UNIT)["X"]}
+    assert rows["only-x"]["merged_files"] == ["x_本間.json"]
+
+def test_same_source_under_another_name_is_not_counted_twice(store):
+    (source, filename, data), = _files(1)
+    store.upsert_file(UNIT, source, filename, _batches(data), stamp=(1, 1))
+    expected = _bulk([(source, "In_" + filename, data)])
+
+    assert store.is_unchanged(UNIT, source, (1, 1))
+    assert not store.is_unchanged(UNIT, source, (1, 2))
+    assert not store.is_unchanged("金子", source, (1, 1))
+    assert store.rename_file(UNIT, source, "In_" + filename)
+    assert not store.rename_file(UNIT, source, "In_" + filename)
+    assert store.to_grouped(UNIT) == expected
+    store.upsert_file(UNIT, source, "In_" + filename, _batches(data), stamp=(1, 2))
+    assert store.to_grouped(UNIT) == expected
+
+def test_source_key_normalizes_relative_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert source_key("In/c/本間.xlsx") == source_key(str(tmp_path / "In" / "x" / ".." / "c" / "本間.xlsx"))
+
+def test_store_persists_and_retains_selected_files(db_path):
+    a, b, c = _files(3)
+    with IncrementalMergeStore(db_path) as store:
+        for source, filename, data in (a, b):
+            store.upsert_file(UNIT, source, filename, _batches(data), stamp=(1, 1))
+        store.upsert_file("金子", c[0], c[1], _batches(c[2]), stamp=(1, 1))
+        store.save()
+
+    with IncrementalMergeStore(db_path) as reloaded:
+        assert reloaded.units() == ["本間", "金子"]
+        assert reloaded.is_unchanged(UNIT, a[0], (1, 1))
+        assert reloaded.to_output()[UNIT] == _bulk([a, b])
+        assert reloaded.retain({(UNIT, b[0])}) == 2
+        reloaded.save()
+
+    with IncrementalMergeStore(db_path) as reloaded:
+        assert reloaded.to_output() == {UNIT: _bulk([b])}
+        reloaded.reset()
+    with IncrementalMergeStore(db_path) as reloaded:
+        assert reloaded.is_empty()
+
+def test_unsaved_changes_are_discarded(db_path):
+    a, b = _files(2)
+    with IncrementalMergeStore(db_path) as store:
+        store.upsert_file(UNIT, a[0], a[1], _batches(a[2]))
+        store.save()
+        store.upsert_file(UNIT, b[0], b[1], _batches(b[2]))
+    with IncrementalMergeStore(db_path) as store:
+        assert store.to_output() == {UNIT: _bulk([a])}
+
+def test_store_discards_state_of_older_format(db_path):
+    (source, filename, data), = _files(1)
+    with IncrementalMergeStore(db_path) as store:
+        store.upsert_file(UNIT, source, filename, _batches(data))
+        store.save()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA user_version = 2")
+    conn.close()
+    with IncrementalMergeStore(db_path) as store:
+        assert store.is_empty()
@@ -0,0 +1,47 @@
+import codecs
+
+import pytest
+
+from infrastructure.mmap_reader import MmapTextReader, iter_mmap_lines
+
+TEXT = "作業内容: 組立て・検査 ✓ 😀 end"
+
+def _read_all(path, size: int) -> str:
+    parts = []
+    with MmapTextReader(str(path)) as reader:
+        while True:
+            part = reader.read(size)
+            if not part:
+                return "".join(parts)
+            parts.append(part)
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 64])
+def test_multibyte_characters_split_across_chunks(tmp_path, size):
+    path = tmp_path / "a.txt"
+    path.write_bytes(TEXT.encode("utf-8"))
+    assert _read_all(path, size) == TEXT
+
+@pytest.mark.parametrize("size", [1, 2, 4, 64])
+def test_utf8_bom_is_skipped(tmp_path, size):
+    path = tmp_path / "bom.txt"
+    path.write_bytes(codecs.BOM_UTF8 + TEXT.encode("utf-8"))
+    assert _read_all(path, size) == TEXT
+
+def test_empty_file_reads_nothing(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+    with MmapTextReader(str(path)) as reader:
+        assert reader.read(10) == ""
+    assert list(iter_mmap_lines(str(path))) == []
+
+def test_truncated_multibyte_character_at_end_is_an_error(tmp_path):
+    path = tmp_path / "broken.txt"
+    path.write_bytes("組立".encode("utf-8")[:-1])
+    with MmapTextReader(str(path)) as reader:
+        with pytest.raises(UnicodeDecodeError):
+            reader.read(64)
+
+def test_iter_mmap_lines_skips_blank_lines(tmp_path):
+    path = tmp_path / "lines.ndjson"
+    path.write_bytes("一\n\n  \n二\r\n三".encode("utf-8"))
+    assert list(iter_mmap_lines(str(path))) == ["一".encode("utf-8"), "二\r".encode("utf-8"), "三".encode("utf-8")]
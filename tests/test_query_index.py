@@ -0,0 +1,165 @@
+import copy
+import os
+import sqlite3
+
+import pytest
+
+from infrastructure import json_merger
+from infrastructure.query_index import QueryIndex, build_query_index
+
+FINAL_OUTPUT = {
+    "本間": {
+        "G001": [
+            {"グループ": "G001", "指図書No": "A-0001", "補足": "", "時間": 3.5, "merged_files": ["a_本間.json", "b_本間.json"]},
+            {"グループ": "G001", "指図書No": "A-0002", "補足": "残業", "時間": 1.0, "merged_files": ["a_本間.json"]},
+        ],
+    },
+    "金子": {
+        "G002": [
+            {"グループ": "G002", "指図書No": "A-0001", "補足": "", "時間": 2.0, "merged_files": ["c_金子.json"]},
+        ],
+    },
+}
+
+def test_build_and_query_round_trip(tmp_path):
+    db_path = build_query_index(FINAL_OUTPUT, db_path=str(tmp_path / "query_index.sqlite3"))
+    with QueryIndex(db_path) as index:
+        assert index.info()["rows"] == 3
+        assert sorted(index.units()) == ["本間", "金子"]
+        assert index.order_totals("A-0001")[0]["時間"] == 5.5
+        assert [row["指図書No"] for row in index.rows(unit="本間")] == ["A-0001", "A-0002"]
+        assert index.contributing_files(order_no="A-0002") == [{"ファイル": "a_本間.json", "行数": 1}]
+
+def test_write_unit_outputs_skips_index_when_disabled(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "Cache" / "query_index.sqlite3")
+    monkeypatch.setattr(json_merger, "OUT_FOLDER", str(tmp_path / "Out"))
+    monkeypatch.setattr(json_merger, "QUERY_INDEX_ENABLED", False)
+    monkeypatch.setattr("infrastructure.query_index.QUERY_INDEX_FILE", db_path)
+    paths = json_merger.write_unit_outputs(FINAL_OUTPUT, write_csv=False)
+    assert sorted(paths) == ["本間", "金子"]
+    assert not os.path.exists(db_path)
+
+def _snapshot(index: QueryIndex) -> dict:
+    """検索結果のうち、行 ID の振り方に依存しないもの"""
+    return {
+        "info": {key: value for key, value in index.info().items() if key != "built_at"},
+        "orders": index.order_totals(by_unit=True),
+        "groups": index.group_totals(),
+        "files": index.contributing_files(),
+        "unit_files": {unit: index.contributing_files(unit=unit) for unit in index.units()},
+        "rows": {unit: index.rows(unit=unit) for unit in index.units()},
+    }
+
+def _row_ids(db_path: str, unit: str) -> list:
+    with sqlite3.connect(db_path) as conn:
+        return [row_id for row_id, in conn.execute("SELECT id FROM merged_rows WHERE unit = ? ORDER BY id", (unit,))]
+
+def test_incremental_update_replaces_only_changed_units(tmp_path):
+    db_path = str(tmp_path / "query_index.sqlite3")
+    digests = {"本間": "h1", "金子": "k1"}
+    build_query_index(FINAL_OUTPUT, db_path=db_path, unit_digests=digests)
+    kaneko_ids = _row_ids(db_path, "金子")
+
+    updated = copy.deepcopy(FINAL_OUTPUT)
+    updated["本間"]["G001"][0]["時間"] = 4.5
+    updated["本間"]["G001"][1]["merged_files"] = ["d_本間.json"]
+    updated["本間"]["G003"] = [{"グループ": "G003", "指図書No": "B-0001", "補足": "", "時間": 1.5,
+                               "merged_files": ["d_本間.json"]}]
+    build_query_index(updated, db_path=db_path, unit_digests={"本間": "h2", "金子": "k1"})
+    # 内容が変わらない単位の行はそのまま残る
+    assert _row_ids(db_path, "金子") == kaneko_ids
+    with QueryIndex(db_path) as index:
+        incremental = _snapshot(index)
+        assert index.order_totals("A-0001")[0]["時間"] == 6.5
+        assert {"ファイル": "d_本間.json", "行数": 2} in index.contributing_files()
+
+    # なくなった単位は削除し、どのファイルの寄与もなくなったファイルも一覧から消える
+    del updated["金子"]
+    build_query_index(updated, db_path=db_path, unit_digests={"本間": "h2"})
+    with QueryIndex(db_path) as index:
+        assert index.units() == ["本間"]
+        assert "c_金子.json" not in [record["ファイル"] for record in index.contributing_files()]
+        assert index.order_totals("A-0001")[0]["時間"] == 4.5
+
+    rebuilt_path = str(tmp_path / "rebuilt.sqlite3")
+    updated["金子"] = FINAL_OUTPUT["金子"]
+    build_query_index(updated, db_path=db_path, unit_digests={"本間": "h2", "金子": "k1"})
+    build_query_index(updated, db_path=rebuilt_path)
+    # 増分で更新した結果は、すべて作り直した結果と同じ
+    with QueryIndex(db_path) as index, QueryIndex(rebuilt_path) as rebuilt:
+        assert _snapshot(index) == _snapshot(rebuilt) == incremental
+
+def test_open_reader_does_not_block_update(tmp_path):
+    db_path = build_query_index(FINAL_OUTPUT, db_path=str(tmp_path / "query_index.sqlite3"),
+                                unit_digests={"本間": "h1", "金子": "k1"})
+    updated = copy.deepcopy(FINAL_OUTPUT)
+    updated["金子"]["G002"][0]["時間"] = 7.0
+    with QueryIndex(db_path) as index:
+        assert index.order_totals("A-0001", unit="金子")[0]["時間"] == 2.0
+        build_query_index(updated, db_path=db_path, unit_digests={"本間": "h1", "金子": "k2"})
+        assert index.order_totals("A-0001", unit="金子")[0]["時間"] == 7.0
+        assert index.info()["stale"] is None
+
+def test_old_or_unreadable_index_is_rebuilt(tmp_path):
+    db_path = str(tmp_path / "query_index.sqlite3")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE merged_rows (unit TEXT)")
+        conn.execute("PRAGMA user_version = 1")
+    build_query_index(FINAL_OUTPUT, db_path=db_path, unit_digests={"本間": "h1", "金子": "k1"})
+    with QueryIndex(db_path) as index:
+        assert index.info()["rows"] == 3
+
+    os.remove(db_path)
+    with open(db_path, "wb") as f:
+        f.write(b"not a database" * 100)
+    build_query_index(FINAL_OUTPUT, db_path=db_path, unit_digests={"本間": "h1", "金子": "k1"})
+    with QueryIndex(db_path) as index:
+        assert index.info()["rows"] == 3
+
+def test_failed_update_keeps_previous_contents_and_reports_stale(tmp_path):
+    db_path = build_query_index(FINAL_OUTPUT, db_path=str(tmp_path / "query_index.sqlite3"))
+    broken = {"本間": {"G001": [{"指図書No": "A-0001", "時間": 1.0, "補足": object()}]}}
+    with pytest.raises(TypeError):
+        build_query_index(broken, db_path=db_path, unit_digests={"本間": "h2"})
+    with QueryIndex(db_path) as index:
+        info = index.info()
+        assert info["rows"] == 3 and info["stale"]
+    build_query_index(FINAL_OUTPUT, db_path=db_path)
+    with QueryIndex(db_path) as index:
+        assert index.info()["stale"] is None
+
+def test_write_unit_outputs_updates_only_changed_units(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "Cache" / "query_index.sqlite3")
+    monkeypatch.setattr(json_merger, "OUT_FOLDER", str(tmp_path / "Out"))
+    monkeypatch.setattr(json_merger, "QUERY_INDEX_ENABLED", True)
+    monkeypatch.setattr("infrastructure.query_index.QUERY_INDEX_FILE", db_path)
+    json_merger.write_unit_outputs(FINAL_OUTPUT, write_csv=False)
+    row_ids = {unit: _row_ids(db_path, unit) for unit in FINAL_OUTPUT}
+
+    updated = copy.deepcopy(FINAL_OUTPUT)
+    updated["本間"]["G001"][1]["時間"] = 2.0
+    json_merger.write_unit_outputs(updated, write_csv=False)
+    assert _row_ids(db_path, "金子") == row_ids["金子"]
+    assert _row_ids(db_path, "本間") != row_ids["本間"]
+    with QueryIndex(db_path) as index:
+        assert index.order_totals("A-0002")[0]["時間"] == 2.0
+
+def test_totals_apply_group_order_and_file_filters(tmp_path):
+    db_path = build_query_index(FINAL_OUTPUT, db_path=str(tmp_path / "query_index.sqlite3"))
+    with QueryIndex(db_path) as index:
+        assert index.order_totals("A-0001", group="G001") == [
+            {"指図書No": "A-0001", "単位": None, "時間": 3.5, "行数": 1}]
+        assert index.order_totals(filename="a_本間.json", by_unit=True) == [
+            {"指図書No": "A-0001", "単位": "本間", "時間": 3.5, "行数": 1},
+            {"指図書No": "A-0002", "単位": "本間", "時間": 1.0, "行数": 1},
+        ]
+        assert index.order_totals(group="G001", filename="c_金子.json") == []
+        assert index.group_totals(order_no="A-0002") == [{"単位": "本間", "グループ": "G001", "時間": 1.0, "行数": 1}]
+        assert index.group_totals(filename="c_金子.json") == [{"単位": "金子", "グループ": "G002", "時間": 2.0, "行数": 1}]
+        assert index.contributing_files(order_no="A-0001", filename="b_本間.json") == [
+            {"ファイル": "b_本間.json", "行数": 1}]
+        # 絞り込まない場合は集計済みの合計と同じ
+        assert index.group_totals() == [
+            {"単位": "本間", "グループ": "G001", "時間": 4.5, "行数": 2},
+            {"単位": "金子", "グループ": "G002", "時間": 2.0, "行数": 1},
+        ]
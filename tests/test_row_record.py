@@ -0,0 +1,91 @@
+import json
+import pickle
+
+import pytest
+
+from infrastructure.row_record import Record, RowSchema, json_default
+from infrastructure.xlsx_extractor import _iter_grouped_rows
+
+def test_schema_keys_and_positions():
+    schema = RowSchema(["指図書No", "グループ", "時間", "指図書No"])
+    # 重複したヘッダーは最初の位置に並び、値は最後の列を使う。「グループ」は Record.group から引く
+    assert schema.keys == ("指図書No", "グループ", "時間")
+    assert schema.index == {"指図書No": 3, "グループ": -1, "時間": 2}
+    assert schema.group_index == 1
+    assert schema.order_index == 3
+    # グループ変更用行の判定も、辞書にした場合と同じく重複したヘッダーは最後の列の値を見る
+    assert schema.other_indices == (3, 2, 3)
+
+def test_schema_without_group_column_appends_group_key():
+    schema = RowSchema(["指図書No", "時間"])
+    assert schema.keys == ("指図書No", "時間", "グループ")
+    # 「グループ」列がなければ先頭の列をグループの判定に使う
+    assert schema.group_index == 0
+    record = Record(schema, ("A-1", 1.5), "G1")
+    assert record.to_dict() == {"指図書No": "A-1", "時間": 1.5, "グループ": "G1"}
+
+def test_record_is_a_read_only_mapping():
+    record = Record(RowSchema(["グループ", "指図書No", "時間"]), ("", "A-1", 2.0), "G1")
+    assert record["グループ"] == "G1"
+    assert record["時間"] == 2.0
+    assert "指図書No" in record and "補足" not in record
+    assert list(record) == ["グループ", "指図書No", "時間"]
+    assert len(record) == 3
+    assert record == {"グループ": "G1", "指図書No": "A-1", "時間": 2.0}
+    with pytest.raises(KeyError):
+        record["補足"]
+    with pytest.raises(TypeError):
+        record["時間"] = 3.0
+
+    copied = record.copy()
+    copied["時間"] = 3.0
+    assert type(copied) is dict and record["時間"] == 2.0
+
+def test_group_column_is_carried_over_and_group_rows_are_dropped():
+    rows = [
+        ("グループ", "指図書No", "時間"),
+        (None, "A-0", 0.5),
+        ("G1", None, None),
+        (None, "A-1", 1.0),
+        (None, None, None),
+        ("  ", "A-2", 2.0),
+        ("G2", "B-1", 3.0),
+        (None, "B-2"),
+    ]
+    result = [(group, record.to_dict()) for group, record in _iter_grouped_rows(rows)]
+    assert result == [
+        ("UNDEFINED", {"グループ": "UNDEFINED", "指図書No": "A-0", "時間": 0.5}),
+        ("G1", {"グループ": "G1", "指図書No": "A-1", "時間": 1.0}),
+        ("G1", {"グループ": "G1", "指図書No": "A-2", "時間": 2.0}),
+        ("G2", {"グループ": "G2", "指図書No": "B-1", "時間": 3.0}),
+        # 末尾の空セルが省略された行はヘッダー幅まで補う
+        ("G2", {"グループ": "G2", "指図書No": "B-2", "時間": None}),
+    ]
+
+def test_pickle_round_trip_shares_the_schema():
+    schema = RowSchema(["グループ", "指図書No", "補足", "時間"])
+    records = [Record(schema, (None, f"A-{i}", "", i / 2), "G1") for i in range(3)]
+    restored = pickle.loads(pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL))
+    assert [record.to_dict() for record in restored] == [record.to_dict() for record in records]
+    assert all(type(record) is Record for record in restored)
+    assert restored[0].schema is restored[2].schema
+    assert restored[0].schema.index == schema.index
+
+def test_json_default_writes_records_as_objects():
+    record = Record(RowSchema(["グループ", "指図書No"]), ("", "A-1"), "G1")
+    assert json.loads(json.dumps({"G1": [record]}, default=json_default)) == {
+        "G1": [{"グループ": "G1", "指図書No": "A-1"}]}
+    with pytest.raises(TypeError):
+        json_default(object())
+
+def test_extract_xlsx_to_json_returns_plain_dicts(tmp_path):
+    pytest.importorskip("openpyxl")
+    from benchmarks.generators import generate_workbook
+    from infrastructure.xlsx_extractor import extract_xlsx_records, extract_xlsx_to_json
+
+    path = generate_workbook(str(tmp_path / "実績_金子.xlsx"), rows=20)
+    records = extract_xlsx_records(path)
+    data = extract_xlsx_to_json(path)
+    assert data == {sheet: {group: [row.to_dict() for row in rows] for group, rows in groups.items()}
+                    for sheet, groups in records.items()}
+    assert all(type(row) is dict for groups in data.values() for rows in groups.values() for row in rows)
@@ -0,0 +1,63 @@
+from presentation.virtual_list import VirtualListModel
+
+ITEMS = ["a/実績_金子.xlsx", "a/実績_本間.xlsx", "B/メモ_金子.TXT", "b/実績_金子_2.xlsx", "c/予定_本間.xlsx"]
+
+def _model(items=ITEMS) -> VirtualListModel:
+    model = VirtualListModel()
+    model.extend(items)
+    return model
+
+def _visible(model: VirtualListModel) -> list:
+    return [model.item_at(row) for row in range(len(model))]
+
+def test_filter_requires_every_term_ignoring_case():
+    model = _model()
+    model.set_filter("金子 XLSX")
+    assert _visible(model) == ["a/実績_金子.xlsx", "b/実績_金子_2.xlsx"]
+    assert model.total == len(ITEMS)
+    model.set_filter("  ")
+    assert _visible(model) == ITEMS
+
+def test_extend_while_filtered_only_adds_matching_items():
+    model = _model(ITEMS[:2])
+    model.set_filter("本間")
+    model.extend(ITEMS[2:])
+    assert _visible(model) == ["a/実績_本間.xlsx", "c/予定_本間.xlsx"]
+    model.set_filter("")
+    assert _visible(model) == ITEMS
+
+def test_selection_by_click_toggle_and_range():
+    model = _model()
+    model.select_only(1)
+    model.toggle(3)
+    assert model.selected_items() == [ITEMS[1], ITEMS[3]]
+    model.toggle(1)
+    assert model.selected_items() == [ITEMS[3]]
+    # 逆順の範囲指定・既存の選択への追加
+    model.select_range(2, 0)
+    assert model.selected_items() == ITEMS[:3]
+    model.select_range(4, 4, extend=True)
+    assert model.selected_items() == ITEMS[:3] + [ITEMS[4]]
+    assert [model.is_selected(row) for row in range(len(model))] == [True, True, True, False, True]
+
+def test_rows_refer_to_filtered_positions_and_filter_drops_hidden_selection():
+    model = _model()
+    model.set_filter("xlsx")
+    model.select_all()
+    assert model.selected_items() == [ITEMS[0], ITEMS[1], ITEMS[3], ITEMS[4]]
+    model.select_only(2)
+    assert model.selected_items() == [ITEMS[3]]
+
+    model.select_all()
+    model.set_filter("本間")
+    assert model.selected_items() == [ITEMS[1], ITEMS[4]]
+    # 絞り込みを解除しても、外れた行の選択は戻らない
+    model.set_filter("")
+    assert model.selected_items() == [ITEMS[1], ITEMS[4]]
+
+def test_clear():
+    model = _model()
+    model.select_all()
+    model.clear()
+    assert len(model) == model.total == 0
+    assert model.selected_items() == []
@@ -0,0 +1,676 @@
+import heapq
+import math
+import os
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, CancelledError, wait
+from dataclasses import dataclass, field
+from config import (
+    TMP_FOLDER, MAX_WORKERS, EXTRACTION_CACHE_ENABLED, EXTRACTION_CACHE_FILE, WRITE_TMP_JSON, INCREMENTAL_MERGE,
+    SHEET_SPLIT_ENABLED, SHEET_SPLIT_MIN_BYTES,
+)
+from infrastructure.extraction_cache import ExtractionCache
+from infrastructure.bulk_transfer import find_flatten_collisions
+from infrastructure.file_copier import copy_xlsx_file, flatten_relative_path
+from infrastructure.instrumentation import StageTimer
+from infrastructure.json_merger import find_unit, merge_rows_by_unit, merge_rows_incrementally, write_unit_outputs
+from infrastructure.merge_state import IncrementalMergeStore, source_key
+from infrastructure.process_pool import logging_process_pool
+from infrastructure.intermediate_format import get_format
+from infrastructure.utils import ensure_folder_exists
+from infrastructure.xlsx_extractor import extract_xlsx_records, inspect_sheets
+
+logger = logging.getLogger(__name__)
+
+CANCELLED_MESSAGE = "キャンセルされました"
+
+class PipelineCancelled(Exception):
+    """中止要求によりパイプラインを途中で打ち切ったことを表す例外"""
+
+@dataclass
+class FileResult:
+    """1 ファイル分の処理結果。error が None でなければ失敗を表す。"""
+    file: str
+    json_path: str = None
+    error: str = None
+    cache_hit: bool = False
+    unchanged: bool = False
+    timings: dict = None  # ワーカーで計測した 工程名 → 秒数
+    rows: int = 0
+    bytes: int = 0
+
+    def apply_stats(self, stats: dict):
+        """ワーカーから返された計測値 (timings / rows / bytes) を取り込む"""
+        self.timings = stats["timings"]
+        self.rows = stats["rows"]
+        self.bytes = stats["bytes"]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+@dataclass
+class PipelineResult:
+    """バッチ全体の処理結果。results は入力ファイルと同じ順序。"""
+    results: list = field(default_factory=list)
+    cache_stats: dict = None
+
+    @property
+    def succeeded(self) -> list:
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> list:
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def cache_hits(self) -> int:
+        return sum(1 for r in self.results if r.cache_hit)
+
+    @property
+    def unchanged(self) -> list:
+        return [r for r in self.results if r.unchanged]
+
+# ワーカープロセスごとに 1 つだけ開く抽出キャッシュ
+_worker_caches = {}
+
+def _get_worker_cache(db_path: str) -> ExtractionCache:
+    if db_path not in _worker_caches:
+        _worker_caches[db_path] = ExtractionCache(db_path)
+    return _worker_caches[db_path]
+
+def tmp_output_filename(in_file_path: str, base_folder: str, intermediate_format: str = None) -> str:
+    """
+    XLSX ファイルに対応する TMP 中間ファイルのファイル名。
+    拡張子は中間形式によって決まる（未指定時は config.INTERMEDIATE_FORMAT）。
+    合算結果の merged_files には、中間形式によらず JSON 形式のファイル名が記録される。
+    """
+    base_name, _ = os.path.splitext(flatten_relative_path(in_file_path, base_folder))
+    return base_name + get_format(intermediate_format).extension
+
+def _extract_with_cache(in_file_path: str, base_folder: str, cache_path: str = None, timer: StageTimer = None) -> tuple:
+    """コピー → 抽出 を行い (抽出結果, キャッシュヒット) を返す。キャッシュにあればどちらも省略する。"""
+    timer = timer or StageTimer()
+    cache = _get_worker_cache(cache_path) if cache_path else None
+    if cache is not None:
+        with timer.stage("cache"):
+            data = cache.get(in_file_path)
+        if data is not None:
+            return data, True
+    with timer.stage("copy"):
+        tmp_file_path = copy_xlsx_file(in_file_path, base_folder)
+    with timer.stage("extract"):
+        data = extract_xlsx_records(tmp_file_path)
+    if cache is not None:
+        with timer.stage("cache"):
+            cache.put(in_file_path, data)
+    return data, False
+
+def _worker_stats(in_file_path: str, data: dict, timer: StageTimer) -> dict:
+    """ワーカーからメインプロセスへ返す計測値"""
+    try:
+        size = os.path.getsize(in_file_path)
+    except OSError:
+        size = 0
+    rows = sum(len(rows) for groups in data.values() for rows in groups.values())
+    return {"timings": timer.timings, "rows": rows, "bytes": size}
+
+def process_xlsx_file(in_file_path: str, base_folder: str, cache_path: str = None,
+                      intermediate_format: str = None) -> tuple:
+    """
+    1 つの XLSX ファイルについて、コピー → 抽出 → 中間ファイル書き出しを行い、
+    (中間ファイルのパス, キャッシュヒット, 計測値) を返す。
+    cache_path が指定されていれば抽出キャッシュを参照し、未変更のファイルはコピーと抽出を省略する。
+    ワーカープロセスから呼び出されるため、モジュールのトップレベルに定義している。
+    """
+    timer = StageTimer()
+    data, cache_hit = _extract_with_cache(in_file_path, base_folder, cache_path, timer)
+    fmt = get_format(intermediate_format)
+    with timer.stage("write_tmp"):
+        json_path = fmt.write(data, tmp_output_filename(in_file_path, base_folder, fmt.name))
+    return json_path, cache_hit, _worker_stats(in_file_path, data, timer)
+
+def extract_xlsx_for_merge(in_file_path: str, base_folder: str, cache_path: str = None,
+                           write_tmp_json: bool = False, intermediate_format: str = None) -> tuple:
+    """
+    直接合算モード用のワーカー処理。コピー → 抽出 を行い、(抽出結果, キャッシュヒット, 中間ファイルのパス, 計測値) を返す。
+    TMP の中間ファイルは write_tmp_json が True の場合のみ（デバッグ用に）書き出し、それ以外はパスは None。
+    """
+    timer = StageTimer()
+    data, cache_hit = _extract_with_cache(in_file_path, base_folder, cache_path, timer)
+    json_path = None
+    if write_tmp_json:
+        fmt = get_format(intermediate_format)
+        with timer.stage("write_tmp"):
+            json_path = fmt.write(data, tmp_output_filename(in_file_path, base_folder, fmt.name))
+    return data, cache_hit, json_path, _worker_stats(in_file_path, data, timer)
+
+def _partition_sheets(sheet_sizes: list, parts: int) -> list:
+    """
+    (シート名, サイズ) のリストを、サイズの合計がなるべく均等な parts 個に分ける（大きいシートから順に
+    最も軽い組へ入れる）。戻り値は (シート名のリスト（元の順）, サイズの合計) のリスト。
+    """
+    bins = [[0, []] for _ in range(parts)]
+    for index, (_, size) in sorted(enumerate(sheet_sizes), key=lambda item: -item[1][1]):
+        lightest = min(bins, key=lambda b: b[0])
+        lightest[0] += size
+        lightest[1].append(index)
+    return [([sheet_sizes[i][0] for i in sorted(indices)], total) for total, indices in bins if indices]
+
+def prepare_sheet_split(in_file_path: str, base_folder: str, cache_path: str = None, max_parts: int = 2) -> tuple:
+    """
+    シート単位の並列抽出の下準備を行うワーカー処理。
+    キャッシュ参照 → TMP へのコピー → シートの一覧と範囲 (dimension) の確認 を行い、
+    (キャッシュの抽出結果, シート名のリスト, シートの組のリスト, コピー先のパス, 工程名 → 秒数) を返す。
+    キャッシュにあればコピーせずに抽出結果だけを返す（それ以外は None）。
+    シートの組は最大 max_parts 個の _partition_sheets の戻り値で、分割しない場合（シートが 1 つしかない・
+    シートの範囲が記録されていない・シートの一覧を読めない）は空のリスト。
+    """
+    timer = StageTimer()
+    cache = _get_worker_cache(cache_path) if cache_path else None
+    if cache is not None:
+        with timer.stage("cache"):
+            data = cache.get(in_file_path)
+        if data is not None:
+            return data, list(data), [], None, timer.timings
+    with timer.stage("copy"):
+        tmp_file_path = copy_xlsx_file(in_file_path, base_folder)
+    with timer.stage("extract"):
+        try:
+            sheet_sizes, has_dimensions = inspect_sheets(tmp_file_path)
+        except Exception as e:
+            logger.warning("シートの一覧を取得できないため分割せずに抽出します (%s): %s", in_file_path, e)
+            return None, None, [], tmp_file_path, timer.timings
+    sheet_names = [name for name, _ in sheet_sizes]
+    if len(sheet_sizes) > 1 and not has_dimensions:
+        logger.info("シートの範囲 (dimension) が記録されていないため分割せずに抽出します: %s", in_file_path)
+        return None, sheet_names, [], tmp_file_path, timer.timings
+    parts = min(len(sheet_sizes), max_parts)
+    partitions = _partition_sheets(sheet_sizes, parts) if parts >= 2 else []
+    return None, sheet_names, partitions, tmp_file_path, timer.timings
+
+def extract_xlsx_sheets(tmp_file_path: str, sheet_names: list = None) -> tuple:
+    """
+    シート単位の並列抽出用のワーカー処理。TMP にコピー済みのブックを開き、
+    sheet_names のシートだけを（読み取り専用で）抽出して (抽出結果, 工程名 → 秒数) を返す。
+    sheet_names が None の場合はブック全体を抽出する（分割しないことにしたブック用）。
+    """
+    timer = StageTimer()
+    with timer.stage("extract"):
+        data = extract_xlsx_records(tmp_file_path, streaming=True if sheet_names is not None else None,
+                                    sheet_names=sheet_names)
+    return data, timer.timings
+
+def _add_timings(timer: StageTimer, timings: dict):
+    for name, seconds in timings.items():
+        timer.timings[name] = timer.timings.get(name, 0.0) + seconds
+
+class _FileJob:
+    """1 ファイルを 1 つのワーカーで処理するジョブ。result() はワーカーの戻り値を返す。"""
+    def __init__(self):
+        self.future = None
+        self.cancelled = False
+
+    def done(self) -> bool:
+        if self.future is not None:
+            return self.future.done()
+        return self.cancelled
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def result(self):
+        if self.future is None:
+            raise CancelledError()
+        return self.future.result()
+
+class _SheetSplitJob:
+    """
+    1 つのブックのシートを複数のワーカーに分けて抽出するジョブ。
+
+    まずワーカーで prepare_sheet_split（キャッシュ参照・コピー・シートの確認）を行い、その完了時に expand() で
+    シートの組ごとの extract_xlsx_sheets を投入する。分割しないことになったブックはコピー済みのブック全体を
+    1 つのワーカーで抽出し、キャッシュにあったブックはその内容を使う。
+    result() はすべての部分の完了後に元のシート順に組み立て、finish(抽出結果, キャッシュヒット, StageTimer) の
+    戻り値（そのパイプラインのワーカーと同じ形）を返す。
+    """
+    def __init__(self, in_file_path: str, size: int, finish):
+        self.in_file_path = in_file_path
+        self.size = size
+        self.finish = finish
+        self.timer = StageTimer()
+        self.prepare = None
+        self.futures = []  # シートの組ごとの Future（投入前は None）
+        self.sheet_names = None
+        self.data = None
+        self.cache_hit = False
+        self.expanded = False
+        self.cancelled = False
+        self._result = None
+
+    def done(self) -> bool:
+        if self.cancelled:
+            return all(future is None or future.done() for future in [self.prepare, *self.futures])
+        return self.expanded and all(future is not None and future.done() for future in self.futures)
+
+    def cancel(self):
+        self.cancelled = True
+        for future in [self.prepare, *self.futures]:
+            if future is not None:
+                future.cancel()
+
+    def expand(self, scheduler: "_JobScheduler"):
+        """prepare_sheet_split の完了時に呼ばれ、シートの組（分割しない場合はブック全体）の抽出を投入する"""
+        self.expanded = True
+        if self.cancelled or self.prepare.cancelled() or self.prepare.exception() is not None:
+            return
+        self.data, self.sheet_names, partitions, tmp_file_path, timings = self.prepare.result()
+        _add_timings(self.timer, timings)
+        if self.data is not None:
+            self.cache_hit = True
+            return
+        if partitions:
+            logger.info("シートを %d 組に分けて並列に抽出します: %s", len(partitions), self.in_file_path)
+        else:
+            self.sheet_names = None
+            partitions = [(None, 1)]
+        total_bytes = sum(part_bytes for _, part_bytes in partitions) or 1
+        self.futures = [None] * len(partitions)
+        for index, (sheet_names, part_bytes) in enumerate(partitions):
+            def submit_part(executor, index=index, sheet_names=sheet_names):
+                self.futures[index] = executor.submit(extract_xlsx_sheets, tmp_file_path, sheet_names)
+                return self.futures[index]
+            scheduler.push(self.size * part_bytes / total_bytes, submit_part)
+
+    def result(self):
+        if self._result is None:
+            if self.prepare is None:
+                raise CancelledError()
+            # 下準備での例外（コピーの失敗など）はここで送出する
+            self.prepare.result()
+            if not self.cache_hit:
+                if not self.futures or None in self.futures:
+                    raise CancelledError()
+                parts = {}
+                for future in self.futures:
+                    data, timings = future.result()
+                    parts.update(data)
+                    _add_timings(self.timer, timings)
+                if self.sheet_names is None:
+                    self.data = parts
+                else:
+                    self.data = {name: parts[name] for name in self.sheet_names}
+            self._result = self.finish(self.data, self.cache_hit, self.timer)
+            self.data = None
+        return self._result
+
+class _JobScheduler:
+    """
+    ジョブのタスクをプロセスプールへ投入し、その完了を待つ。
+
+    投入待ちのタスクは見積もった大きさの順（大きい順）に並べ、投入済みで未完了のタスクがワーカー数の 2 倍を
+    超えないように少しずつ投入する。大きなブックの下準備の完了後に加わるシートの組も、先に並んでいる小さい
+    ファイルより前に投入され、最後に大きなブックだけが残らないようにする。
+    タスクの完了時の処理（シートの組の投入）は、完了を待っているメインプロセスで行う。
+    cancel_event (threading.Event) がセットされると、未着手のタスクをすべて取り消す。
+    """
+    def __init__(self, executor, workers: int, cancel_event=None):
+        self.executor = executor
+        self.limit = max(workers, 1) * 2
+        self.cancel_event = cancel_event
+        self.jobs = []
+        self._queue = []    # (-見積もった大きさ, 追加順, 投入処理, 完了時の処理)
+        self._running = {}  # Future → 完了時の処理
+        self._count = 0
+
+    def push(self, size: float, submit, on_done=None):
+        """submit(executor) で Future を返すタスクを投入待ちに加える"""
+        heapq.heappush(self._queue, (-size, self._count, submit, on_done))
+        self._count += 1
+
+    def cancel(self):
+        self._queue.clear()
+        for job in self.jobs:
+            job.cancel()
+
+    def _fill(self):
+        while self._queue and len(self._running) < self.limit:
+            _, _, submit, on_done = heapq.heappop(self._queue)
+            self._running[submit(self.executor)] = on_done
+
+    def _step(self) -> bool:
+        """投入済みのタスクが完了するまで（中止要求があればその確認まで）待つ。待つタスクがなければ False を返す"""
+        self._fill()
+        if not self._running:
+            return False
+        timeout = None if self.cancel_event is None else 0.5
+        done, _ = wait(list(self._running), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            on_done = self._running.pop(future)
+            if on_done is not None:
+                on_done(self)
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.cancel()
+        self._fill()
+        return True
+
+    def wait_for(self, job):
+        """job が完了するまで待つ（その間に完了した他のタスクの処理も行う）"""
+        while not job.done() and self._step():
+            pass
+
+    def iter_completed(self):
+        """ジョブを完了した順に返す（分割したブックは、すべての部分が完了した時点で返す）"""
+        remaining = list(self.jobs)
+        while remaining:
+            pending = []
+            for job in remaining:
+                if job.done():
+                    yield job
+                else:
+                    pending.append(job)
+            remaining = pending
+            if remaining and not self._step():
+                break
+        yield from remaining
+
+def _schedule_jobs(executor, in_file_paths: list, base_folder: str, max_workers: int, submit_file, finish,
+                   cache_path: str = None, split_sheets: bool = None, cancel_event=None) -> _JobScheduler:
+    """
+    in_file_paths の各ファイルのジョブを作成して投入待ちにした _JobScheduler を返す。
+    ジョブは scheduler.jobs に in_file_paths と同じ順で入る。
+
+    SHEET_SPLIT_MIN_BYTES 以上のブックは、ワーカーで prepare_sheet_split（TMP へのコピーとシートの確認）を行ってから
+    シートをおおよそ SHEET_SPLIT_MIN_BYTES ごと（最大でワーカー数）に分け、extract_xlsx_sheets で並列に抽出する。
+    コピーとシートの確認もワーカーで行うため、メインプロセスは大きなブックの読み書きを待たない。
+    それ以外のファイルは submit_file(in_file_path) でパイプラインのワーカーへそのまま渡す。
+    finish(in_file_path, 抽出結果, キャッシュヒット, StageTimer) は分割対象のブックの組み立て後にメインプロセスで呼ばれる。
+    """
+    if split_sheets is None:
+        split_sheets = SHEET_SPLIT_ENABLED
+    workers = max_workers or os.cpu_count() or 1
+    scheduler = _JobScheduler(executor, workers, cancel_event)
+    for in_file_path in in_file_paths:
+        try:
+            size = os.path.getsize(in_file_path)
+        except OSError:
+            size = 0
+        if split_sheets and workers > 1 and size >= SHEET_SPLIT_MIN_BYTES:
+            job = _SheetSplitJob(in_file_path, size, lambda d, hit, t, p=in_file_path: finish(p, d, hit, t))
+            max_parts = min(workers, math.ceil(size / SHEET_SPLIT_MIN_BYTES))
+
+            def submit_prepare(executor, job=job, max_parts=max_parts):
+                job.prepare = executor.submit(prepare_sheet_split, job.in_file_path, base_folder, cache_path,
+                                              max_parts)
+                return job.prepare
+            scheduler.push(size, submit_prepare, job.expand)
+        else:
+            job = _FileJob()
+
+            def submit_whole(executor, job=job, in_file_path=in_file_path):
+                job.future = submit_file(in_file_path)
+                return job.future
+            scheduler.push(size, submit_whole)
+        scheduler.jobs.append(job)
+    return scheduler
+
+def _finish_split_extraction(in_file_path: str, base_folder: str, data: dict, cache_hit: bool, timer: StageTimer,
+                             cache: ExtractionCache, write_format: str = None, write_tmp: bool = True) -> tuple:
+    """シート単位で抽出したブックの後処理（キャッシュ登録・中間ファイル書き出し）。(中間ファイルのパス, 計測値) を返す。"""
+    if cache is not None and not cache_hit:
+        with timer.stage("cache"):
+            cache.put(in_file_path, data)
+    json_path = None
+    if write_tmp:
+        fmt = get_format(write_format)
+        with timer.stage("write_tmp"):
+            json_path = fmt.write(data, tmp_output_filename(in_file_path, base_folder, fmt.name))
+    return json_path, _worker_stats(in_file_path, data, timer)
+
+def _flatten_collision_errors(xlsx_files: list, base_folder: str) -> dict:
+    """
+    TMP のファイル名 (flatten_relative_path) が他のファイルと重複するファイル → エラーメッセージ の辞書を返す。
+    重複した組のうち先頭のファイルだけを処理し、残りは互いの中間ファイル・合算結果を上書きしないようエラーにする。
+    """
+    errors = {}
+    for name, group in find_flatten_collisions(xlsx_files, base_folder).items():
+        logger.error("TMP のファイル名 %s が重複しています: %s", name, ", ".join(group))
+        for file in group[1:]:
+            errors[file] = f"TMP のファイル名 {name} が {group[0]} と重複しています"
+    return errors
+
+def run_extraction_pipeline(files: list, base_folder: str, max_workers: int = None,
+                            progress_callback=None, cancel_event=None, use_cache: bool = None,
+                            intermediate_format: str = None, metrics=None) -> PipelineResult:
+    """
+    base_folder からの相対パスのリスト files のうち XLSX ファイルを、
+    プロセスプールで並列に コピー → 抽出 → 中間ファイル書き出し する（形式は intermediate_format、
+    未指定時は config.INTERMEDIATE_FORMAT）。
+
+    1 ファイルの失敗はそのファイルの FileResult.error に記録し、バッチ全体は中断しない。
+    max_workers が未指定の場合は config.MAX_WORKERS を使用する。
+    progress_callback(done, total) は 1 ファイル完了するごとに呼ばれる。
+    cancel_event (threading.Event) がセットされると未着手のファイルを取り消し、
+    それらは error="キャンセルされました" として返す。
+    use_cache が True の場合は抽出キャッシュを利用する（未指定時は config.EXTRACTION_CACHE_ENABLED）。
+    大きなブックはシート単位に分けて複数のワーカーで抽出する（_schedule_jobs を参照）。
+    metrics (RunMetrics) を渡すと、ワーカーで計測した工程ごとの時間・行数・件数を記録する。
+    """
+    if max_workers is None:
+        max_workers = MAX_WORKERS
+    if use_cache is None:
+        use_cache = EXTRACTION_CACHE_ENABLED
+    cache_path = EXTRACTION_CACHE_FILE if use_cache else None
+    xlsx_files = [f for f in files if f.lower().endswith(".xlsx")]
+    results = {f: FileResult(f) for f in xlsx_files}
+    if not xlsx_files:
+        return PipelineResult()
+    for file, error in _flatten_collision_errors(xlsx_files, base_folder).items():
+        results[file].error = error
+
+    total = len(xlsx_files)
+    done = sum(1 for r in results.values() if not r.ok)
+    # TMP・キャッシュのフォルダはワーカーへ渡す前にメインプロセスで作成しておく
+    ensure_folder_exists(TMP_FOLDER)
+    cache = ExtractionCache(cache_path) if cache_path else None
+
+    def finish(in_file_path, data, cache_hit, timer):
+        json_path, stats = _finish_split_extraction(in_file_path, base_folder, data, cache_hit, timer, cache,
+                                                    intermediate_format)
+        return json_path, cache_hit, stats
+
+    try:
+        with logging_process_pool(max_workers) as executor:
+            targets = [f for f in xlsx_files if results[f].ok]
+            scheduler = _schedule_jobs(
+                executor, [os.path.join(base_folder, f) for f in targets], base_folder, max_workers,
+                lambda path: executor.submit(process_xlsx_file, path, base_folder, cache_path, intermediate_format),
+                finish, cache_path, cancel_event=cancel_event,
+            )
+            files_by_job = {id(job): f for job, f in zip(scheduler.jobs, targets)}
+            for job in scheduler.iter_completed():
+                file = files_by_job[id(job)]
+                try:
+                    results[file].json_path, results[file].cache_hit, stats = job.result()
+                    results[file].apply_stats(stats)
+                except CancelledError:
+                    results[file].error = CANCELLED_MESSAGE
+                except Exception as e:
+                    logger.error("ファイル処理中にエラー (%s): %s", file, e)
+                    results[file].error = str(e) or type(e).__name__
+                done += 1
+                if progress_callback:
+                    progress_callback(done, total)
+                if cancel_event is not None and cancel_event.is_set():
+                    scheduler.cancel()
+    finally:
+        if cache is not None:
+            cache.close()
+    pipeline_result = PipelineResult([results[f] for f in xlsx_files])
+    if use_cache:
+        pipeline_result.cache_stats = _collect_cache_stats(cache_path, pipeline_result)
+    if metrics is not None:
+        metrics.record_pipeline_result(pipeline_result)
+    return pipeline_result
+
+def _collect_cache_stats(cache_path: str, pipeline_result: PipelineResult) -> dict:
+    cache = ExtractionCache(cache_path)
+    try:
+        cache.evict()
+        stats = cache.stats()
+    finally:
+        cache.close()
+    stats["hits"] = pipeline_result.cache_hits
+    stats["misses"] = len(pipeline_result.succeeded) - len(pipeline_result.unchanged) - pipeline_result.cache_hits
+    return stats
+
+def _source_stamp(in_file_path: str) -> tuple:
+    st = os.stat(in_file_path)
+    return st.st_size, st.st_mtime_ns
+
+def run_direct_merge_pipeline(files: list, base_folder: str, keywords: list, max_workers: int = None,
+                              progress_callback=None, cancel_event=None, use_cache: bool = None,
+                              write_tmp_json: bool = None, incremental: bool = None,
+                              intermediate_format: str = None, metrics=None) -> tuple:
+    """
+    TMP JSON を経由せずに、抽出結果をそのまま単位ごとの合算へ流し込むパイプライン。
+
+    各 XLSX ファイルはプロセスプールで コピー → 抽出 され、結果は files の順に
+    合算アキュムレータへ渡される（merged_files には JSON 形式の中間ファイル名が入る。TMP に書き出さないため
+    intermediate_format には左右されず、TMP モードの既定の形式と同じ名前になる）。
+    大きなブックはシート単位に分けて複数のワーカーで抽出し、元のシート順に組み立ててから合算する。
+    TMP JSON は write_tmp_json が True の場合のみデバッグ用に書き出す（未指定時は config.WRITE_TMP_JSON）。
+    incremental が True の場合（未指定時は config.INCREMENTAL_MERGE）は永続化した合算状態を更新し、
+    サイズ・更新時刻が前回と同じファイルは抽出自体を省略する。ファイルは元ファイルの絶対パス (source_key) で識別し、
+    今回の files に含まれない・処理に失敗したファイルの寄与は状態から取り除くため、出力は files の寄与だけになる。
+    中止要求があった場合は PipelineCancelled を送出し、合算結果は書き出さない。
+    metrics (RunMetrics) を渡すと、ワーカーの工程ごとの時間に加えて、抽出結果の待ち時間 (extract_wait) と
+    それを除いた合算・出力の時間 (merge) を記録する。
+    戻り値は (PipelineResult, unit → 出力ファイルパス の辞書)。
+    """
+    if max_workers is None:
+        max_workers = MAX_WORKERS
+    if use_cache is None:
+        use_cache = EXTRACTION_CACHE_ENABLED
+    if write_tmp_json is None:
+        write_tmp_json = WRITE_TMP_JSON
+    if incremental is None:
+        incremental = INCREMENTAL_MERGE
+    cache_path = EXTRACTION_CACHE_FILE if use_cache else None
+    xlsx_files = [f for f in files if f.lower().endswith(".xlsx")]
+    if not xlsx_files:
+        return PipelineResult(), {}
+    results = [FileResult(f) for f in xlsx_files]
+    store = IncrementalMergeStore() if incremental else None
+    collisions = _flatten_collision_errors(xlsx_files, base_folder)
+
+    # 増分モードでは、前回から変化していないファイルをワーカーへ渡さない
+    filenames = {}  # result.file -> merged_files に記録する名前
+    sources = {}    # result.file -> 元ファイルのキー
+    stamps = {}
+    pending = []
+    for result in results:
+        if result.file in collisions:
+            result.error = collisions[result.file]
+            continue
+        in_file_path = os.path.join(base_folder, result.file)
+        filenames[result.file] = tmp_output_filename(in_file_path, base_folder, "json")
+        if store is not None:
+            sources[result.file] = source_key(in_file_path)
+            try:
+                stamps[result.file] = _source_stamp(in_file_path)
+            except OSError:
+                stamps[result.file] = None
+            unit = find_unit(filenames[result.file], keywords)
+            if unit and store.is_unchanged(unit, sources[result.file], stamps[result.file]):
+                result.unchanged = True
+                continue
+        pending.append(result)
+
+    extract_wait = [0.0]  # iter_sources 内で抽出結果を待った時間の合計
+
+    def finish(in_file_path, data, cache_hit, timer):
+        json_path, stats = _finish_split_extraction(in_file_path, base_folder, data, cache_hit, timer, cache,
+                                                    intermediate_format, write_tmp_json)
+        return data, cache_hit, json_path, stats
+
+    def iter_sources(executor):
+        # 変更のないファイルは、寄与をそのまま使うことだけを伝える (row_batches = None)
+        for result in results:
+            if result.unchanged:
+                yield sources[result.file], filenames[result.file], None, stamps[result.file]
+        scheduler = _schedule_jobs(
+            executor, [os.path.join(base_folder, r.file) for r in pending], base_folder, max_workers,
+            lambda path: executor.submit(extract_xlsx_for_merge, path, base_folder, cache_path, write_tmp_json,
+                                         intermediate_format),
+            finish, cache_path, cancel_event=cancel_event,
+        )
+        skipped = len(results) - len(pending)
+        # files の順に結果を受け取り、合算の順序を決定的にする
+        for done, (job, result) in enumerate(zip(scheduler.jobs, pending), start=skipped + 1):
+            if cancel_event is not None and cancel_event.is_set():
+                scheduler.cancel()
+                raise PipelineCancelled()
+            try:
+                wait_start = time.perf_counter()
+                try:
+                    scheduler.wait_for(job)
+                    data, result.cache_hit, result.json_path, stats = job.result()
+                finally:
+                    extract_wait[0] += time.perf_counter() - wait_start
+                result.apply_stats(stats)
+            except CancelledError:
+                result.error = CANCELLED_MESSAGE
+                raise PipelineCancelled()
+            except Exception as e:
+                logger.error("ファイル処理中にエラー (%s): %s", result.file, e)
+                result.error = str(e) or type(e).__name__
+                data = None
+            if progress_callback:
+                progress_callback(done, len(results))
+            if data is None:
+                continue
+            row_batches = (rows for groups in data.values() for rows in groups.values())
+            yield sources.get(result.file), filenames[result.file], row_batches, stamps.get(result.file)
+
+    # TMP・キャッシュのフォルダはワーカーへ渡す前にメインプロセスで作成しておく
+    ensure_folder_exists(TMP_FOLDER)
+    cache = ExtractionCache(cache_path) if cache_path else None
+    try:
+        with logging_process_pool(max_workers) as executor:
+            merge_start = time.perf_counter()
+            if store is not None:
+                output_paths = merge_rows_incrementally(iter_sources(executor), keywords, store)
+            else:
+                output_paths = merge_rows_by_unit(((f, b) for _, f, b, _ in iter_sources(executor)), keywords)
+            merge_elapsed = time.perf_counter() - merge_start
+    finally:
+        if cache is not None:
+            cache.close()
+        if store is not None:
+            store.close()
+    pipeline_result = PipelineResult(results)
+    if use_cache:
+        pipeline_result.cache_stats = _collect_cache_stats(cache_path, pipeline_result)
+    if metrics is not None:
+        metrics.add_time("extract_wait", extract_wait[0])
+        metrics.add_time("merge", merge_elapsed - extract_wait[0])
+        metrics.record_pipeline_result(pipeline_result)
+    return pipeline_result, output_paths
+
+def write_incremental_outputs() -> dict:
+    """永続化した合算状態から、再集計せずに output_{unit}.json を書き出す"""
+    with IncrementalMergeStore() as store:
+        return write_unit_outputs(store.to_output())
+
+def has_incremental_state() -> bool:
+    """永続化した合算状態に、書き出せる単位（寄与ファイルのある単位）があるかどうか"""
+    with IncrementalMergeStore() as store:
+        return not store.is_empty()
+
+def reset_incremental_state():
+    """永続化した合算状態をすべて削除する"""
+    with IncrementalMergeStore() as store:
+        store.reset()
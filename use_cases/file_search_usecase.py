@@ -1,7 +1,42 @@
-from domain.file_searcher import search_files
+from config import DIRECTORY_INDEX_ENABLED
+from domain.file_searcher import iter_search_files
 
-def get_matched_files(folder_path: str, keywords: list) -> list:
+def _iter_indexed_files(folder_path: str, keywords: list, extensions=None, cancel_event=None):
+    from infrastructure.directory_index import DirectoryIndex
+
+    index = DirectoryIndex()
+    try:
+        yield from index.iter_files(folder_path, keywords, extensions=extensions, cancel_event=cancel_event)
+    finally:
+        index.close()
+
+def get_matched_files(folder_path: str, keywords: list, extensions=None, use_index: bool = None) -> list:
     """
     指定フォルダから、キーワードに合致するファイル一覧（相対パス）を取得するユースケース
+    use_index が True の場合はディレクトリインデックスを更新して検索する（未指定時は config.DIRECTORY_INDEX_ENABLED）。
+    """
+    return list(iter_matched_files(folder_path, keywords, extensions, use_index))
+
+def iter_matched_files(folder_path: str, keywords: list, extensions=None, use_index: bool = None, cancel_event=None):
+    """
+    指定フォルダから、キーワードに合致するファイル（相対パス）を見つかった順に 1 件ずつ返すユースケース
+    ディレクトリインデックスを使う場合も、ディレクトリを更新しながら同じ順序で返す。
+    cancel_event (threading.Event) がセットされると、次のディレクトリへ進む前に打ち切る。
     """
-    return search_files(folder_path, keywords)
+    if use_index is None:
+        use_index = DIRECTORY_INDEX_ENABLED
+    if use_index:
+        return _iter_indexed_files(folder_path, keywords, extensions, cancel_event)
+    return iter_search_files(folder_path, keywords, extensions=extensions, cancel_event=cancel_event)
+
+def query_indexed_files(folder_path: str, keywords: list = None, unit: str = None, extensions=None) -> list:
+    """
+    ファイルシステムに触れず、ディレクトリインデックスのみからキーワード・単位・拡張子で絞り込んだ一覧を返すユースケース
+    """
+    from infrastructure.directory_index import DirectoryIndex
+
+    index = DirectoryIndex()
+    try:
+        return index.query(folder_path, keywords, unit=unit, extensions=extensions)
+    finally:
+        index.close()